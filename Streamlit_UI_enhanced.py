@@ -1,13 +1,13 @@
-import re
 import streamlit as st
 import requests
 import json
 import logging
 import uuid
-import ast
 import hashlib
+from endpoint_parser import parse_endpoints
 import os
 from dotenv import load_dotenv
+from backend_client import upload_file_chunked, wait_for_upload
 from datetime import datetime
 
 load_dotenv()
@@ -218,11 +218,12 @@ with col2:
                 show_loading()
                 clear_session()
                 
-                files = {"file": uploaded_file}
-                response = requests.post(f"{API_BASE_URL}/upload", files=files)
+                # Upload in chunks; a new document is then indexed in the background
+                response = upload_file_chunked(uploaded_file, uploaded_file.name, uploaded_file.size)
                 
-                if response.status_code == 200:
-                    result = response.json()
+                if response.status_code in (200, 202):
+                    # 200: already ingested; 202: wait for the ingestion job to finish
+                    result = response.json() if response.status_code == 200 else wait_for_upload(response.json()["job_id"])
                     if isinstance(result, dict):
                         st.session_state.file_name = uploaded_file.name
                         st.session_state.assistant_id = result.get("assistant_id", "")
@@ -412,11 +413,10 @@ def handle_section(section_name, display_name):
         if st.session_state[section_name]:
             response = st.session_state[section_name]
 
-            match = re.search(r"endpoints = ({.*})", response, re.DOTALL)
+            # Linear-time scan for the endpoints block, memoized across reruns
+            endpoints_dict = parse_endpoints(response)
 
-            if match:
-                endpoints_str = match.group(1)
-                endpoints_dict = ast.literal_eval(endpoints_str)
+            if endpoints_dict is not None:
                 response_dict = endpoints_dict
             else:
                 st.warning("No endpoints found in the response.")
@@ -1,15 +1,15 @@
-import re
 import streamlit as st
 import requests
 import json
 import logging
 import streamlit as st
 import uuid
-import ast
 import hashlib
+from endpoint_parser import parse_endpoints
 
 import os
 from dotenv import load_dotenv
+from backend_client import upload_file_chunked, wait_for_upload
 load_dotenv()
 
 
@@ -151,10 +151,11 @@ with col2:
                 # Clear session state before uploading a new file
                 clear_session()
 
-                files = {"file": uploaded_file}
-                response = requests.post(f"{API_BASE_URL}/upload", files=files)
-                if response.status_code == 200:
-                    result = response.json()
+                # Upload in chunks; a new document is then indexed in the background
+                response = upload_file_chunked(uploaded_file, uploaded_file.name, uploaded_file.size)
+                if response.status_code in (200, 202):
+                    # 200: already ingested; 202: wait for the ingestion job to finish
+                    result = response.json() if response.status_code == 200 else wait_for_upload(response.json()["job_id"])
                     if isinstance(result, dict):
                         st.success(result.get("message", "File uploaded successfully!"))
                         # Pre-fill session metadata fields from the response
@@ -377,12 +378,10 @@ def handle_section(section_name, display_name):
         if st.session_state[section_name]:
             response = st.session_state[section_name]
 
-            match = re.search(r"endpoints = ({.*})", response, re.DOTALL)
+            # Linear-time scan for the endpoints block, memoized across reruns
+            endpoints_dict = parse_endpoints(response)
 
-            if match:
-                endpoints_str = match.group(1)
-                # Convert the string representation to an actual Python dictionary
-                endpoints_dict = ast.literal_eval(endpoints_str)
+            if endpoints_dict is not None:
                 response_dict = endpoints_dict
                 # st.write(endpoints_dict)
             else:
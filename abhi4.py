@@ -1,31 +1,19 @@
-import re
 import streamlit as st
 import requests
 import json
 import logging
 import streamlit as st
 import uuid
-import ast
-import hashlib
+from endpoint_parser import parse_endpoints
+from endpoint_tree import get_endpoint_records, get_endpoint_index, paginate
+from prompt_classifier import is_subgroup_prompt, sorted_tags
+import time
 
 import os
 from dotenv import load_dotenv
+from backend_client import upload_file_chunked, wait_for_upload
 load_dotenv()
 
-# Regex-Based Subgroup Prompt Detection
-def is_subgroup_prompt(prompt_text: str) -> bool:
-    """
-    Check if a prompt is related to subgroup analysis using regex.
-    
-    Args:
-        prompt_text: The text of the prompt to check
-        
-    Returns:
-        bool: True if the prompt is related to subgroup analysis, False otherwise
-    """
-    pattern = r"\b(subgroup[s]?|sub-group[s]?|sub group[s]?)\b"
-    return bool(re.search(pattern, prompt_text, flags=re.IGNORECASE))
-
 # Set page configuration
 st.set_page_config(
     page_title="CRP",
@@ -135,6 +123,8 @@ def clear_session():
     st.session_state["endpoint_responses"] = {}
     st.session_state["current_prompt_is_subgroup"] = False
     st.session_state["methods_categorized_endpoints"] = {}
+    st.session_state["selected_endpoint_records"] = {}
+    st.session_state["results_endpoint_page"] = 1
     
     # Clear subgroup related session state
     st.session_state["selected_subgroup_analyses"] = {}
@@ -190,10 +180,11 @@ with col2:
                 # Clear session state before uploading a new file
                 clear_session()
 
-                files = {"file": uploaded_file}
-                response = requests.post(f"{API_BASE_URL}/upload", files=files)
-                if response.status_code == 200:
-                    result = response.json()
+                # Upload in chunks; a new document is then indexed in the background
+                response = upload_file_chunked(uploaded_file, uploaded_file.name, uploaded_file.size)
+                if response.status_code in (200, 202):
+                    # 200: already ingested; 202: wait for the ingestion job to finish
+                    result = response.json() if response.status_code == 200 else wait_for_upload(response.json()["job_id"])
                     if isinstance(result, dict):
                         st.success(result.get("message", "File uploaded successfully!"))
                         # Pre-fill session metadata fields from the response
@@ -231,6 +222,9 @@ user_query = st.text_area("Enter your query", "", height=100)
 dependent = st.checkbox("Dependent on thread", value=True)
 st.session_state["dependent"] = dependent
 
+# Independent answers are cached by the backend; this forces a fresh run
+no_cache = False if dependent else st.checkbox("Regenerate (skip cached answer)", value=False)
+
 get_dependent_status = lambda: "ON" if st.session_state['dependent'] else "OFF"
 
 # Display the conversation status
@@ -252,6 +246,7 @@ if st.button("Ask Assistant"):
                 "vector_id": st.session_state.vector_id,
                 "current_thread_id": st.session_state.current_thread_id or None,
                 "dependent": st.session_state["dependent"], 
+                "no_cache": no_cache,
             }
             response = requests.post(f"{API_BASE_URL}/query", json=payload)
             if response.status_code == 200:
@@ -264,7 +259,10 @@ if st.button("Ask Assistant"):
                 st.session_state["response"] = assistant_response
                 st.session_state["citations"] = citations
 
-                st.success("Assistant responded to your query!")
+                if result.get("cached"):
+                    st.success("Assistant responded to your query! (cached answer)")
+                else:
+                    st.success("Assistant responded to your query!")
             else:
                 st.error(response.json().get("error", "Please upload the file to start your query"))
         except Exception as e:
@@ -300,75 +298,126 @@ if "response" in st.session_state and st.session_state["response"]:
             st.error(f"An error occurred: {e}")
 
 
-# Function to generate a unique key for each checkbox
-def generate_unique_key(*args):
-    # Use a hash of the arguments to create a unique key
-    return hashlib.md5("".join(map(str, args)).encode('utf-8')).hexdigest()
+# Build the predefined prompts for an endpoint; safety endpoints get their own prompt set
+def get_endpoint_prompts(selected_bullet, selected_category):
+    if selected_category.lower() == "safety":
+        prompt_label = "Select a Prompt for Safety Endpoint"
+        prompt_options = [
+            f"Prompt 1. Please can you describe the {selected_bullet} results relating to safety and tolerability. Referring to text and tables describing any safety or tolerability, please can you draft a paragraph describing these results and summarizing the data for it. Please can you add references to any tables or figures that would be relevant to include in a paper. Please can you provide the output as bullet points. ",
+            
+            f"Prompt 2: Please can you provide the following data for each study arm as a bulleted list, relating to safety and tolerability, if it is available:\n"
+            "1. Patient years of exposure\n"
+            "2. The number and proportion of patients reporting at least one:\n"
+            "    a. Adverse event\n"
+            "    b. Treatment-emergent adverse event\n"
+            "    c. Serious adverse event\n"
+            "    d. Adverse event resulting in study discontinuation\n"
+            "    e. Death\n"
+            "3. The number and proportion of patients reporting at least one: Severe adverse event (please note that serious adverse events are different from severe adverse events)",
+            
+            f"Prompt 3: For each study arm please can you provide details of the 10 most common treatment emergent adverse events. If an adverse event is common in any one arm please provide the numbers for that adverse event for all study arms.",
+            
+            f"Prompt 4: For each study arm please can you provide details of the serious adverse events that were reported. For each and every serious adverse event please provide the number and proportion of patients reporting it and provide a summary of the outcomes of the events.",
+            
+            f"Prompt 5: For each study arm please can you provide details of the adverse events leading to discontinuation that were reported. For each and every adverse event please provide the number and proportion of patients reporting it and provide a summary of the outcomes of the events."
+        ]
+    else:
+        prompt_label = "Select a Prompt"
+        prompt_options = [
+            f"Prompt 1: Please can you describe the results for the endpoint of {selected_bullet}. Refer to text and tables describing all analyses, please can you draft a paragraph describing this endpoint and summarizing the outcomes for it. Please can you add references to any tables or figures that would be relevant to include in a paper. Please can you provide the output as bullet points",
+
+            f"Prompt 2: Please can you describe the results for any subgroup analyses of the endpoint of {selected_bullet}. Refer to text and tables describing all analyses, please can you draft a paragraph describing this endpoint and summarizing the outcomes for it. Please can you add references to any tables or figures that would be relevant to include in a paper. Please can you provide the output as bullet points"
+        ]
+    return prompt_label, prompt_options
+
 
-# Modified function to display endpoints without immediate prompt selection
-def display_endpoints(name, item):
-    selected_bullet = None  # To store the selected bullet point
-    selected_category = None  # To store the selected category
-    show_button = False  # To track if we should show the button
+# Seconds to wait for one status response, and for a job before this script run gives up
+JOB_STATUS_TIMEOUT = 10
+JOB_POLL_DEADLINE = 15 * 60
 
-    stack = [(name, item)]  # Initialize stack with the root level
-    while stack:
-        current_name, current_item = stack.pop()  # Pop from stack for processing
+# Poll a background job until it finishes or JOB_POLL_DEADLINE passes, showing a progress bar
+def poll_bulk_job(job_id, poll_interval=2, deadline=JOB_POLL_DEADLINE):
+    progress_bar = st.progress(0.0)
+    status_text = st.empty()
+    give_up_at = time.time() + deadline
+    while True:
+        try:
+            response = requests.get(f"{API_BASE_URL}/jobs/{job_id}", timeout=JOB_STATUS_TIMEOUT)
+        except Exception as e:
+            status_text.error(f"Error checking job status: {str(e)}")
+            return None
+        if response.status_code != 200:
+            status_text.error(response.json().get("error", "Unable to fetch job status"))
+            return None
         
-        if isinstance(current_item, dict):
-            # If it's a dictionary, loop through the key-value pairs
-            st.subheader(current_name)  # Display the category name (subheader)
-            selected_category = current_name  # Capture the selected category
-            for sub_key, sub_value in current_item.items():
-                if isinstance(sub_value, dict):
-                    # If the value is another dictionary, add to stack
-                    stack.append((f"{sub_key} (nested dictionary)", sub_value))
-                elif isinstance(sub_value, list):
-                    # If the value is a list, process it directly
-                    st.subheader(f"{sub_key} (list)")
-                    for list_item in sub_value:
-                        list_item_key = generate_unique_key(sub_key, list_item)  # Ensure unique key for list items
-                        if st.checkbox(str(list_item), key=list_item_key):
-                            selected_bullet = str(list_item)  # Capture the selected item
-                            show_button = True  # User selected a checkbox
-                            # Store selection in session state
-                            st.session_state["selected_bullet"] = selected_bullet
-                            st.session_state["selected_category"] = selected_category
-                else:
-                    # Otherwise, display the key and value as a checkbox
-                    sub_key_value_key = generate_unique_key(sub_key, sub_value)  # Ensure unique key for key-value pairs
-                    if st.checkbox(f"{sub_key}: {sub_value}", key=sub_key_value_key):
-                        selected_bullet = f"{sub_key}: {sub_value}"  # Capture the selected bullet
-                        show_button = True  # User selected a checkbox
-                        # Store selection in session state
-                        st.session_state["selected_bullet"] = selected_bullet
-                        st.session_state["selected_category"] = selected_category
-                        
-        elif isinstance(current_item, list):
-            # If it's a list, display each item as a checkbox
-            st.subheader(current_name)  # Display the category name (subheader)
-            selected_category = current_name  # Capture the selected category
-            for list_item in current_item:
-                list_item_key = generate_unique_key(current_name, list_item)  # Ensure unique key for list items
-                if st.checkbox(str(list_item), key=list_item_key):
-                    selected_bullet = str(list_item)  # Capture the selected item
-                    show_button = True  # User selected a checkbox
-                    # Store selection in session state
-                    st.session_state["selected_bullet"] = selected_bullet
-                    st.session_state["selected_category"] = selected_category
+        job = response.json()
+        total = job["total"] or 1
+        progress_bar.progress(min(job["completed"] / total, 1.0))
+        status_text.markdown(f"**{job['completed']} / {job['total']}** endpoints processed ({job['failed']} failed)")
         
-        else:
-            # Base case: Directly display the name and item as a checkbox
-            base_key = generate_unique_key(current_name, current_item)  # Ensure unique key for base case
-            if st.checkbox(f"{current_name}: {current_item}", key=base_key):
-                selected_bullet = f"{current_name}: {current_item}"  # Capture the selected bullet
-                show_button = True  # User selected a checkbox
-                # Store selection in session state
-                st.session_state["selected_bullet"] = selected_bullet
-                st.session_state["selected_category"] = selected_category
-
-    # Just return whether any checkbox was selected, prompt selection happens after all endpoints are displayed
-    return show_button
+        if job["status"] in ("completed", "failed"):
+            return job
+        if time.time() >= give_up_at:
+            # The job keeps running on the server; the next rerun resumes polling it
+            status_text.error(f"Still running after {deadline // 60} minutes. Interact with the page to check again.")
+            return None
+        time.sleep(poll_interval)
+
+
+ENDPOINTS_PAGE_SIZE = 25
+
+# Keep the endpoint selection in session state rather than in the checkbox widgets,
+# so endpoints ticked on other pages stay selected
+def toggle_endpoint_selection(record):
+    selected = st.session_state["selected_endpoint_records"]
+    if st.session_state[record.key]:
+        selected[record.key] = record
+        st.session_state["selected_bullet"] = record.label
+        st.session_state["selected_category"] = record.category
+    else:
+        selected.pop(record.key, None)
+        if selected and st.session_state["selected_bullet"] == record.label:
+            # Fall back to the most recently selected endpoint that is still ticked
+            last = list(selected.values())[-1]
+            st.session_state["selected_bullet"] = last.label
+            st.session_state["selected_category"] = last.category
+
+# Display one page of the flattened endpoint tree, filtered through the prebuilt search index
+def display_endpoints(records, index):
+    selected = st.session_state.setdefault("selected_endpoint_records", {})
+
+    search_term = st.text_input("🔍 Search endpoints", key="results_endpoint_search")
+    matches = index.search(search_term)
+
+    page = st.session_state.get("results_endpoint_page", 1)
+    prev_col, page_col, next_col = st.columns([1, 3, 1])
+    if prev_col.button("◀ Previous", key="results_endpoint_prev"):
+        page -= 1
+    if next_col.button("Next ▶", key="results_endpoint_next"):
+        page += 1
+    page_records, page, page_count = paginate(matches, page, ENDPOINTS_PAGE_SIZE)
+    st.session_state["results_endpoint_page"] = page
+    page_col.markdown(f"Page **{page}** of **{page_count}** · {len(matches)} endpoints · {len(selected)} selected")
+
+    heading = None
+    for record in page_records:
+        # Category heading whenever the page moves into a new group
+        if record.path[:-1] != heading:
+            heading = record.path[:-1]
+            st.subheader(" › ".join(heading))
+        st.checkbox(
+            record.label,
+            value=record.key in selected,
+            key=record.key,
+            on_change=toggle_endpoint_selection,
+            args=(record,)
+        )
+
+    # Every selected endpoint, on any page, joins the bulk generation queue
+    st.session_state["bulk_endpoint_queue"] = [(record.label, record.category) for record in selected.values()]
+
+    # Just return whether any endpoint is selected, prompt selection happens after the endpoints are displayed
+    return bool(selected)
 
 
 # Reusable function to handle each section
@@ -376,6 +425,22 @@ def handle_section(section_name, display_name):
     st.subheader(display_name)
 
     if section_name == "results":
+        # Reload endpoints generated earlier for this paper (another session or a page reload)
+        if not st.session_state[section_name] and st.session_state.file_name and st.session_state.get(f"{section_name}_loaded_for") != st.session_state.file_name:
+            st.session_state[f"{section_name}_loaded_for"] = st.session_state.file_name
+            st.session_state[f"{section_name}_endpoints"] = None
+            try:
+                stored = requests.get(f"{API_BASE_URL}/{section_name}/structured_endpoints", params={'file_name': st.session_state.file_name})
+                if stored.status_code == 200:
+                    stored = stored.json()
+                    st.session_state[section_name] = stored.get("text", "")
+                    st.session_state[f"{section_name}_citations"] = stored.get("citations", [])
+                    st.session_state[f"{section_name}_thread_id"] = stored.get("thread_id", None)
+                    st.session_state[f"{section_name}_prompt"] = stored.get("prompt", "")
+                    st.session_state[f"{section_name}_endpoints"] = stored.get("endpoints")
+            except Exception as e:
+                logging.warning(f"Could not load stored endpoints: {e}")
+
         generate_button = st.button(f"Generate {display_name} with predefined prompts", key=f"generate_{section_name}")
         if generate_button:
             if st.session_state.assistant_id and st.session_state.vector_id:
@@ -387,7 +452,8 @@ def handle_section(section_name, display_name):
                     # Prepare the payload
                     payload = {
                         'assistant_id': st.session_state.assistant_id,
-                        'vector_id': st.session_state.vector_id
+                        'vector_id': st.session_state.vector_id,
+                        'file_name': st.session_state.file_name
                     }
 
                     # Send the request to the backend
@@ -399,6 +465,8 @@ def handle_section(section_name, display_name):
                         st.session_state[f"{section_name}_citations"] = result.get("citations", [])
                         st.session_state[f"{section_name}_thread_id"] = result.get("thread_id", None)
                         st.session_state[f"{section_name}_prompt"] = result.get(f"{section_name}_prompt", "")
+                        # Structured endpoints parsed and validated by the backend
+                        st.session_state[f"{section_name}_endpoints"] = result.get("endpoints")
 
                         st.success(f"{display_name} generated successfully!")
                     else:
@@ -416,12 +484,10 @@ def handle_section(section_name, display_name):
         if st.session_state[section_name]:
             response = st.session_state[section_name]
 
-            match = re.search(r"endpoints = ({.*})", response, re.DOTALL)
+            # Prefer the backend's structured endpoints; older results fall back to parsing the text
+            endpoints_dict = st.session_state.get(f"{section_name}_endpoints") or parse_endpoints(response)
 
-            if match:
-                endpoints_str = match.group(1)
-                # Convert the string representation to an actual Python dictionary
-                endpoints_dict = ast.literal_eval(endpoints_str)
+            if endpoints_dict is not None:
                 response_dict = endpoints_dict
                 # st.write(endpoints_dict)
             else:
@@ -431,12 +497,9 @@ def handle_section(section_name, display_name):
             # Start the Streamlit app
             st.title("Endpoints")
 
-            # Track whether the "Ask Assistant" button should be displayed
-            show_button = False
-
-            # Output the keys and their corresponding values
-            for major_category, endpoints_dict in response_dict.items():
-                show_button |= display_endpoints(major_category, endpoints_dict)
+            # Output the endpoints; show_button tracks whether the "Ask Assistant" button should be displayed
+            endpoint_records = get_endpoint_records(response, response_dict)
+            show_button = display_endpoints(endpoint_records, get_endpoint_index(response, endpoint_records))
 
             # Now show the prompt selection AFTER all endpoints have been displayed
             if show_button:
@@ -448,44 +511,14 @@ def handle_section(section_name, display_name):
                 
                 st.write("You selected:", selected_bullet)
                 
-                # Check if the selected category is 'safety' and display appropriate prompts
-                is_safety_endpoint = selected_category.lower() == "safety"
+                # Safety endpoints get their own prompt set
+                prompt_label, prompt_options = get_endpoint_prompts(selected_bullet, selected_category)
                 
-                if is_safety_endpoint:
-                    prompt_selection = st.selectbox(
-                        "Select a Prompt for Safety Endpoint",
-                        [
-                            f"Prompt 1. Please can you describe the {selected_bullet} results relating to safety and tolerability. Referring to text and tables describing any safety or tolerability, please can you draft a paragraph describing these results and summarizing the data for it. Please can you add references to any tables or figures that would be relevant to include in a paper. Please can you provide the output as bullet points. ",
-                            
-                            f"Prompt 2: Please can you provide the following data for each study arm as a bulleted list, relating to safety and tolerability, if it is available:\n"
-                            "1. Patient years of exposure\n"
-                            "2. The number and proportion of patients reporting at least one:\n"
-                            "    a. Adverse event\n"
-                            "    b. Treatment-emergent adverse event\n"
-                            "    c. Serious adverse event\n"
-                            "    d. Adverse event resulting in study discontinuation\n"
-                            "    e. Death\n"
-                            "3. The number and proportion of patients reporting at least one: Severe adverse event (please note that serious adverse events are different from severe adverse events)",
-                            
-                            f"Prompt 3: For each study arm please can you provide details of the 10 most common treatment emergent adverse events. If an adverse event is common in any one arm please provide the numbers for that adverse event for all study arms.",
-                            
-                            f"Prompt 4: For each study arm please can you provide details of the serious adverse events that were reported. For each and every serious adverse event please provide the number and proportion of patients reporting it and provide a summary of the outcomes of the events.",
-                            
-                            f"Prompt 5: For each study arm please can you provide details of the adverse events leading to discontinuation that were reported. For each and every adverse event please provide the number and proportion of patients reporting it and provide a summary of the outcomes of the events."
-                        ]
-                    )
-                else:
-                    prompt_selection = st.selectbox(
-                        "Select a Prompt",
-                        [
-                            f"Prompt 1: Please can you describe the results for the endpoint of {selected_bullet}. Refer to text and tables describing all analyses, please can you draft a paragraph describing this endpoint and summarizing the outcomes for it. Please can you add references to any tables or figures that would be relevant to include in a paper. Please can you provide the output as bullet points",
-
-                            f"Prompt 2: Please can you describe the results for any subgroup analyses of the endpoint of {selected_bullet}. Refer to text and tables describing all analyses, please can you draft a paragraph describing this endpoint and summarizing the outcomes for it. Please can you add references to any tables or figures that would be relevant to include in a paper. Please can you provide the output as bullet points"
-                        ]
-                    )
+                prompt_selection = st.selectbox(prompt_label, prompt_options)
                 
-                # Check if the selected prompt is a subgroup prompt
-                st.session_state["current_prompt_is_subgroup"] = is_subgroup_prompt(prompt_selection)
+                # Classify the selected prompt; the subgroup tag decides the saved response type
+                prompt_tags = sorted_tags(prompt_selection)
+                st.session_state["current_prompt_is_subgroup"] = "subgroup" in prompt_tags
                 
                 st.write("Selected Prompt:")
                 st.markdown(prompt_selection)
@@ -493,12 +526,19 @@ def handle_section(section_name, display_name):
                 # Show subgroup detection status
                 if st.session_state["current_prompt_is_subgroup"]:
                     st.markdown("**📊 Subgroup Analysis Detected**")
+                if prompt_tags:
+                    st.caption("Prompt tags: " + ", ".join(prompt_tags))
                 
                 # Set user_query as the selected prompt
                 st.session_state['user_query'] = prompt_selection  # Save the selected prompt as user_query
 
                 checkbox_dependent = st.checkbox("Dependent on threads", value=True)
                 st.session_state["checkbox_dependent"] = checkbox_dependent
+                
+                # Independent answers are cached by the backend; this forces a fresh run
+                checkbox_no_cache = False if checkbox_dependent else st.checkbox(
+                    "Regenerate (skip cached answer)", value=False, key="checkbox_no_cache"
+                )
 
                 get_checkbox_dependent_status = lambda: "ON" if st.session_state['checkbox_dependent'] else "OFF"
 
@@ -527,6 +567,7 @@ def handle_section(section_name, display_name):
                                 "vector_id": st.session_state.vector_id,
                                 "current_thread_id": st.session_state.current_checkbox_thread_id or None,
                                 "dependent": st.session_state["checkbox_dependent"], 
+                                "no_cache": checkbox_no_cache,
                             }
                             response = requests.post(f"{API_BASE_URL}/query", json=payload)
                             if response.status_code == 200:
@@ -543,7 +584,10 @@ def handle_section(section_name, display_name):
                                 st.session_state["selected_bullet"] = temp_selected_bullet
                                 st.session_state["selected_category"] = temp_selected_category
 
-                                st.success("Assistant responded to your query!")
+                                if result.get("cached"):
+                                    st.success("Assistant responded to your query! (cached answer)")
+                                else:
+                                    st.success("Assistant responded to your query!")
                             else:
                                 # Restore selections on error
                                 st.session_state["selected_bullet"] = temp_selected_bullet
@@ -560,6 +604,86 @@ def handle_section(section_name, display_name):
                         st.session_state["selected_category"] = temp_selected_category
                         st.error("Please enter a query before asking.")
 
+                # Run every prompt for this endpoint concurrently, each on its own fresh thread
+                if st.button("Run all prompts for this endpoint"):
+                    with st.spinner(f"Running {len(prompt_options)} prompts in parallel..."):
+                        try:
+                            payload = {
+                                "file_name": st.session_state.file_name,
+                                "assistant_id": st.session_state.assistant_id,
+                                "vector_id": st.session_state.vector_id,
+                                "prompts": [
+                                    {"prompt": prompt, "is_subgroup_prompt": is_subgroup_prompt(prompt)}
+                                    for prompt in prompt_options
+                                ],
+                            }
+                            response = requests.post(f"{API_BASE_URL}/query_batch", json=payload)
+                            if response.status_code == 200:
+                                result = response.json()
+                                st.session_state["batch_endpoint_results"] = {
+                                    "selected_bullet": selected_bullet,
+                                    "selected_category": selected_category,
+                                    "results": result.get("results", []),
+                                }
+                                if result.get("failed"):
+                                    st.warning(f"{result['failed']} of {len(prompt_options)} prompts failed.")
+                                else:
+                                    st.success("Assistant responded to all prompts!")
+                            else:
+                                st.error(response.json().get("error", "Please upload the file to start your query"))
+                        except Exception as e:
+                            st.error(f"Error: {str(e)}")
+
+                # Run the selected prompt for every ticked endpoint as one background job
+                bulk_queue = st.session_state["bulk_endpoint_queue"]
+                if len(bulk_queue) > 1:
+                    st.markdown("---")
+                    st.subheader(f"Generate for all {len(bulk_queue)} selected endpoints")
+                    prompt_index = prompt_options.index(prompt_selection)
+                    st.write(f"Prompt {prompt_index + 1} will be run for each selected endpoint and every response saved automatically.")
+                    
+                    if st.button("Generate for all selected endpoints", key="bulk_generate_endpoints"):
+                        bulk_endpoints = []
+                        for bullet, category in bulk_queue:
+                            endpoint_prompts = get_endpoint_prompts(bullet, category)[1]
+                            # Safety and non-safety endpoints have different prompt sets; fall back to Prompt 1
+                            prompt = endpoint_prompts[prompt_index] if prompt_index < len(endpoint_prompts) else endpoint_prompts[0]
+                            bulk_endpoints.append({
+                                "selected_bullet": bullet,
+                                "selected_category": category,
+                                "prompt": prompt,
+                                "is_subgroup_prompt": is_subgroup_prompt(prompt),
+                            })
+                        
+                        payload = {
+                            "file_name": st.session_state.file_name,
+                            "assistant_id": st.session_state.assistant_id,
+                            "vector_id": st.session_state.vector_id,
+                            "endpoints": bulk_endpoints,
+                        }
+                        try:
+                            response = requests.post(f"{API_BASE_URL}/results/bulk_generate", json=payload)
+                            if response.status_code == 202:
+                                st.session_state["bulk_job_id"] = response.json()["job_id"]
+                            else:
+                                st.error(response.json().get("error", "Failed to start bulk generation."))
+                        except Exception as e:
+                            st.error(f"Error: {str(e)}")
+                    
+                    if st.session_state.get("bulk_job_id"):
+                        job = poll_bulk_job(st.session_state["bulk_job_id"])
+                        if job:
+                            st.session_state["bulk_job_id"] = None
+                            if job["status"] == "failed":
+                                st.error(f"Bulk generation failed: {job['error']}")
+                            elif job["failed"]:
+                                st.warning(f"Saved {job['completed'] - job['failed']} responses; {job['failed']} endpoints failed:")
+                                for result in job["results"]:
+                                    if result["error"]:
+                                        st.markdown(f"- **{result['selected_bullet']}**: {result['error']}")
+                            else:
+                                st.success(f"Saved responses for all {job['total']} endpoints!")
+
             # Display editable text area for the query response
             if st.session_state.get("checkbox_response"):
                 st.header("💬 Response")
@@ -622,6 +746,55 @@ def handle_section(section_name, display_name):
                         except Exception as e:
                             st.error(f"An error occurred: {e}")
 
+            # Display the responses from "Run all prompts for this endpoint"
+            batch = st.session_state.get("batch_endpoint_results")
+            if batch:
+                st.header(f"💬 All Prompt Responses: {batch['selected_bullet']}")
+                for result in batch["results"]:
+                    with st.expander(result["prompt"][:100] + "...", expanded=False):
+                        if result.get("error"):
+                            st.error(f"Error: {result['error']}")
+                            continue
+                        
+                        if result.get("is_subgroup_prompt"):
+                            st.markdown("**📊 Subgroup Analysis Detected**")
+                        
+                        batch_response_text = st.text_area(
+                            "Response:", result["response"], height=200,
+                            key=f"batch_response_text_{result['index']}"
+                        )
+                        
+                        if st.button("Save Response", key=f"save_batch_response_button_{result['index']}"):
+                            endpoint_key = batch["selected_bullet"]
+                            if endpoint_key not in st.session_state["endpoint_responses"]:
+                                st.session_state["endpoint_responses"][endpoint_key] = []
+                            st.session_state["endpoint_responses"][endpoint_key].append({
+                                "prompt_text": result["prompt"],
+                                "response": batch_response_text,
+                                "is_subgroup": result["is_subgroup_prompt"],
+                                "citations": result["citations"],
+                                "thread_id": result["thread_id"]
+                            })
+                            
+                            payload = {
+                                'file_name': st.session_state.file_name,
+                                'user_query': result["prompt"],
+                                'assistant_response': batch_response_text,
+                                'citations': result["citations"],
+                                'thread_id': result["thread_id"],
+                                'selected_bullet': batch["selected_bullet"],
+                                'selected_category': batch["selected_category"],
+                                'is_subgroup': result["is_subgroup_prompt"]
+                            }
+                            try:
+                                save_response = requests.post(f"{API_BASE_URL}/save_endpoint_response", json=payload)
+                                if save_response.status_code == 200:
+                                    st.success("Endpoint response saved successfully!")
+                                else:
+                                    st.error(f"Error saving response: {save_response.json().get('error', 'Unknown error')}")
+                            except Exception as e:
+                                st.error(f"An error occurred: {e}")
+
 
 
     # Update the Methods section to display available subgroup analyses
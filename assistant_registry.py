@@ -0,0 +1,193 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+import httpx
+from openai import OpenAI
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+ASSISTANT_SESSION_MAX = int(os.getenv("ASSISTANT_SESSION_MAX", "64"))
+ASSISTANT_SESSION_IDLE_TTL = float(os.getenv("ASSISTANT_SESSION_IDLE_TTL", "1800"))
+
+# Connection pool shared by every OpenAI call in the process
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "32"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "16"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "600"))
+
+_openai_client = None
+_openai_client_lock = threading.Lock()
+
+
+def get_openai_client():
+    """Return the process-wide OpenAI client backed by a keep-alive httpx connection pool."""
+    global _openai_client
+    if _openai_client is None:
+        with _openai_client_lock:
+            if _openai_client is None:
+                http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=OPENAI_MAX_CONNECTIONS,
+                        max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+                    ),
+                    timeout=OPENAI_TIMEOUT,
+                )
+                _openai_client = OpenAI(http_client=http_client)
+                logger.info("Created shared OpenAI client")
+    return _openai_client
+
+
+class AssistantSessionRegistry:
+    """
+    Bounded LRU of assistant sessions keyed by (assistant_id, vector_id).
+
+    Sessions idle for longer than idle_ttl seconds are evicted on access, and the least
+    recently used session is dropped once max_sessions is exceeded. Sessions are shared
+    between requests, so callers must pass explicit thread ids for thread-dependent queries.
+    """
+
+    def __init__(self, factory, max_sessions=ASSISTANT_SESSION_MAX, idle_ttl=ASSISTANT_SESSION_IDLE_TTL,
+                 clock=time.monotonic):
+        """
+        Args:
+            factory: Callable (assistant_id, vector_id) -> session, called on a miss
+            max_sessions (int): Maximum number of cached sessions
+            idle_ttl (float): Seconds a session may sit unused before it is evicted
+            clock: Monotonic time source, injectable for tests and benchmarks
+        """
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, assistant_id, vector_id):
+        """Return the cached session for (assistant_id, vector_id), creating it on a miss."""
+        key = (assistant_id, vector_id)
+        with self._lock:
+            self._evict_idle()
+            entry = self._sessions.get(key)
+            if entry is not None:
+                self._sessions[key] = (entry[0], self.clock())
+                self._sessions.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Build outside the lock so a slow factory does not block other papers
+        session = self.factory(assistant_id, vector_id)
+
+        with self._lock:
+            # Another thread may have created the same session meanwhile; keep the first one
+            entry = self._sessions.get(key)
+            if entry is not None:
+                return entry[0]
+            self._sessions[key] = (session, self.clock())
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+        return session
+
+    def discard(self, assistant_id, vector_id):
+        """Drop a session, e.g. after its assistant or vector store was deleted."""
+        with self._lock:
+            self._sessions.pop((assistant_id, vector_id), None)
+
+    def _evict_idle(self):
+        # Entries are kept in last-used order, so the idle ones are at the front
+        cutoff = self.clock() - self.idle_ttl
+        while self._sessions:
+            key, (_, last_used) = next(iter(self._sessions.items()))
+            if last_used >= cutoff:
+                break
+            del self._sessions[key]
+            self.evictions += 1
+
+    def stats(self):
+        """Return hit/miss/eviction counters and the current size."""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+def _benchmark(requests_count=200, papers=4):
+    """
+    Compare a fresh client + session per request against the registry, using a local
+    stub of the assistant API so only client setup and connection reuse are measured.
+    """
+    import json
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class StubAssistantAPI(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            body = json.dumps({"response": "ok", "citations": [], "thread_id": "thread_stub"}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    class StubAssistantSession:
+        def __init__(self, client, assistant_id, vector_id):
+            self.client = client
+            self.assistant_id = assistant_id
+            self.vector_id = vector_id
+
+        def run_query(self, prompt, dependent=False):
+            result = self.client.post(f"{base_url}/runs", json={"assistant_id": self.assistant_id, "prompt": prompt})
+            data = result.json()
+            return data["response"], data["citations"], data["thread_id"]
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubAssistantAPI)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    keys = [(f"asst_{i}", f"vs_{i}") for i in range(papers)]
+
+    started = time.perf_counter()
+    for i in range(requests_count):
+        with httpx.Client() as client:
+            StubAssistantSession(client, *keys[i % papers]).run_query("Generate methods")
+    fresh = time.perf_counter() - started
+
+    shared_client = httpx.Client()
+    registry = AssistantSessionRegistry(lambda a, v: StubAssistantSession(shared_client, a, v))
+    started = time.perf_counter()
+    for i in range(requests_count):
+        registry.get(*keys[i % papers]).run_query("Generate methods")
+    pooled = time.perf_counter() - started
+
+    shared_client.close()
+    server.shutdown()
+
+    print(f"fresh client per request: {fresh * 1000 / requests_count:.3f} ms/request")
+    print(f"registry + pooled client: {pooled * 1000 / requests_count:.3f} ms/request")
+    print(f"registry stats: {registry.stats()}")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,104 @@
+import json
+import logging
+
+from flask import Response, stream_with_context
+
+logger = logging.getLogger(__name__)
+
+
+def stream_assistant_answer(client, assistant_id, vector_id, question, thread_id=None, dependent=True):
+    """
+    Run an assistant query and yield events as the answer is generated.
+
+    Events are dicts with a "type" of:
+        "start": {"thread_id"} once the run is queued
+        "delta": {"text"} for every chunk of answer text
+        "done":  {"response", "citations", "thread_id"} with the final text, annotations
+                 replaced by [n] markers, and the citation list
+
+    Args:
+        client: OpenAI client
+        assistant_id (str): The assistant to run
+        vector_id (str): Vector store attached to new threads for file search
+        question (str): The user's prompt
+        thread_id (str, optional): Thread to continue when dependent is True
+        dependent (bool): Continue thread_id instead of starting a fresh thread
+    """
+    if not dependent or not thread_id:
+        thread = client.beta.threads.create(
+            tool_resources={"file_search": {"vector_store_ids": [vector_id]}}
+        )
+        thread_id = thread.id
+
+    client.beta.threads.messages.create(thread_id=thread_id, role="user", content=question)
+    yield {"type": "start", "thread_id": thread_id}
+
+    with client.beta.threads.runs.stream(thread_id=thread_id, assistant_id=assistant_id) as stream:
+        for text in stream.text_deltas:
+            yield {"type": "delta", "text": text}
+        final_messages = stream.get_final_messages()
+
+    response_text, citations = assemble_citations(client, final_messages)
+    yield {"type": "done", "response": response_text, "citations": citations, "thread_id": thread_id}
+
+
+def run_assistant_answer(client, assistant_id, vector_id, question, thread_id=None, dependent=True):
+    """
+    Run an assistant query to completion.
+
+    Returns:
+        dict: The "done" event's response, citations and thread_id
+    """
+    for event in stream_assistant_answer(client, assistant_id, vector_id, question, thread_id, dependent):
+        if event["type"] == "done":
+            return {"response": event["response"], "citations": event["citations"], "thread_id": event["thread_id"]}
+    raise RuntimeError("Assistant run ended without an answer")
+
+
+def assemble_citations(client, messages):
+    """
+    Replace file-citation annotations in the final messages with [n] markers.
+
+    Returns:
+        tuple: (response_text, citations) where citations is a list of "[n] file_name" strings
+    """
+    file_names = {}
+    citations = []
+    parts = []
+    for message in messages:
+        for content in message.content:
+            if content.type != "text":
+                continue
+            text = content.text.value
+            for annotation in content.text.annotations:
+                file_citation = getattr(annotation, "file_citation", None)
+                if file_citation is None:
+                    continue
+                file_id = file_citation.file_id
+                if file_id not in file_names:
+                    file_names[file_id] = client.files.retrieve(file_id).filename
+                citations.append(f"[{len(citations) + 1}] {file_names[file_id]}")
+                text = text.replace(annotation.text, f"[{len(citations)}]")
+            parts.append(text)
+    return "\n\n".join(parts), citations
+
+
+def ndjson_response(events):
+    """
+    Stream an iterable of event dicts as newline-delimited JSON.
+    Errors raised mid-stream are sent as a final {"type": "error"} event.
+    """
+    def generate():
+        try:
+            for event in events:
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            logger.error(f"Error while streaming assistant answer: {str(e)}")
+            yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,240 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:5000/")
+
+# Timeouts in seconds. Assistant runs can take a while, so the read timeout is generous,
+# but a dead backend is detected quickly through the connect timeout.
+CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", "300"))
+
+# Connection pool sizing and retry policy
+POOL_CONNECTIONS = int(os.getenv("API_POOL_CONNECTIONS", "4"))
+POOL_MAXSIZE = int(os.getenv("API_POOL_MAXSIZE", "16"))
+MAX_RETRIES = int(os.getenv("API_MAX_RETRIES", "3"))
+BACKOFF_FACTOR = float(os.getenv("API_BACKOFF_FACTOR", "0.5"))
+
+# Upload status polling: start fast, back off while the backend is indexing
+UPLOAD_POLL_INITIAL = float(os.getenv("UPLOAD_POLL_INITIAL", "0.5"))
+UPLOAD_POLL_MAX = float(os.getenv("UPLOAD_POLL_MAX", "5"))
+UPLOAD_POLL_TIMEOUT = float(os.getenv("UPLOAD_POLL_TIMEOUT", "900"))
+
+# Fallback chunk size when the backend does not suggest one
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _build_session():
+    """Create a requests.Session with a keep-alive connection pool and retry-with-backoff."""
+    # Connection errors are retried for every method. Read errors and 5xx statuses are only
+    # retried for idempotent methods so that a slow /query or save is never run twice.
+    retry = Retry(
+        total=MAX_RETRIES,
+        connect=MAX_RETRIES,
+        read=MAX_RETRIES,
+        status=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD", "OPTIONS", "PUT"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session():
+    """Return the process-wide requests.Session shared by every backend call."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+                logger.info(f"Created pooled backend session for {API_BASE_URL}")
+    return _session
+
+
+def api_url(path):
+    """Join a route path onto API_BASE_URL without doubling slashes."""
+    return f"{API_BASE_URL.rstrip('/')}/{path.lstrip('/')}"
+
+
+def api_request(method, path, timeout=None, **kwargs):
+    """Send a request to the backend through the pooled session with default timeouts."""
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    return get_session().request(method, api_url(path), timeout=timeout, **kwargs)
+
+
+def api_get(path, **kwargs):
+    """GET a backend route, e.g. api_get("/export/get_saved_responses", params=params)."""
+    return api_request("GET", path, **kwargs)
+
+
+def api_post(path, **kwargs):
+    """POST to a backend route, e.g. api_post("/query", json=payload)."""
+    return api_request("POST", path, **kwargs)
+
+
+def download_filename(response, default):
+    """File name from a download response's Content-Disposition header, or default."""
+    match = re.search(r'filename="?([^";]+)"?', response.headers.get("Content-Disposition", ""))
+    return match.group(1) if match else default
+
+
+def api_stream(path, payload, timeout=None):
+    """
+    POST to a streaming backend route and yield its newline-delimited JSON events as dicts.
+    Raises RuntimeError with the backend's error message on a non-200 response.
+    """
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    with get_session().post(api_url(path), json=payload, stream=True, timeout=timeout) as response:
+        if response.status_code != 200:
+            try:
+                error = response.json().get("error", "Unknown error")
+            except ValueError:
+                error = f"HTTP {response.status_code}"
+            raise RuntimeError(error)
+        for line in response.iter_lines(decode_unicode=True):
+            if line:
+                yield json.loads(line)
+
+
+def _error_message(response):
+    try:
+        return response.json().get("error", f"HTTP {response.status_code}")
+    except ValueError:
+        return f"HTTP {response.status_code}"
+
+
+def upload_file_chunked(file_obj, file_name, size, force_reingest=False, upload_id=None, on_progress=None,
+                        max_failures=MAX_RETRIES):
+    """
+    Upload a file through the chunked upload routes and finalize it.
+
+    Each chunk is sent with its offset. After a failed request the helper asks the backend
+    how much it already has and continues from there. Passing the upload_id of an
+    interrupted upload resumes it instead of starting over.
+
+    Args:
+        file_obj: Seekable binary file object (e.g. a Streamlit UploadedFile)
+        file_name (str): Name to register the upload under
+        size (int): Total size in bytes
+        force_reingest (bool): Passed to finalize to bypass upload deduplication
+        upload_id (str, optional): Upload to resume
+        on_progress: Optional callable (upload_id, offset, size) called after every chunk
+        max_failures (int): Consecutive failed chunk requests tolerated before giving up
+
+    Returns:
+        requests.Response: The finalize response, shaped like POST /upload (200 or 202)
+
+    Raises:
+        RuntimeError: If the backend rejects the upload or too many chunk requests fail
+    """
+    state = None
+    if upload_id:
+        response = api_get(f"/upload/chunked/{upload_id}")
+        if response.status_code == 200 and response.json().get("size") == size:
+            state = response.json()
+    if state is None:
+        response = api_post("/upload/chunked/init", json={"file_name": file_name, "size": size})
+        if response.status_code != 201:
+            raise RuntimeError(_error_message(response))
+        state = response.json()
+
+    upload_id = state["upload_id"]
+    offset = state["offset"]
+    chunk_size = state.get("chunk_size") or UPLOAD_CHUNK_SIZE
+    failures = 0
+    if on_progress is not None:
+        on_progress(upload_id, offset, size)
+
+    while offset < size:
+        file_obj.seek(offset)
+        chunk = file_obj.read(chunk_size)
+        try:
+            response = api_request(
+                "PUT",
+                f"/upload/chunked/{upload_id}",
+                params={"offset": offset},
+                data=chunk,
+                headers={"Content-Type": "application/octet-stream"},
+            )
+        except requests.RequestException as e:
+            failures += 1
+            if failures > max_failures:
+                raise RuntimeError(f"Upload interrupted at {offset} of {size} bytes: {str(e)}")
+            logger.warning(f"Chunk at offset {offset} failed ({str(e)}); resyncing")
+            time.sleep(BACKOFF_FACTOR * (2 ** (failures - 1)))
+            response = api_get(f"/upload/chunked/{upload_id}")
+            if response.status_code == 200:
+                offset = response.json()["offset"]
+            continue
+
+        if response.status_code in (200, 409):
+            # 409 carries the offset the backend expects, e.g. after a replayed chunk
+            offset = response.json()["offset"]
+            failures = 0
+        else:
+            raise RuntimeError(_error_message(response))
+        if on_progress is not None:
+            on_progress(upload_id, offset, size)
+
+    return api_post(f"/upload/chunked/{upload_id}/finalize", json={"force_reingest": force_reingest})
+
+
+def wait_for_upload(job_id, on_progress=None, initial_delay=UPLOAD_POLL_INITIAL, max_delay=UPLOAD_POLL_MAX,
+                    timeout=UPLOAD_POLL_TIMEOUT):
+    """
+    Poll /upload/status/<job_id> with exponential backoff until ingestion finishes.
+
+    Args:
+        job_id (str): Job id returned by POST /upload
+        on_progress: Optional callable receiving each status dict (stage, completed, total)
+        initial_delay (float): First polling interval in seconds, doubled up to max_delay
+        max_delay (float): Longest polling interval in seconds
+        timeout (float): Give up after this many seconds
+
+    Returns:
+        dict: The final status, including assistant_id, vector_store_id and thread_id
+
+    Raises:
+        RuntimeError: If ingestion fails, the job is unknown or the timeout is reached
+    """
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    while True:
+        response = api_get(f"/upload/status/{job_id}")
+        if response.status_code != 200:
+            raise RuntimeError(response.json().get("error", f"HTTP {response.status_code}"))
+        status = response.json()
+        if on_progress is not None:
+            on_progress(status)
+        if status["status"] == "completed":
+            return status
+        if status["status"] == "failed":
+            raise RuntimeError(status.get("error") or "Document processing failed")
+        if time.monotonic() + delay > deadline:
+            raise RuntimeError("Timed out waiting for document processing")
+        time.sleep(delay)
+        delay = min(delay * 2, max_delay)
@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import tempfile
+import hashlib
+import logging
+import threading
+
+from werkzeug.utils import secure_filename
+
+from ingestion import UPLOAD_DIR, HASH_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Partially uploaded files are spooled here, one .part file plus a .json manifest per upload
+PARTIAL_UPLOAD_DIR = os.getenv("PARTIAL_UPLOAD_DIR", os.path.join(UPLOAD_DIR, "partial"))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+UPLOAD_MAX_CHUNK_SIZE = int(os.getenv("UPLOAD_MAX_CHUNK_SIZE", str(32 * 1024 * 1024)))
+UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE", str(2 * 1024 * 1024 * 1024)))
+# Seconds without a new chunk after which an unfinished upload is removed
+UPLOAD_PARTIAL_TTL = int(os.getenv("UPLOAD_PARTIAL_TTL", str(24 * 60 * 60)))
+
+# One lock per upload serializes its appends and finalize; the offset check makes a replayed chunk a no-op
+_upload_locks = {}
+_upload_locks_guard = threading.Lock()
+
+
+class ChunkOffsetError(Exception):
+    """Raised when a chunk does not start at the upload's current offset."""
+
+    def __init__(self, expected_offset):
+        super().__init__(f"Chunk must start at offset {expected_offset}")
+        self.expected_offset = expected_offset
+
+
+def _paths(upload_id):
+    # upload ids are generated hex strings; reject anything else before touching the filesystem
+    if not upload_id or not all(c in "0123456789abcdef" for c in upload_id):
+        raise KeyError(upload_id)
+    base = os.path.join(PARTIAL_UPLOAD_DIR, upload_id)
+    return base + ".part", base + ".json"
+
+
+def _upload_lock(upload_id):
+    with _upload_locks_guard:
+        return _upload_locks.setdefault(upload_id, threading.Lock())
+
+
+def _forget_upload(upload_id):
+    with _upload_locks_guard:
+        _upload_locks.pop(upload_id, None)
+
+
+def sweep_expired_uploads(ttl=UPLOAD_PARTIAL_TTL, now=None):
+    """
+    Remove unfinished uploads that have not received a chunk for ttl seconds.
+
+    Returns:
+        int: Number of uploads removed
+    """
+    now = time.time() if now is None else now
+    removed = 0
+    for name in os.listdir(PARTIAL_UPLOAD_DIR):
+        if not name.endswith(".json"):
+            continue
+        upload_id = name[:-len(".json")]
+        try:
+            part_path, manifest_path = _paths(upload_id)
+        except KeyError:
+            continue
+        with _upload_lock(upload_id):
+            try:
+                # Appends touch the .part file, so its mtime is the last activity
+                last_activity = max(os.path.getmtime(path) for path in (part_path, manifest_path)
+                                    if os.path.exists(path))
+            except ValueError:
+                continue
+            if now - last_activity < ttl:
+                continue
+            for path in (part_path, manifest_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        _forget_upload(upload_id)
+        removed += 1
+    if removed:
+        logger.info(f"Removed {removed} expired chunked uploads")
+    return removed
+
+
+def init_upload(file_name, size):
+    """
+    Start a chunked upload.
+
+    Args:
+        file_name (str): Original file name
+        size (int): Total size in bytes the client will send
+
+    Returns:
+        dict: upload_id, offset (0) and the suggested chunk_size
+
+    Raises:
+        ValueError: If the name is empty or the size is out of range
+    """
+    if not file_name or not secure_filename(file_name):
+        raise ValueError("A file_name is required")
+    if size <= 0 or size > UPLOAD_MAX_SIZE:
+        raise ValueError(f"size must be between 1 and {UPLOAD_MAX_SIZE} bytes")
+
+    os.makedirs(PARTIAL_UPLOAD_DIR, exist_ok=True)
+    sweep_expired_uploads()
+    upload_id = uuid.uuid4().hex
+    part_path, manifest_path = _paths(upload_id)
+    open(part_path, "wb").close()
+    with open(manifest_path, "w") as manifest:
+        json.dump({"file_name": file_name, "size": size}, manifest)
+
+    logger.info(f"Started chunked upload {upload_id} for {file_name} ({size} bytes)")
+    return {"upload_id": upload_id, "offset": 0, "size": size, "chunk_size": UPLOAD_CHUNK_SIZE}
+
+
+def get_upload_status(upload_id):
+    """
+    Return file_name, size and the current offset (bytes received so far) of an upload.
+
+    Raises:
+        KeyError: If the upload does not exist
+    """
+    part_path, manifest_path = _paths(upload_id)
+    if not os.path.exists(manifest_path):
+        raise KeyError(upload_id)
+    with open(manifest_path) as manifest:
+        status = json.load(manifest)
+    return {"upload_id": upload_id, "offset": os.path.getsize(part_path), **status}
+
+
+def append_chunk(upload_id, offset, stream, length):
+    """
+    Append one chunk read from stream to the spooled file. The chunk is first read from the
+    network into a temporary file in small pieces, so it is never held in memory and a slow
+    client holds the upload's lock only for the offset check and the local copy.
+
+    Args:
+        upload_id (str): Upload id from init_upload
+        offset (int): Byte offset the chunk starts at; must equal the current offset
+        stream: File-like request body
+        length (int): Declared chunk length in bytes
+
+    Returns:
+        int: The new offset
+
+    Raises:
+        KeyError: If the upload does not exist
+        ChunkOffsetError: If offset is not the current offset
+        ValueError: If the chunk is too large, overruns the declared size or arrives short
+    """
+    if length <= 0 or length > UPLOAD_MAX_CHUNK_SIZE:
+        raise ValueError(f"Chunk length must be between 1 and {UPLOAD_MAX_CHUNK_SIZE} bytes")
+
+    part_path, _ = _paths(upload_id)
+    # Unlocked early check so a stale or oversized chunk is rejected before it is read
+    status = get_upload_status(upload_id)
+    if offset != status["offset"]:
+        raise ChunkOffsetError(status["offset"])
+    if offset + length > status["size"]:
+        raise ValueError("Chunk runs past the declared file size")
+
+    with tempfile.TemporaryFile(dir=PARTIAL_UPLOAD_DIR) as chunk:
+        written = 0
+        while written < length:
+            piece = stream.read(min(HASH_CHUNK_SIZE, length - written))
+            if not piece:
+                break
+            chunk.write(piece)
+            written += len(piece)
+        if written != length:
+            # Nothing was appended, so the client can resend the chunk from the same offset
+            raise ValueError(f"Chunk ended after {written} of {length} bytes")
+        chunk.seek(0)
+
+        with _upload_lock(upload_id):
+            # Checked again: another request may have appended while this chunk was being read
+            status = get_upload_status(upload_id)
+            if offset != status["offset"]:
+                raise ChunkOffsetError(status["offset"])
+            with open(part_path, "ab") as part:
+                shutil.copyfileobj(chunk, part, HASH_CHUNK_SIZE)
+
+    return offset + written
+
+
+def finalize_upload(upload_id):
+    """
+    Check the spooled file is complete, move it next to regular uploads and hash it.
+
+    Returns:
+        tuple: (path, file_name, content_hash), matching ingestion.store_upload
+
+    Raises:
+        KeyError: If the upload does not exist
+        ValueError: If bytes are still missing
+    """
+    part_path, manifest_path = _paths(upload_id)
+    # Under the upload's lock, so a concurrent finalize sees the upload gone (KeyError) instead of racing os.replace
+    with _upload_lock(upload_id):
+        status = get_upload_status(upload_id)
+        if status["offset"] != status["size"]:
+            raise ValueError(f"Upload incomplete: {status['offset']} of {status['size']} bytes received")
+
+        path = os.path.join(UPLOAD_DIR, f"{upload_id}_{secure_filename(status['file_name'])}")
+        os.replace(part_path, path)
+        os.remove(manifest_path)
+    _forget_upload(upload_id)
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as stored:
+        for chunk in iter(lambda: stored.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return path, status["file_name"], digest.hexdigest()
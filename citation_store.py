@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# One document per distinct citation: {"_id": citation id, "citation": ..., "created_at": ...}.
+# Responses store the ids in "citation_ids" instead of the citations themselves.
+CITATIONS_COLLECTION = "citations"
+
+MAX_CACHED_CITATIONS = int(os.getenv("CITATION_CACHE_MAX_ENTRIES", "4096"))
+
+
+def citation_id(citation):
+    """
+    Content hash identifying a citation: the first 128 bits of the SHA-256 of its
+    canonical JSON, so equal citations saved from any response share one id.
+    """
+    payload = json.dumps(citation, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class CitationCache:
+    """
+    Size-bounded, thread-safe LRU cache of citations by id.
+
+    Ids are content hashes, so a cached citation never goes stale and an id seen here
+    is known to be stored already.
+    """
+
+    def __init__(self, max_entries=MAX_CACHED_CITATIONS):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, ids):
+        """Return {id: citation} for the cached ids."""
+        found = {}
+        with self._lock:
+            for cid in ids:
+                if cid in self._entries:
+                    self._entries.move_to_end(cid)
+                    found[cid] = self._entries[cid]
+        return found
+
+    def put_many(self, citations):
+        """Store {id: citation}, evicting the least recently used citations."""
+        with self._lock:
+            for cid, citation in citations.items():
+                self._entries[cid] = citation
+                self._entries.move_to_end(cid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Process-wide cache shared by writes and lookups
+citation_cache = CitationCache()
+
+
+def store_citations(db, citations):
+    """
+    Store each distinct citation once and return their ids in the original order.
+
+    Citations already in the process cache are skipped; the rest go out in one unordered
+    bulk upsert that only inserts, so concurrent saves of the same citation are harmless.
+
+    Args:
+        db: MongoDB database connection
+        citations (list): Citations as produced by the assistant (strings or dicts)
+
+    Returns:
+        list: Citation ids, one per citation
+    """
+    if not citations:
+        return []
+
+    ids = [citation_id(citation) for citation in citations]
+    cached = citation_cache.get_many(ids)
+    new = {cid: citation for cid, citation in zip(ids, citations) if cid not in cached}
+
+    if new:
+        now = datetime.utcnow()
+        db[CITATIONS_COLLECTION].bulk_write(
+            [
+                UpdateOne({"_id": cid}, {"$setOnInsert": {"citation": citation, "created_at": now}}, upsert=True)
+                for cid, citation in new.items()
+            ],
+            ordered=False
+        )
+        citation_cache.put_many(new)
+    return ids
+
+
+def load_citations(db, ids):
+    """
+    Look up citations by id: cached ones from memory, the rest in one $in query.
+
+    Returns:
+        dict: {id: citation} for every id that exists
+    """
+    ids = set(ids)
+    found = citation_cache.get_many(ids)
+    missing = [cid for cid in ids if cid not in found]
+    if missing:
+        fetched = {
+            doc["_id"]: doc["citation"]
+            for doc in db[CITATIONS_COLLECTION].find({"_id": {"$in": missing}}, {"citation": 1})
+        }
+        citation_cache.put_many(fetched)
+        found.update(fetched)
+        if len(fetched) < len(missing):
+            logger.warning(f"{len(missing) - len(fetched)} citation ids have no stored citation")
+    return found
+
+
+def _citation_holders(doc):
+    # A response document, plus the responses nested in an endpoint document
+    yield doc
+    for response in doc.get("responses") or []:
+        if isinstance(response, dict):
+            yield response
+
+
+def expand_citations(db, docs, field="citation_ids"):
+    """
+    Replace the citation ids on each document (and its nested "responses") with a
+    "citations" list, resolving every id in one lookup. Documents saved before the
+    citation store keep their inline citations.
+
+    Args:
+        db: MongoDB database connection
+        docs (list): Documents read with their citation ids
+        field (str): Field holding the ids
+
+    Returns:
+        list: The same documents, updated in place
+    """
+    holders = [holder for doc in docs for holder in _citation_holders(doc) if field in holder]
+    if not holders:
+        return docs
+
+    found = load_citations(db, (cid for holder in holders for cid in holder[field] or []))
+    for holder in holders:
+        holder["citations"] = [found[cid] for cid in holder.pop(field) or [] if cid in found]
+    return docs
+
+
+def iter_expanded_citations(db, docs, batch_size=100):
+    """
+    Expand citations on a stream of documents (e.g. a cursor) a batch at a time, so a
+    large result is never held in memory and each batch costs one citation lookup.
+    """
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield from expand_citations(db, batch)
+            batch = []
+    if batch:
+        yield from expand_citations(db, batch)
+
+
+def _benchmark(db=None, responses=500, citations_per_response=8, distinct_sources=40, passage_size=400):
+    """
+    Compare storage and read time for inline citations against citation ids, on scratch
+    collections in the configured database. Requires a running MongoDB.
+    """
+    if db is None:
+        from mongo_client import get_db
+        db = get_db()
+
+    import bson
+
+    sources = [f"Source passage {i}: " + "x" * passage_size for i in range(distinct_sources)]
+
+    def cited(i):
+        return [sources[(i + j) % distinct_sources] for j in range(citations_per_response)]
+
+    inline_docs = [{"n": i, "assistant_response": "answer", "citations": cited(i)} for i in range(responses)]
+    compact_docs = [{"n": i, "assistant_response": "answer", "citation_ids": store_citations(db, cited(i))}
+                    for i in range(responses)]
+
+    inline_bytes = sum(len(bson.encode(doc)) for doc in inline_docs)
+    compact_bytes = sum(len(bson.encode(doc)) for doc in compact_docs)
+    store_bytes = sum(len(bson.encode({"_id": citation_id(s), "citation": s})) for s in sources)
+
+    inline = db["__benchmark_inline_citations"]
+    compact = db["__benchmark_compact_citations"]
+    try:
+        inline.insert_many(inline_docs)
+        compact.insert_many(compact_docs)
+
+        started = time.perf_counter()
+        list(inline.find({}, {"citations": 0}))
+        listing_inline_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        list(inline.find({}))
+        full_inline_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        expand_citations(db, list(compact.find({})))
+        full_compact_ms = (time.perf_counter() - started) * 1000
+
+        print(f"Stored bytes: inline {inline_bytes}, ids {compact_bytes} + citations {store_bytes}")
+        print(f"Listing without citations: {listing_inline_ms:.1f} ms")
+        print(f"Read with citations: inline {full_inline_ms:.1f} ms, ids + lookup {full_compact_ms:.1f} ms")
+    finally:
+        inline.drop()
+        compact.drop()
+        db[CITATIONS_COLLECTION].delete_many({"_id": {"$in": [citation_id(s) for s in sources]}})
+
+
+if __name__ == "__main__":
+    _benchmark()
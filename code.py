@@ -1,3 +1,596 @@
+from db_indexes import ensure_indexes
+from mongo_client import get_db, check_health
+
+
+@app_routes.record_once
+def bootstrap_indexes(state):
+    """
+    Create the MongoDB indexes (db_indexes.COLLECTION_INDEXES) once, when the blueprint is registered at startup.
+    """
+    try:
+        ensure_indexes(get_db())
+    except Exception as e:
+        logger.error(f"Index bootstrap failed: {str(e)}")
+
+
+@app_routes.route('/health', methods=['GET'])
+def health():
+    """
+    Report MongoDB reachability and connection pool metrics (checked-out count, wait-queue time).
+    """
+    healthy, details = check_health()
+    return jsonify(details), 200 if healthy else 503
+
+
+from assistant_registry import get_openai_client
+from assistant_streaming import stream_assistant_answer, run_assistant_answer, ndjson_response
+from response_cache import response_cache, make_cache_key
+
+CHAT_SECTIONS = {"introduction", "methods", "results", "discussion", "conclusion"}
+
+
+@app_routes.route('/query', methods=['POST'])
+def query():
+    """
+    Answer a question about the uploaded paper.
+
+    Independent queries (dependent=False) are served from the response cache when the same
+    normalized question was answered for this assistant and vector store within the TTL;
+    send no_cache=True to force a fresh run. Thread-dependent queries always run.
+    """
+    try:
+        data = request.json
+        # "query" and "thread_id" are accepted from older clients
+        question = data.get("question") or data.get("query")
+        assistant_id = data.get("assistant_id")
+        vector_id = data.get("vector_id")
+        thread_id = data.get("current_thread_id") or data.get("thread_id")
+        dependent = data.get("dependent", True)
+        
+        if not all([question, assistant_id, vector_id]):
+            return jsonify({"error": "Missing question, assistant_id or vector_id"}), 400
+        
+        cache_key = None
+        if not dependent:
+            cache_key = make_cache_key(question, assistant_id, vector_id, dependent)
+            if not data.get("no_cache"):
+                cached = response_cache.get(cache_key)
+                if cached is not None:
+                    return jsonify({**cached, "cached": True}), 200
+        
+        answer = run_assistant_answer(
+            get_openai_client(), assistant_id, vector_id, question,
+            thread_id=thread_id, dependent=dependent
+        )
+        
+        if cache_key is not None:
+            response_cache.put(cache_key, answer["response"], answer["citations"], answer["thread_id"])
+        
+        return jsonify({**answer, "cached": False}), 200
+    
+    except Exception as e:
+        logger.error(f"Error in query: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app_routes.route('/query/stream', methods=['POST'])
+def query_stream():
+    """
+    Streaming variant of /query. Takes the same payload and returns newline-delimited JSON
+    events (start, delta..., done) so the UI can render the answer as it is generated.
+    """
+    try:
+        data = request.json
+        question = data.get("question")
+        assistant_id = data.get("assistant_id")
+        vector_id = data.get("vector_id")
+        
+        if not all([question, assistant_id, vector_id]):
+            return jsonify({"error": "Missing question, assistant_id or vector_id"}), 400
+        
+        events = stream_assistant_answer(
+            get_openai_client(),
+            assistant_id,
+            vector_id,
+            question,
+            thread_id=data.get("current_thread_id"),
+            dependent=data.get("dependent", True)
+        )
+        # Errors once the stream has started arrive as an "error" event from ndjson_response
+        return ndjson_response(events)
+    
+    except Exception as e:
+        logger.error(f"Error in query_stream: {str(e)}")
+        return ndjson_response([{"type": "error", "error": str(e)}]), 500
+
+
+@app_routes.route('/<section>/chat_stream', methods=['POST'])
+def chat_section_stream(section):
+    """
+    Streaming variant of /<section>/chat_<section>, returning the same events as /query/stream.
+    """
+    if section not in CHAT_SECTIONS:
+        return jsonify({"error": f"Unknown section: {section}"}), 404
+    
+    try:
+        data = request.json
+        question = data.get("question")
+        assistant_id = data.get("assistant_id")
+        vector_id = data.get("vector_id")
+        
+        if not all([question, assistant_id, vector_id]):
+            return jsonify({"error": "Missing question, assistant_id or vector_id"}), 400
+        
+        events = stream_assistant_answer(
+            get_openai_client(),
+            assistant_id,
+            vector_id,
+            question,
+            thread_id=data.get("thread_id"),
+            dependent=data.get("dependent", True)
+        )
+        return ndjson_response(events)
+    
+    except Exception as e:
+        logger.error(f"Error in chat_section_stream: {str(e)}")
+        return ndjson_response([{"type": "error", "error": str(e)}]), 500
+
+
+from query_batch import normalize_batch_prompts, run_query_batch
+
+
+@app_routes.route('/query_batch', methods=['POST'])
+def query_batch():
+    """
+    Run several prompts for one endpoint concurrently and return all answers together.
+    Each prompt runs on an independent thread; results are tagged with their prompt index
+    and is_subgroup_prompt.
+    """
+    try:
+        data = request.json
+        assistant_id = data.get("assistant_id")
+        vector_id = data.get("vector_id")
+        
+        if not assistant_id or not vector_id:
+            return jsonify({"error": "Missing assistant_id or vector_id"}), 400
+        
+        try:
+            prompts = normalize_batch_prompts(data.get("prompts", []))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        logger.info(f"Running batch of {len(prompts)} prompts for file: {data.get('file_name')}")
+        
+        results = run_query_batch(
+            lambda: AssistantSession(get_openai_client(), assistant_id, vector_id),
+            prompts
+        )
+        
+        return jsonify({
+            "results": results,
+            "failed": sum(1 for result in results if result["error"])
+        }), 200
+    
+    except Exception as e:
+        logger.error(f"Error in query_batch: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+from jobs import jobs
+from query_batch import normalize_bulk_endpoints, run_bulk_generation
+
+
+@app_routes.route('/results/bulk_generate', methods=['POST'])
+def bulk_generate_results():
+    """
+    Queue a background job that runs a prompt for every selected endpoint and saves each
+    answer through save_endpoint_data as it completes. Returns the job id to poll.
+    """
+    try:
+        data = request.json
+        file_name = data.get("file_name")
+        assistant_id = data.get("assistant_id")
+        vector_id = data.get("vector_id")
+        
+        if not all([file_name, assistant_id, vector_id]):
+            return jsonify({"error": "Missing file_name, assistant_id or vector_id"}), 400
+        
+        try:
+            endpoints = normalize_bulk_endpoints(data.get("endpoints", []))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        def save_result(item, response, citations, thread_id):
+            return save_endpoint_data(
+                get_db(),
+                file_name,
+                item["selected_category"],
+                item["selected_bullet"],
+                item["prompt"],
+                response,
+                citations,
+                thread_id,
+                is_subgroup=item["is_subgroup_prompt"]
+            )
+        
+        job = jobs.submit(
+            "bulk_generate",
+            lambda job: run_bulk_generation(
+                job,
+                lambda: AssistantSession(get_openai_client(), assistant_id, vector_id),
+                endpoints,
+                save_result
+            ),
+            total=len(endpoints),
+            meta={"file_name": file_name}
+        )
+        
+        return jsonify({"job_id": job.id, "total": job.total}), 202
+    
+    except Exception as e:
+        logger.error(f"Error in bulk_generate_results: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app_routes.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """
+    Return the progress of a background job: status, total, completed, failed and per-item results.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job id"}), 404
+    return jsonify(job.snapshot()), 200
+
+
+from ingestion import store_upload, discard_upload, find_ingested_upload, submit_ingestion, ingestion_jobs
+from chunked_upload import init_upload, get_upload_status, append_chunk, finalize_upload, ChunkOffsetError
+
+
+def ingestion_response(path, file_name, content_hash, force_reingest):
+    """
+    Answer a stored upload: reuse an already-ingested identical paper (200) or queue
+    ingestion and return the job id (202).
+    """
+    # Shared, pooled MongoDB connection
+    db = get_db()
+    
+    if not force_reingest:
+        existing = find_ingested_upload(db, content_hash)
+        if existing:
+            discard_upload(path)
+            logger.info(f"Reusing ingested paper for {file_name} ({content_hash[:12]})")
+            return jsonify({**existing, "file_name": file_name, "deduplicated": True}), 200
+    
+    job = submit_ingestion(get_openai_client(), db, path, file_name, content_hash)
+    
+    return jsonify({
+        "job_id": job.id,
+        "file_name": file_name,
+        "stage": job.stage
+    }), 202
+
+
+@app_routes.route('/upload', methods=['POST'])
+def upload_file():
+    """
+    Store the uploaded paper and queue vector indexing and assistant creation in the background.
+    Returns a job id immediately; poll /upload/status/<job_id> for stage progress.
+    
+    A byte-identical paper that was already ingested is answered directly (200) with its
+    existing assistant_id, vector_store_id and thread_id, unless force_reingest is set.
+    """
+    try:
+        uploaded_file = request.files.get("file")
+        if uploaded_file is None or not uploaded_file.filename:
+            return jsonify({"error": "No file provided"}), 400
+        
+        force_reingest = request.form.get("force_reingest", "false").lower() in ("1", "true", "yes")
+        
+        path, content_hash = store_upload(uploaded_file)
+        
+        return ingestion_response(path, uploaded_file.filename, content_hash, force_reingest)
+    
+    except Exception as e:
+        logger.error(f"Error in upload_file: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app_routes.route('/upload/status/<job_id>', methods=['GET'])
+def upload_status(job_id):
+    """
+    Report ingestion progress: stage (file_stored, vector_indexing, assistant_created),
+    completed/total stages, and once completed the assistant_id, vector_store_id and thread_id.
+    """
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown upload job id"}), 404
+    
+    status = job.snapshot()
+    return jsonify({
+        "job_id": status["job_id"],
+        "status": status["status"],
+        "stage": status["stage"],
+        "completed": status["completed"],
+        "total": status["total"],
+        "error": status["error"],
+        **(status["result"] or {})
+    }), 200
+
+
+@app_routes.route('/upload/chunked/init', methods=['POST'])
+def chunked_upload_init():
+    """
+    Start a chunked upload of {"file_name", "size"}. Returns upload_id, offset and chunk_size.
+    """
+    try:
+        data = request.json
+        upload = init_upload(data.get("file_name"), int(data.get("size", 0)))
+        return jsonify(upload), 201
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in chunked_upload_init: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app_routes.route('/upload/chunked/<upload_id>', methods=['GET'])
+def chunked_upload_status(upload_id):
+    """
+    Report how many bytes of a chunked upload have arrived, so a client can resume from offset.
+    """
+    try:
+        return jsonify(get_upload_status(upload_id)), 200
+    except KeyError:
+        return jsonify({"error": "Unknown upload id"}), 404
+
+
+@app_routes.route('/upload/chunked/<upload_id>', methods=['PUT'])
+def chunked_upload_put(upload_id):
+    """
+    Append the raw request body at ?offset=<n>. A chunk at the wrong offset gets 409 with
+    the offset the server expects, so replays and resumes are safe.
+    """
+    try:
+        offset = int(request.args.get("offset", -1))
+        offset = append_chunk(upload_id, offset, request.stream, request.content_length or 0)
+        return jsonify({"upload_id": upload_id, "offset": offset}), 200
+    except KeyError:
+        return jsonify({"error": "Unknown upload id"}), 404
+    except ChunkOffsetError as e:
+        return jsonify({"error": str(e), "offset": e.expected_offset}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in chunked_upload_put: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app_routes.route('/upload/chunked/<upload_id>/finalize', methods=['POST'])
+def chunked_upload_finalize(upload_id):
+    """
+    Complete a chunked upload and hand it to ingestion; responds like /upload (200 or 202).
+    """
+    try:
+        data = request.json or {}
+        path, file_name, content_hash = finalize_upload(upload_id)
+        return ingestion_response(path, file_name, content_hash, bool(data.get("force_reingest", False)))
+    except KeyError:
+        return jsonify({"error": "Unknown upload id"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        logger.error(f"Error in chunked_upload_finalize: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+import json
+from structured_endpoints import structure_section_result, save_section_result, load_section_result
+
+
+@app_routes.after_app_request
+def attach_structured_endpoints(response):
+    """
+    Add a validated "endpoints" object to /<section>/generate_results_of_checkbox_prompts
+    responses and persist it with the section text when the request names a file_name,
+    so UIs no longer parse the free text themselves.
+    """
+    if not request.path.endswith("/generate_results_of_checkbox_prompts") or response.status_code != 200:
+        return response
+    
+    try:
+        section = request.path.strip("/").split("/")[0]
+        result = response.get_json(silent=True)
+        if not isinstance(result, dict):
+            return response
+        
+        endpoints, error = structure_section_result(result.get(section, ""))
+        result["endpoints"] = endpoints
+        result["endpoints_error"] = error
+        
+        file_name = (request.get_json(silent=True) or {}).get("file_name")
+        if file_name:
+            save_section_result(get_db(), file_name, section, result, endpoints)
+        
+        response.set_data(json.dumps(result))
+    except Exception as e:
+        # The section text is still useful without structured endpoints
+        logger.error(f"Error structuring endpoints: {str(e)}")
+    return response
+
+
+@app_routes.route('/<section>/structured_endpoints', methods=['GET'])
+def get_structured_endpoints(section):
+    """
+    Return the stored section text and structured endpoints for ?file_name=,
+    so reruns, other sessions and the Methods and Conclusion tabs skip the LLM call.
+    """
+    file_name = request.args.get("file_name")
+    if not file_name:
+        return jsonify({"error": "file_name is required"}), 400
+    
+    stored = load_section_result(get_db(), file_name, section)
+    if stored is None:
+        return jsonify({"error": f"No generated {section} found for {file_name}"}), 404
+    
+    stored["updated_at"] = stored["updated_at"].isoformat()
+    return jsonify(stored), 200
+
+
+from flask import send_file
+from export_builder import normalize_export_options, build_export, export_download_name, EXPORT_FORMATS
+from datetime import datetime
+from saved_responses import (
+    PAPER_SECTIONS, SAVED_RESPONSE_PROJECTIONS, SAVED_RESPONSES_PAGE_SIZE, SAVED_RESPONSES_MAX_PAGE_SIZE,
+    count_saved_responses, page_saved_responses, serialize_saved_response, save_section_response
+)
+
+
+@app_routes.route('/export/build', methods=['POST'])
+def export_build():
+    """
+    Build the paper from the saved section responses in the requested format (docx, pdf,
+    html or markdown) and stream it back as a download.
+
+    Built documents are cached by a hash of the included content and options, so
+    re-exporting an unchanged paper is served straight from disk (X-Export-Cache: hit).
+    """
+    try:
+        data = request.json
+        file_name = data.get("file_name")
+        
+        if not file_name:
+            return jsonify({"error": "file_name is required"}), 400
+        
+        try:
+            options = normalize_export_options(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        path, cache_key, cache_hit = build_export(get_db(), file_name, options)
+        
+        response = send_file(
+            path,
+            mimetype=EXPORT_FORMATS[options["format"]][1],
+            as_attachment=True,
+            download_name=export_download_name(file_name, options["format"]),
+            etag=cache_key
+        )
+        response.headers["X-Export-Cache"] = "hit" if cache_hit else "miss"
+        return response
+    
+    except Exception as e:
+        logger.error(f"Error in export_build: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app_routes.route('/export/get_saved_responses', methods=['GET'])
+def get_saved_responses():
+    """
+    Saved section responses for ?file_name=, one page per section.
+
+    Query parameters:
+        sections: Comma-separated sections to return responses for (default: none, counts only)
+        fields: "text" (default), "citations" to add citation arrays, or "full"
+        page, page_size: 1-based page and responses per page, applied to each section
+        updated_since: ISO timestamp; only responses updated after it are returned
+
+    Always returns the per-section counts, and a server_time to pass back as updated_since.
+    """
+    try:
+        file_name = request.args.get("file_name")
+        if not file_name:
+            return jsonify({"error": "file_name is required"}), 400
+        
+        sections = [s for s in request.args.get("sections", "").split(",") if s]
+        unknown = [s for s in sections if s not in PAPER_SECTIONS]
+        if unknown:
+            return jsonify({"error": f"Unknown sections: {', '.join(unknown)}"}), 400
+        
+        fields = request.args.get("fields", "text")
+        if fields not in SAVED_RESPONSE_PROJECTIONS:
+            return jsonify({"error": f"fields must be one of {', '.join(SAVED_RESPONSE_PROJECTIONS)}"}), 400
+        
+        try:
+            page = max(int(request.args.get("page", 1)), 1)
+            page_size = min(max(int(request.args.get("page_size", SAVED_RESPONSES_PAGE_SIZE)), 1),
+                            SAVED_RESPONSES_MAX_PAGE_SIZE)
+            updated_since = request.args.get("updated_since")
+            updated_since = datetime.fromisoformat(updated_since) if updated_since else None
+        except ValueError as e:
+            return jsonify({"error": f"Invalid paging parameter: {e}"}), 400
+        
+        # Taken before reading, so a save that lands during this request is picked up next time
+        server_time = datetime.utcnow()
+        db = get_db()
+        
+        result = {
+            "file_name": file_name,
+            "fields": fields,
+            "server_time": server_time.isoformat(),
+            "counts": count_saved_responses(db, file_name),
+            "sections": {}
+        }
+        for section in sections:
+            docs, has_more = page_saved_responses(
+                db, file_name, section, SAVED_RESPONSE_PROJECTIONS[fields], page, page_size, updated_since
+            )
+            # One citation lookup per page; a text-only projection carries no ids to resolve
+            expand_citations(db, docs)
+            result["sections"][section] = {
+                "items": [serialize_saved_response(doc) for doc in docs],
+                "page": page,
+                "page_size": page_size,
+                "has_more": has_more
+            }
+        
+        return jsonify(result), 200
+    
+    except Exception as e:
+        logger.error(f"Error in get_saved_responses: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app_routes.route('/<section>/save_<kind>_response', methods=['POST'])
+def save_section_response_route(section, kind):
+    """
+    Save a section response for the export, e.g. /methods/save_methods_response or
+    /discussion/save_discussion_chat_response. Citations are stored once in the citation
+    store and the saved response keeps their ids.
+    """
+    if section not in PAPER_SECTIONS:
+        return jsonify({"error": f"Unknown section: {section}"}), 404
+    
+    try:
+        data = request.json
+        file_name = data.get("file_name")
+        assistant_response = data.get("assistant_response")
+        
+        if not all([file_name, assistant_response]):
+            return jsonify({"error": "Missing file_name or assistant_response"}), 400
+        
+        doc_id = save_section_response(
+            get_db(),
+            file_name,
+            section,
+            data.get("user_query"),
+            assistant_response,
+            data.get("citations", []),
+            thread_id=data.get("thread_id"),
+            selected_endpoint=data.get("selected_endpoint"),
+            selected_category=data.get("selected_category")
+        )
+        
+        return jsonify({
+            "message": f"{section.title()} response saved successfully!",
+            "document_id": doc_id
+        }), 200
+    
+    except Exception as e:
+        logger.error(f"Error in save_{kind}_response: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
 @app_routes.route('/save_endpoint_response', methods=['POST'])
 def save_endpoint_response():
     """
@@ -13,6 +606,7 @@ def save_endpoint_response():
         thread_id = data.get("thread_id")
         selected_bullet = data.get("selected_bullet")
         selected_category = data.get("selected_category")
+        is_subgroup = data.get("is_subgroup")  # None lets the prompt classifier decide
 
         # Validate required fields
         if not all([file_name, user_query, assistant_response, selected_bullet, selected_category]):
@@ -20,8 +614,8 @@ def save_endpoint_response():
                 "error": "Missing required fields. Please provide file_name, user_query, assistant_response, selected_bullet, and selected_category."
             }), 400
             
-        # Connect to MongoDB
-        db = connect_mongo()
+        # Shared, pooled MongoDB connection
+        db = get_db()
         
         # Save the endpoint data using our dedicated function
         doc_id = save_endpoint_data(
@@ -32,7 +626,8 @@ def save_endpoint_response():
             user_query,
             assistant_response,
             citations,
-            thread_id
+            thread_id,
+            is_subgroup
         )
 
         return jsonify({
@@ -67,8 +662,12 @@ def save_endpoint_response():
 import os
 import logging
 from datetime import datetime
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from dotenv import load_dotenv
+from endpoint_cache import bump_file_version
+from citation_store import store_citations, expand_citations
+from prompt_classifier import is_subgroup_prompt, sorted_tags
 
 # Load environment variables
 load_dotenv()
@@ -77,10 +676,15 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def save_endpoint_data(db, file_name, endpoint_category, endpoint_name, user_query, assistant_response, citations, thread_id=None):
+def save_endpoint_data(db, file_name, endpoint_category, endpoint_name, user_query, assistant_response, citations, thread_id=None,
+                       is_subgroup=None):
     """
     Save endpoint data to a dedicated collection in MongoDB.
     
+    Uses a single atomic upsert, so concurrent saves of the same endpoint cannot
+    race into duplicate documents and the id comes back from one round trip.
+    Relies on the unique endpoint_id index created by db_indexes.ensure_indexes.
+    
     Args:
         db: MongoDB database connection
         file_name (str): The name of the file
@@ -90,6 +694,7 @@ def save_endpoint_data(db, file_name, endpoint_category, endpoint_name, user_que
         assistant_response (str): The assistant's response
         citations (list): List of citations
         thread_id (str, optional): The thread ID from OpenAI
+        is_subgroup (bool, optional): Whether this is a subgroup analysis response; None classifies the query
 
     Returns:
         str: The ID of the inserted/updated document
@@ -100,37 +705,53 @@ def save_endpoint_data(db, file_name, endpoint_category, endpoint_name, user_que
     # Create a unique identifier for the endpoint + file combination
     entry_id = f"{file_name}_{endpoint_category}_{endpoint_name}"
     
-    # Check if the entry already exists
-    existing_entry = collection.find_one({"endpoint_id": entry_id})
+    if is_subgroup is None:
+        is_subgroup = is_subgroup_prompt(user_query)
     
+    now = datetime.utcnow()
     document = {
         "endpoint_id": entry_id,
         "file_name": file_name,
         "endpoint_category": endpoint_category,
         "endpoint_name": endpoint_name,
         "user_query": user_query,
+        # Same classification as the responses saved through code2's save_endpoint_data
+        "type": "subgroup" if is_subgroup else "main",
+        "tags": sorted_tags(user_query),
         "assistant_response": assistant_response,
-        "citations": citations,
+        # Citations live once in the citation store; the entry keeps their ids
+        "citation_ids": store_citations(db, citations),
         "thread_id": thread_id,
-        "updated_at": datetime.utcnow()
+        "updated_at": now
+    }
+    update = {
+        "$set": document,
+        # Drops the inline copy left by saves from before the citation store
+        "$unset": {"citations": ""},
+        # Only stamped when the upsert inserts a new entry
+        "$setOnInsert": {"created_at": now}
     }
     
-    if existing_entry:
-        # Update the existing entry
-        result = collection.update_one(
+    try:
+        result = collection.find_one_and_update(
             {"endpoint_id": entry_id},
-            {"$set": document}
+            update,
+            projection={"_id": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
         )
-        logger.info(f"Updated endpoint data for {entry_id}")
-        return str(existing_entry.get("_id"))
-    else:
-        # Add created_at timestamp for new entries
-        document["created_at"] = document["updated_at"]
-        
-        # Insert a new entry
-        result = collection.insert_one(document)
-        logger.info(f"Saved new endpoint data for {entry_id}")
-        return str(result.inserted_id)
+    except DuplicateKeyError:
+        # Two first-time saves raced on the unique index; the loser now matches the winner's document
+        result = collection.find_one_and_update(
+            {"endpoint_id": entry_id},
+            update,
+            projection={"_id": 1},
+            return_document=ReturnDocument.AFTER
+        )
+    
+    bump_file_version(db, file_name)
+    logger.info(f"Saved endpoint data for {entry_id}")
+    return str(result["_id"])
 
 def get_endpoints_by_category(db, file_name, category=None):
     """
@@ -151,8 +772,8 @@ def get_endpoints_by_category(db, file_name, category=None):
     if category:
         query["endpoint_category"] = category
     
-    # Retrieve and format the results
-    endpoints = list(collection.find(query).sort("created_at", -1))
+    # Retrieve and format the results, resolving every entry's citation ids in one lookup
+    endpoints = expand_citations(db, list(collection.find(query).sort("created_at", -1)))
     
     # Convert MongoDB ObjectId to string for JSON serialization
     for endpoint in endpoints:
@@ -511,8 +1132,8 @@ def get_endpoints_for_methods():
         if not file_name:
             return jsonify({"error": "file_name parameter is required"}), 400
             
-        # Connect to MongoDB
-        db = connect_mongo()
+        # Shared, pooled MongoDB connection
+        db = get_db()
         
         # Access the endpoints collection
         collection = db["endpoints"]
@@ -994,13 +1615,35 @@ def get_endpoints_for_methods():
                                 'file_name': st.session_state.file_name  # Include filename
                             }
                             
-                            # Show generation in progress
-                            with st.spinner("Generating Methods section..."):
-                                # Call the API
-                                response = requests.post(f"{API_BASE_URL}/methods/generate_methods_from_endpoints", json=payload)
+                            # Endpoints are summarized in a background job and merged; poll it until it finishes
+                            response = requests.post(f"{API_BASE_URL}/methods/generate_methods_job", json=payload)
+                            
+                            if response.status_code == 202:
+                                job_id = response.json()["job_id"]
+                                progress_bar = st.progress(0.0)
+                                status_text = st.empty()
+                                # Bounded wait: each status request times out, and the whole poll gives up after 15 minutes
+                                give_up_at = time.time() + 15 * 60
+                                job = None
+                                while time.time() < give_up_at:
+                                    status_response = requests.get(f"{API_BASE_URL}/jobs/{job_id}", timeout=10)
+                                    if status_response.status_code != 200:
+                                        job = {"status": "failed", "error": status_response.json().get("error", "Unable to fetch job status")}
+                                        break
+                                    job = status_response.json()
+                                    progress_bar.progress(min(job["completed"] / (job["total"] or 1), 1.0))
+                                    if job["stage"] == "merging":
+                                        status_text.markdown("Merging endpoint summaries into the Methods section...")
+                                    else:
+                                        status_text.markdown(f"**{job['completed']} / {job['total']}** endpoints summarized")
+                                    if job["status"] in ("completed", "failed"):
+                                        break
+                                    time.sleep(2)
                                 
-                                if response.status_code == 200:
-                                    result = response.json()
+                                if job is None or job["status"] not in ("completed", "failed"):
+                                    st.error("Methods generation is still running after 15 minutes. Generating again reuses the endpoint summaries it has finished.")
+                                elif job["status"] == "completed":
+                                    result = job["result"]
                                     methods_content = result.get("methods_content", "")
                                     citations = result.get("citations", [])
                                     thread_id = result.get("thread_id", None)
@@ -1011,9 +1654,11 @@ def get_endpoints_for_methods():
                                     st.session_state[f"methods_thread_id"] = thread_id
                                     
                                     # Show the generated content
-                                    st.success("✅ Methods section generated successfully!")
+                                    st.success(f"✅ Methods section generated successfully! ({result.get('cached_summaries', 0)} endpoint summaries reused)")
                                 else:
-                                    st.error(f"Error generating methods: {response.json().get('error', 'Unknown error')}")
+                                    st.error(f"Error generating methods: {job.get('error') or 'Unknown error'}")
+                            else:
+                                st.error(f"Error generating methods: {response.json().get('error', 'Unknown error')}")
                         except Exception as e:
                             st.error(f"An error occurred: {e}")
                 
@@ -1082,10 +1727,83 @@ def get_endpoints_for_methods():
 
 
 
+from flask import make_response
+from endpoint_cache import endpoints_cache, get_file_version, make_endpoints_etag
+from subgroup_parser import split_bullets
+
+
+# Fields build_categorized_endpoints leaves out of the endpoint documents it reads
+ENDPOINT_LISTING_PROJECTION = {
+    "citations": 0, "citation_ids": 0, "thread_id": 0,
+    "responses.citations": 0, "responses.citation_ids": 0, "responses.thread_id": 0
+}
+
+
+def build_categorized_endpoints(db, file_name):
+    """
+    Query the endpoints saved for a file and group them by category.
+
+    Args:
+        db: MongoDB database connection
+        file_name (str): The name of the file
+
+    Returns:
+        dict: {"endpoints": {category: [endpoint, ...]}, "count": int, "file_name": str}
+    """
+    collection = db["endpoints"]
+    
+    # Query all endpoints for this file - make sure we're filtering by the file_name
+    file_filter = {"file_name": file_name}
+    # The listing never shows citations or thread ids, so they are not read
+    endpoints = list(collection.find(file_filter, ENDPOINT_LISTING_PROJECTION).sort("endpoint_category", 1))
+    
+    logger.info(f"Found {len(endpoints)} endpoints for file: {file_name}")
+    
+    # Process endpoints into a more structured format by category
+    categorized_endpoints = {}
+    
+    for endpoint in endpoints:
+        # Get the category
+        category = endpoint.get("endpoint_category")
+        
+        # Initialize the category list if it doesn't exist
+        if category not in categorized_endpoints:
+            categorized_endpoints[category] = []
+        
+        entry = {
+            "endpoint_id": endpoint.get("endpoint_id"),
+            "endpoint_name": endpoint.get("endpoint_name"),
+            "assistant_response": endpoint.get("assistant_response"),
+            "updated_at": endpoint.get("updated_at").isoformat() if endpoint.get("updated_at") else None
+        }
+        
+        # The latest subgroup response (responses keep a history, newest last) goes out with its
+        # pre-split bullets; ones saved before bullets were stored are split here, once per cached payload
+        subgroup_responses = [r for r in endpoint.get("responses", []) if r.get("type") == "subgroup"][-1:]
+        if subgroup_responses:
+            entry["subgroup_assistant_responses"] = [r.get("response", "") for r in subgroup_responses]
+            entry["subgroup_bullets"] = [
+                r["bullets"] if "bullets" in r else split_bullets(r.get("response", ""))
+                for r in subgroup_responses
+            ]
+        
+        # Add the endpoint to its category
+        categorized_endpoints[category].append(entry)
+    
+    return {
+        "endpoints": categorized_endpoints,
+        "count": len(endpoints),
+        "file_name": file_name  # Return file_name for confirmation
+    }
+
+
 @methods_bp.route('/get_endpoints_for_methods', methods=['GET'])
 def get_endpoints_for_methods():
     """
     Retrieve all endpoints from the endpoints collection for display in the Methods section.
+
+    The categorized payload is cached per file and version; save_endpoint_data bumps the
+    version. Clients that send If-None-Match with the last ETag get a 304 when nothing changed.
     """
     try:
         # Get file_name from query parameters
@@ -1094,54 +1812,40 @@ def get_endpoints_for_methods():
         if not file_name:
             return jsonify({"error": "file_name parameter is required"}), 400
             
-        # Connect to MongoDB
-        db = connect_mongo()
-        
-        # Access the endpoints collection
-        collection = db["endpoints"]
+        # Shared, pooled MongoDB connection
+        db = get_db()
         
-        # Query all endpoints for this file - make sure we're filtering by the file_name
-        file_filter = {"file_name": file_name}
-        endpoints = list(collection.find(file_filter).sort("endpoint_category", 1))
+        # A single _id lookup decides whether the client's copy is still current
+        version = get_file_version(db, file_name)
+        etag = make_endpoints_etag(file_name, version)
         
-        # Log the search and results
-        logger.info(f"Searching for endpoints with file_name: {file_name}")
-        logger.info(f"Found {len(endpoints)} endpoints for file: {file_name}")
+        if request.if_none_match.contains_weak(etag):
+            response = make_response("", 304)
+            response.set_etag(etag, weak=True)
+            return response
         
-        # Process endpoints into a more structured format by category
-        categorized_endpoints = {}
+        payload = endpoints_cache.get(file_name, version)
+        if payload is None:
+            payload = build_categorized_endpoints(db, file_name)
+            endpoints_cache.put(file_name, version, payload)
         
-        for endpoint in endpoints:
-            # Convert ObjectId to string for JSON serialization
-            if "_id" in endpoint:
-                endpoint["_id"] = str(endpoint["_id"])
-            
-            # Get the category
-            category = endpoint.get("endpoint_category")
-            
-            # Initialize the category list if it doesn't exist
-            if category not in categorized_endpoints:
-                categorized_endpoints[category] = []
-            
-            # Add the endpoint to its category
-            categorized_endpoints[category].append({
-                "endpoint_id": endpoint.get("endpoint_id"),
-                "endpoint_name": endpoint.get("endpoint_name"),
-                "assistant_response": endpoint.get("assistant_response"),
-                "updated_at": endpoint.get("updated_at").isoformat() if endpoint.get("updated_at") else None
-            })
-        
-        return jsonify({
-            "endpoints": categorized_endpoints,
-            "count": len(endpoints),
-            "file_name": file_name  # Return file_name for confirmation
-        }), 200
+        response = make_response(jsonify(payload), 200)
+        response.set_etag(etag, weak=True)
+        return response
     
     except Exception as e:
         logger.error(f"Error in get_endpoints_for_methods: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
+from assistant_registry import AssistantSessionRegistry, get_openai_client
+
+# One AssistantSession per (assistant_id, vector_id), all sharing one pooled OpenAI client
+assistant_sessions = AssistantSessionRegistry(
+    lambda assistant_id, vector_id: AssistantSession(get_openai_client(), assistant_id, vector_id)
+)
+
+
 @methods_bp.route('/generate_methods_from_endpoints', methods=['POST'])
 def generate_methods_from_endpoints():
     """
@@ -1167,11 +1871,8 @@ def generate_methods_from_endpoints():
         logger.info(f"Generating methods for file: {file_name}")
         logger.info(f"Number of endpoints: {len(endpoints)}")
         
-        # Initialize OpenAI client
-        client = OpenAI()
-        
-        # Initialize AssistantSession
-        assistant_session = AssistantSession(client, assistant_id, vector_id)
+        # Reuse the cached AssistantSession (and shared HTTP pool) for this paper
+        assistant_session = assistant_sessions.get(assistant_id, vector_id)
         
         # Create a prompt that incorporates the endpoint data
         endpoint_details = []
@@ -1219,6 +1920,57 @@ def generate_methods_from_endpoints():
         return jsonify({"error": str(e)}), 500
 
 
+from jobs import jobs
+from methods_generation import normalize_methods_endpoints, run_methods_generation
+
+
+@methods_bp.route('/generate_methods_job', methods=['POST'])
+def generate_methods_job():
+    """
+    Queue map/reduce Methods generation as a background job: every selected endpoint is
+    summarized concurrently, then the summaries are merged into the section. Summaries are
+    cached by endpoint_id and updated_at, so only new or re-saved endpoints are summarized again.
+
+    Poll /jobs/<job_id>; a completed job's result holds methods_content, citations and thread_id.
+    """
+    try:
+        data = request.json
+        assistant_id = data.get('assistant_id')
+        vector_id = data.get('vector_id')
+        file_name = data.get('file_name')
+        
+        if not assistant_id or not vector_id:
+            return jsonify({"error": "Missing assistant_id or vector_id"}), 400
+            
+        if not file_name:
+            return jsonify({"error": "Missing file_name"}), 400
+        
+        try:
+            endpoints = normalize_methods_endpoints(data.get('endpoints', []))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        job = jobs.submit(
+            "methods_generate",
+            lambda job: run_methods_generation(
+                job,
+                get_db(),
+                lambda: AssistantSession(get_openai_client(), assistant_id, vector_id),
+                file_name,
+                endpoints
+            ),
+            total=len(endpoints),
+            meta={"file_name": file_name},
+            stage="summarizing"
+        )
+        
+        return jsonify({"job_id": job.id, "total": job.total}), 202
+    
+    except Exception as e:
+        logger.error(f"Error in generate_methods_job: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
 
 
 
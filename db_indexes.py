@@ -0,0 +1,219 @@
+import os
+import sys
+import json
+import argparse
+import logging
+
+from pymongo import IndexModel, ASCENDING, DESCENDING
+
+from mongo_client import get_db
+
+logger = logging.getLogger(__name__)
+
+# Compound indexes matching the query shapes used against the endpoints collection
+ENDPOINT_INDEXES = [
+    # save_endpoint_data upsert: {"endpoint_id": ...}. Partial, because the code2 documents in this
+    # collection have no endpoint_id and would otherwise all collide on null.
+    IndexModel(
+        [("endpoint_id", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"endpoint_id": {"$exists": True}},
+        name="endpoint_id_unique",
+    ),
+    # get_endpoints_by_category without a category: {"file_name": ...} sorted by created_at desc
+    IndexModel([("file_name", ASCENDING), ("created_at", DESCENDING)], name="file_name_created_at"),
+    # get_endpoints_by_category with a category: {"file_name", "endpoint_category"} sorted by created_at desc,
+    # and get_endpoints_for_methods: {"file_name": ...} sorted by endpoint_category (index prefix)
+    IndexModel(
+        [("file_name", ASCENDING), ("endpoint_category", ASCENDING), ("created_at", DESCENDING)],
+        name="file_name_endpoint_category_created_at",
+    ),
+    # code2 save_endpoint_data upsert: {"file_name", "endpoint_text", "category"}. Unique so two
+    # first-time saves cannot both insert; partial because code.py documents have no endpoint_text.
+    IndexModel(
+        [("file_name", ASCENDING), ("endpoint_text", ASCENDING), ("category", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"endpoint_text": {"$exists": True}},
+        name="file_name_endpoint_text_category",
+    ),
+]
+
+# uploads collection: content-hash lookup for upload deduplication
+UPLOAD_INDEXES = [
+    IndexModel([("content_hash", ASCENDING)], unique=True, name="content_hash_unique"),
+]
+
+# section_results collection: one generated section per paper
+SECTION_RESULT_INDEXES = [
+    IndexModel([("file_name", ASCENDING), ("section", ASCENDING)], unique=True, name="file_name_section_unique"),
+]
+
+# saved_responses collection: a paper's saved responses per section, oldest first
+SAVED_RESPONSE_INDEXES = [
+    IndexModel(
+        [("file_name", ASCENDING), ("section", ASCENDING), ("created_at", ASCENDING)],
+        name="file_name_section_created_at",
+    ),
+    IndexModel(
+        [("file_name", ASCENDING), ("section", ASCENDING), ("updated_at", ASCENDING)],
+        name="file_name_section_updated_at",
+    ),
+]
+
+# Seconds a cached methods summary is kept before MongoDB's TTL monitor removes it
+ENDPOINT_SUMMARY_TTL = int(os.getenv("ENDPOINT_SUMMARY_TTL", str(30 * 24 * 60 * 60)))
+
+# endpoint_summaries collection: cached per-endpoint methods summaries expire after ENDPOINT_SUMMARY_TTL
+ENDPOINT_SUMMARY_INDEXES = [
+    IndexModel([("created_at", ASCENDING)], expireAfterSeconds=ENDPOINT_SUMMARY_TTL, name="created_at_ttl"),
+]
+
+# Every (collection, indexes) pair ensure_indexes maintains
+COLLECTION_INDEXES = [
+    ("endpoints", ENDPOINT_INDEXES),
+    ("uploads", UPLOAD_INDEXES),
+    ("section_results", SECTION_RESULT_INDEXES),
+    ("saved_responses", SAVED_RESPONSE_INDEXES),
+    ("endpoint_summaries", ENDPOINT_SUMMARY_INDEXES),
+]
+
+# Stages in a winning plan that mean an index was used
+INDEX_STAGES = {"IXSCAN", "IDHACK", "EXPRESS_IXSCAN", "COUNT_SCAN", "DISTINCT_SCAN"}
+
+
+def _drop_changed_indexes(collection, models):
+    """
+    Drop existing indexes that share a name with one of models but were built with different
+    options, so create_indexes can rebuild them instead of failing with an options conflict.
+    """
+    existing = collection.index_information()
+    for model in models:
+        spec = model.document
+        current = existing.get(spec["name"])
+        if current is None:
+            continue
+        for option in ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds"):
+            if current.get(option) != spec.get(option):
+                logger.info(f"Rebuilding {collection.name} index {spec['name']}: {option} changed")
+                collection.drop_index(spec["name"])
+                break
+
+
+def ensure_indexes(db):
+    """
+    Create the indexes in COLLECTION_INDEXES. Safe to call on every startup.
+
+    MongoDB skips indexes that already exist with the same specification. Indexes whose
+    options changed, such as a new ENDPOINT_SUMMARY_TTL, are dropped and rebuilt.
+
+    Args:
+        db: MongoDB database connection
+
+    Returns:
+        list: Names of the indexes ensured
+    """
+    names = []
+    for collection_name, models in COLLECTION_INDEXES:
+        collection = db[collection_name]
+        _drop_changed_indexes(collection, models)
+        created = collection.create_indexes(models)
+        logger.info(f"Ensured {collection_name} indexes: {', '.join(created)}")
+        names += created
+    return names
+
+
+def endpoint_query_shapes(file_name, category="primary", endpoint_text="sample endpoint"):
+    """
+    Return the (label, filter, sort) query shapes issued against the endpoints collection.
+
+    Args:
+        file_name (str): File name to plug into the filters
+        category (str): Category to plug into the category-filtered shapes
+        endpoint_text (str): Endpoint text for the code2 lookup
+    """
+    return [
+        ("save_endpoint_data", {"endpoint_id": f"{file_name}_{category}_{endpoint_text}"}, None),
+        ("get_endpoints_by_category", {"file_name": file_name}, [("created_at", DESCENDING)]),
+        ("get_endpoints_by_category (category)", {"file_name": file_name, "endpoint_category": category},
+         [("created_at", DESCENDING)]),
+        ("get_endpoints_for_methods", {"file_name": file_name}, [("endpoint_category", ASCENDING)]),
+        ("code2 save_endpoint_data", {"file_name": file_name, "endpoint_text": endpoint_text, "category": category},
+         None),
+    ]
+
+
+def _plan_stages(plan):
+    """Walk a winning plan tree and yield (stage, index_name) pairs."""
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        yield node.get("stage"), node.get("indexName")
+        if "inputStage" in node:
+            stack.append(node["inputStage"])
+        stack.extend(node.get("inputStages", []))
+
+
+def explain_queries(db, file_name, category="primary", endpoint_text="sample endpoint"):
+    """
+    Run explain() on each endpoints query shape and report whether it is served by an index.
+
+    Returns:
+        list: One dict per query with label, used_index, index names, in_memory_sort and stages
+    """
+    collection = db["endpoints"]
+    report = []
+    for label, query, sort in endpoint_query_shapes(file_name, category, endpoint_text):
+        cursor = collection.find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        # Newer servers wrap the classic plan under queryPlan
+        plan = plan.get("queryPlan", plan)
+
+        stages = list(_plan_stages(plan))
+        report.append({
+            "query": label,
+            "used_index": any(stage in INDEX_STAGES for stage, _ in stages),
+            "indexes": sorted({name for _, name in stages if name}),
+            "in_memory_sort": any(stage == "SORT" for stage, _ in stages),
+            "stages": [stage for stage, _ in stages],
+        })
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage indexes on the endpoints collection.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("ensure", help="Create any missing indexes")
+
+    explain_parser = subparsers.add_parser("explain", help="Report whether each endpoints query uses an index")
+    explain_parser.add_argument("--file-name", required=True, help="File name to plug into the query filters")
+    explain_parser.add_argument("--category", default="primary")
+    explain_parser.add_argument("--endpoint-text", default="sample endpoint")
+    explain_parser.add_argument("--json", action="store_true", help="Print the raw report as JSON")
+
+    args = parser.parse_args(argv)
+    db = get_db()
+
+    if args.command == "ensure":
+        for name in ensure_indexes(db):
+            print(name)
+        return 0
+
+    report = explain_queries(db, args.file_name, args.category, args.endpoint_text)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for entry in report:
+            status = "INDEX" if entry["used_index"] else "COLLSCAN"
+            sort_note = " + in-memory sort" if entry["in_memory_sort"] else ""
+            indexes = ", ".join(entry["indexes"]) or "-"
+            print(f"{status:8} {entry['query']:40} {indexes}{sort_note}")
+    # Non-zero exit when any query falls back to a collection scan, so this can gate deploys
+    return 0 if all(entry["used_index"] for entry in report) else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
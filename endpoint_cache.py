@@ -0,0 +1,79 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Collection holding one {"_id": file_name, "version": n} counter per file
+VERSION_COLLECTION = "endpoint_versions"
+
+MAX_CACHED_FILES = int(os.getenv("ENDPOINT_CACHE_MAX_FILES", "256"))
+
+
+def get_file_version(db, file_name):
+    """
+    Return the current endpoint-list version for a file.
+
+    Args:
+        db: MongoDB database connection
+        file_name (str): The name of the file
+
+    Returns:
+        int: The version counter, 0 if nothing has been saved yet
+    """
+    doc = db[VERSION_COLLECTION].find_one({"_id": file_name}, {"version": 1})
+    return doc.get("version", 0) if doc else 0
+
+
+def bump_file_version(db, file_name):
+    """Increment the endpoint-list version for a file so cached payloads and ETags go stale."""
+    db[VERSION_COLLECTION].update_one({"_id": file_name}, {"$inc": {"version": 1}}, upsert=True)
+
+
+def make_endpoints_etag(file_name, version):
+    """Build the (unquoted) ETag value for a file's endpoint list at a given version."""
+    file_hash = hashlib.sha1(file_name.encode("utf-8")).hexdigest()[:16]
+    return f"{file_hash}-{version}"
+
+
+class CategorizedEndpointCache:
+    """
+    Size-bounded, thread-safe LRU cache of categorized endpoint payloads.
+
+    Entries are keyed by file name and tagged with the version they were built at,
+    so a lookup with a newer version is a miss and the stale entry is replaced.
+    """
+
+    def __init__(self, max_files=MAX_CACHED_FILES):
+        self.max_files = max_files
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, file_name, version):
+        """Return the cached payload for file_name at version, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(file_name)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(file_name)
+            return entry[1]
+
+    def put(self, file_name, version, payload):
+        """Store the payload built for file_name at version, evicting the least recently used file."""
+        with self._lock:
+            self._entries[file_name] = (version, payload)
+            self._entries.move_to_end(file_name)
+            while len(self._entries) > self.max_files:
+                evicted, _ = self._entries.popitem(last=False)
+                logger.info(f"Evicted cached endpoints for {evicted}")
+
+    def invalidate(self, file_name):
+        """Drop the cached payload for a file."""
+        with self._lock:
+            self._entries.pop(file_name, None)
+
+
+# Process-wide cache used by the methods blueprint
+endpoints_cache = CategorizedEndpointCache()
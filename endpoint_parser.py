@@ -0,0 +1,186 @@
+import re
+import ast
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Where an endpoints dictionary can start: "endpoints = {" or a bare {"primary": ...} literal
+ENDPOINTS_START_PATTERNS = [
+    re.compile(r"endpoints\s*=\s*(?=\{)"),
+    re.compile(r"(?=\{\s*['\"]primary['\"])"),
+]
+
+# Characters the block scanner stops at, and the end of each kind of quoted string
+_STRUCTURAL_CHARS = re.compile(r"[{}'\"]")
+_STRING_END = {
+    "'": re.compile(r"\\.|'", re.DOTALL),
+    '"': re.compile(r'\\.|"', re.DOTALL),
+}
+
+# Parsed responses memoized by content hash; Streamlit reruns hit this on every interaction
+ENDPOINT_PARSE_CACHE_SIZE = 128
+
+_parse_cache = OrderedDict()
+_parse_cache_lock = threading.Lock()
+
+
+def find_block_end(text, start):
+    """
+    Return the index just past the brace that closes the "{" at text[start], or -1.
+
+    Single forward pass: jumps between braces and quotes with precompiled patterns, tracks
+    nesting depth and skips the contents of single- or double-quoted strings (honouring
+    backslash escapes), so prose after the block that contains "}" is never swallowed.
+    """
+    depth = 0
+    pos = start
+    while True:
+        match = _STRUCTURAL_CHARS.search(text, pos)
+        if match is None:
+            return -1
+        char = match.group()
+        pos = match.end()
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return pos
+        else:
+            string_end = _STRING_END[char]
+            while True:
+                end = string_end.search(text, pos)
+                if end is None:
+                    return -1
+                pos = end.end()
+                if end.group() == char:
+                    break
+
+
+def parse_literal(block):
+    """
+    Parse a dictionary literal, trying JSON first and falling back to ast.literal_eval
+    for Python-style literals (single quotes, True/None, trailing commas).
+
+    Raises:
+        ValueError: If the block is neither valid JSON nor a Python literal
+    """
+    try:
+        return json.loads(block)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(block)
+    except (SyntaxError, ValueError) as e:
+        raise ValueError(f"Could not parse endpoints block: {str(e)}")
+
+
+def extract_endpoints(response):
+    """
+    Find and parse the endpoints dictionary in an assistant response.
+
+    Args:
+        response (str): Section response text
+
+    Returns:
+        dict or None: The endpoints dictionary, or None when no parseable block is found
+    """
+    for pattern in ENDPOINTS_START_PATTERNS:
+        for match in pattern.finditer(response):
+            start = match.end()
+            end = find_block_end(response, start)
+            if end == -1:
+                continue
+            try:
+                endpoints = parse_literal(response[start:end])
+            except ValueError as e:
+                logger.warning(str(e))
+                continue
+            if isinstance(endpoints, dict):
+                return endpoints
+    return None
+
+
+def parse_endpoints(response):
+    """
+    Memoized extract_endpoints keyed by the SHA-256 of the response.
+    The returned dictionary is shared between calls and must be treated as read-only.
+    """
+    if not response:
+        return None
+
+    key = hashlib.sha256(response.encode("utf-8")).hexdigest()
+    with _parse_cache_lock:
+        if key in _parse_cache:
+            _parse_cache.move_to_end(key)
+            return _parse_cache[key]
+
+    endpoints = extract_endpoints(response)
+
+    with _parse_cache_lock:
+        _parse_cache[key] = endpoints
+        while len(_parse_cache) > ENDPOINT_PARSE_CACHE_SIZE:
+            _parse_cache.popitem(last=False)
+    return endpoints
+
+
+def _synthetic_response(endpoint_count, prose_paragraphs):
+    """Build a large section response with an endpoints block followed by prose containing braces."""
+    endpoints = {
+        "primary": [f"Change from baseline in outcome {i} at week {i % 52}" for i in range(endpoint_count)],
+        "secondary": {
+            f"group {g}": [f"Secondary measure {g}.{i} (n={i * 3})" for i in range(endpoint_count // 10)]
+            for g in range(10)
+        },
+        "safety": [f"Adverse event class {i}" for i in range(endpoint_count // 4)],
+    }
+    prose = " ".join(
+        f"Paragraph {p}: the model reported {{effect}} estimates with CI {{lower, upper}} for arm {p}."
+        for p in range(prose_paragraphs)
+    )
+    return f"Here are the endpoints I found.\n\nendpoints = {endpoints!r}\n\n{prose}"
+
+
+def _benchmark(endpoint_count=2000, prose_paragraphs=5000, rounds=5):
+    """Compare the old greedy regex + literal_eval with the scanner, cold and memoized."""
+    import time
+
+    response = _synthetic_response(endpoint_count, prose_paragraphs)
+    print(f"response size: {len(response) / 1024:.0f} KiB")
+
+    def legacy(text):
+        match = re.search(r"endpoints = ({.*})", text, re.DOTALL)
+        if not match:
+            return None
+        try:
+            return ast.literal_eval(match.group(1))
+        except (SyntaxError, ValueError):
+            return None
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        legacy_result = legacy(response)
+    legacy_ms = (time.perf_counter() - started) * 1000 / rounds
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        scanned = extract_endpoints(response)
+    scan_ms = (time.perf_counter() - started) * 1000 / rounds
+
+    parse_endpoints(response)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        parse_endpoints(response)
+    cached_ms = (time.perf_counter() - started) * 1000 / rounds
+
+    print(f"regex + literal_eval: {legacy_ms:8.2f} ms  (parsed: {legacy_result is not None})")
+    print(f"brace scanner:        {scan_ms:8.2f} ms  (parsed: {scanned is not None})")
+    print(f"memoized:             {cached_ms:8.2f} ms")
+
+
+if __name__ == "__main__":
+    _benchmark()
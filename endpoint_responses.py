@@ -0,0 +1,142 @@
+import os
+import time
+import logging
+from datetime import datetime
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Responses kept per type ("main", "subgroup") on each endpoint document; 0 keeps every response.
+# Saves used to replace the response of the same type in place; 1 restores that behavior
+RESPONSE_HISTORY_LIMIT = int(os.getenv("RESPONSE_HISTORY_LIMIT", "5"))
+
+
+def build_response_update(response_type, response_obj, now, history_limit=RESPONSE_HISTORY_LIMIT):
+    """
+    Build the pipeline update that appends response_obj to the responses array, keeping the
+    other types untouched and at most history_limit responses of response_type (newest last).
+
+    The response is wrapped in $literal so text that starts with "$" is never read as a field path.
+
+    Returns:
+        list: Update pipeline for update_one / find_one_and_update
+    """
+    responses = {"$ifNull": ["$responses", []]}
+    same_type = {"$filter": {"input": responses, "as": "r", "cond": {"$eq": ["$$r.type", response_type]}}}
+    other_types = {"$filter": {"input": responses, "as": "r", "cond": {"$ne": ["$$r.type", response_type]}}}
+
+    history = {"$concatArrays": [same_type, [{"$literal": response_obj}]]}
+    if history_limit:
+        history = {"$slice": [history, -history_limit]}
+
+    return [{
+        "$set": {
+            "responses": {"$concatArrays": [other_types, history]},
+            "updated_at": {"$literal": now},
+            "created_at": {"$ifNull": ["$created_at", {"$literal": now}]},
+        }
+    }]
+
+
+def append_endpoint_response(db, file_name, category, endpoint_text, response_obj, history_limit=RESPONSE_HISTORY_LIMIT):
+    """
+    Append a response to an endpoint document in one atomic round trip, creating the
+    document if needed. Concurrent saves each land in the array instead of overwriting
+    one another, and nothing is read back except the document id. Relies on the unique
+    file_name_endpoint_text_category index created by db_indexes.ensure_indexes.
+
+    Args:
+        db: MongoDB database connection
+        file_name (str): Name of the file
+        category (str): Category of the endpoint
+        endpoint_text (str): Text of the endpoint
+        response_obj (dict): Response with at least a "type" of "main" or "subgroup"
+        history_limit (int): Responses kept for this type; 0 keeps every response
+
+    Returns:
+        str: Document ID of the saved/updated endpoint
+    """
+    query = {"file_name": file_name, "endpoint_text": endpoint_text, "category": category}
+    update = build_response_update(response_obj["type"], response_obj, datetime.utcnow(), history_limit)
+    try:
+        result = db.endpoints.find_one_and_update(
+            query, update, projection={"_id": 1}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Two first-time saves raced on the unique index; the loser now appends to the winner's document
+        result = db.endpoints.find_one_and_update(
+            query, update, projection={"_id": 1}, return_document=ReturnDocument.AFTER
+        )
+    return str(result["_id"])
+
+
+def _benchmark(db=None, stored_counts=(10, 100, 1000), writes=100, response_size=2000):
+    """
+    Time saves against endpoint documents that already hold many responses, on a scratch
+    file_name in the configured database. Requires a running MongoDB.
+    """
+    if db is None:
+        from mongo_client import get_db
+        db = get_db()
+
+    file_name = f"__benchmark_{os.getpid()}"
+    text = "x" * response_size
+
+    def response(kind, i):
+        return {"type": kind, "prompt": f"prompt {i}", "response": text, "citations": [], "thread_id": None,
+                "created_at": datetime.utcnow(), "updated_at": datetime.utcnow()}
+
+    def seed(endpoint_text, count):
+        db.endpoints.insert_one({
+            "file_name": file_name, "endpoint_text": endpoint_text, "category": "primary",
+            # Subgroup responses first, so the legacy scan walks most of the array before a "main" match
+            "responses": [response("subgroup", i) for i in range(count - 1)] + [response("main", count)],
+            "created_at": datetime.utcnow(), "updated_at": datetime.utcnow(),
+        })
+
+    def legacy_save(endpoint_text, response_obj):
+        # The previous code2 write path: read the document, scan responses, replace by index
+        query = {"file_name": file_name, "endpoint_text": endpoint_text, "category": "primary"}
+        existing_doc = db.endpoints.find_one(query)
+        for i, resp in enumerate(existing_doc.get("responses", [])):
+            if resp.get("type") == response_obj["type"]:
+                db.endpoints.update_one(
+                    {"_id": existing_doc["_id"], f"responses.{i}.type": response_obj["type"]},
+                    {"$set": {f"responses.{i}": response_obj, "updated_at": datetime.utcnow()}}
+                )
+                return str(existing_doc["_id"])
+        db.endpoints.update_one(
+            {"_id": existing_doc["_id"]},
+            {"$push": {"responses": response_obj}, "$set": {"updated_at": datetime.utcnow()}}
+        )
+        return str(existing_doc["_id"])
+
+    def timed(save):
+        started = time.perf_counter()
+        for i in range(writes):
+            save(response("main", i))
+        return (time.perf_counter() - started) * 1000 / writes
+
+    print(f"{'stored':>8} {'read-modify-write':>18} {'pipeline':>10} {'pipeline (cap 5)':>17}")
+    try:
+        for count in stored_counts:
+            for name in ("legacy", "pipeline", "capped"):
+                seed(f"{name} {count}", count)
+
+            legacy_ms = timed(lambda r: legacy_save(f"legacy {count}", r))
+            pipeline_ms = timed(lambda r: append_endpoint_response(db, file_name, "primary", f"pipeline {count}", r, 0))
+            capped_ms = timed(lambda r: append_endpoint_response(db, file_name, "primary", f"capped {count}", r, 5))
+
+            print(f"{count:>8} {legacy_ms:>15.2f} ms {pipeline_ms:>7.2f} ms {capped_ms:>14.2f} ms")
+    finally:
+        db.endpoints.delete_many({"file_name": file_name})
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,249 @@
+import re
+import bisect
+import hashlib
+import threading
+from collections import OrderedDict, defaultdict, namedtuple
+
+# One row of the rendered endpoint tree. key is None for subheaders; otherwise it is the
+# checkbox widget key and label doubles as the selected bullet text.
+EndpointRecord = namedtuple("EndpointRecord", ["path", "label", "key", "category"])
+
+# Flattened trees memoized by response hash; one entry per paper the session has open
+ENDPOINT_TREE_CACHE_SIZE = 32
+
+_tree_cache = OrderedDict()
+_tree_cache_lock = threading.Lock()
+
+
+def generate_unique_key(*args):
+    """Checkbox widget key: MD5 of the joined arguments (unchanged, so ticked boxes survive)."""
+    return hashlib.md5("".join(map(str, args)).encode("utf-8")).hexdigest()
+
+
+def _flatten_category(name, item, records):
+    # Same stack walk and ordering as the original display_endpoints, emitting records
+    # instead of widgets
+    category = None
+    stack = [((name,), name, item)]
+    while stack:
+        path, current_name, current_item = stack.pop()
+
+        if isinstance(current_item, dict):
+            records.append(EndpointRecord(path, current_name, None, None))
+            category = current_name
+            for sub_key, sub_value in current_item.items():
+                if isinstance(sub_value, dict):
+                    stack.append((path + (sub_key,), f"{sub_key} (nested dictionary)", sub_value))
+                elif isinstance(sub_value, list):
+                    records.append(EndpointRecord(path + (sub_key,), f"{sub_key} (list)", None, None))
+                    for list_item in sub_value:
+                        records.append(EndpointRecord(
+                            path + (sub_key, str(list_item)), str(list_item),
+                            generate_unique_key(sub_key, list_item), category
+                        ))
+                else:
+                    records.append(EndpointRecord(
+                        path + (sub_key,), f"{sub_key}: {sub_value}",
+                        generate_unique_key(sub_key, sub_value), category
+                    ))
+
+        elif isinstance(current_item, list):
+            records.append(EndpointRecord(path, current_name, None, None))
+            category = current_name
+            for list_item in current_item:
+                records.append(EndpointRecord(
+                    path + (str(list_item),), str(list_item),
+                    generate_unique_key(current_name, list_item), category
+                ))
+
+        else:
+            records.append(EndpointRecord(
+                path, f"{current_name}: {current_item}",
+                generate_unique_key(current_name, current_item), category
+            ))
+
+
+def flatten_endpoints(endpoints):
+    """
+    Flatten an endpoints dictionary ({major_category: dict | list}) into EndpointRecords
+    in display order.
+
+    Returns:
+        tuple: EndpointRecord rows; subheaders have key None
+    """
+    records = []
+    for major_category, item in endpoints.items():
+        _flatten_category(major_category, item, records)
+    return tuple(records)
+
+
+def get_endpoint_records(response_text, endpoints):
+    """
+    Return the flattened records for endpoints, memoized by the SHA-256 of the response
+    they were parsed from, so a rerun hashes one string instead of every bullet.
+    """
+    key = hashlib.sha256(response_text.encode("utf-8")).hexdigest()
+    with _tree_cache_lock:
+        if key in _tree_cache:
+            _tree_cache.move_to_end(key)
+            return _tree_cache[key]
+
+    records = flatten_endpoints(endpoints)
+
+    with _tree_cache_lock:
+        _tree_cache[key] = records
+        while len(_tree_cache) > ENDPOINT_TREE_CACHE_SIZE:
+            _tree_cache.popitem(last=False)
+    return records
+
+
+_TOKEN = re.compile(r"\w+")
+
+
+def _tokenize(text):
+    return _TOKEN.findall(str(text).lower())
+
+
+class EndpointSearchIndex:
+    """
+    Inverted index over endpoint labels, built once per endpoint set.
+
+    search() matches every query word as a prefix of some word in the text ("hba1c wee"
+    finds "Change in HbA1c at week 26") by bisecting a sorted token list, instead of
+    scanning every label on every keystroke.
+    """
+
+    def __init__(self, entries):
+        """
+        Args:
+            entries: Iterable of (item, text) pairs; items are returned by search() in this order
+        """
+        self.items = []
+        postings = defaultdict(set)
+        for position, (item, text) in enumerate(entries):
+            self.items.append(item)
+            for token in _tokenize(text):
+                postings[token].add(position)
+        self._postings = dict(postings)
+        self._tokens = sorted(self._postings)
+
+    def _prefix_positions(self, prefix):
+        positions = set()
+        i = bisect.bisect_left(self._tokens, prefix)
+        while i < len(self._tokens) and self._tokens[i].startswith(prefix):
+            positions |= self._postings[self._tokens[i]]
+            i += 1
+        return positions
+
+    def search(self, query):
+        """Return the items whose text matches every word of query (all items for an empty query)."""
+        terms = _tokenize(query or "")
+        if not terms:
+            return list(self.items)
+        matches = None
+        for term in terms:
+            positions = self._prefix_positions(term)
+            matches = positions if matches is None else matches & positions
+            if not matches:
+                return []
+        return [self.items[position] for position in sorted(matches)]
+
+    def __len__(self):
+        return len(self.items)
+
+
+def get_endpoint_index(response_text, records):
+    """
+    Search index over the checkbox records of a flattened tree, memoized with the tree.
+    """
+    key = "index:" + hashlib.sha256(response_text.encode("utf-8")).hexdigest()
+    with _tree_cache_lock:
+        if key in _tree_cache:
+            _tree_cache.move_to_end(key)
+            return _tree_cache[key]
+
+    index = EndpointSearchIndex(
+        (record, " ".join(record.path)) for record in records if record.key is not None
+    )
+
+    with _tree_cache_lock:
+        _tree_cache[key] = index
+        while len(_tree_cache) > ENDPOINT_TREE_CACHE_SIZE:
+            _tree_cache.popitem(last=False)
+    return index
+
+
+def paginate(items, page, page_size):
+    """
+    Slice out one page of items.
+
+    Returns:
+        tuple: (page_items, page, page_count) with page clamped to 1..page_count
+    """
+    page_count = max(1, -(-len(items) // page_size))
+    page = min(max(page, 1), page_count)
+    start = (page - 1) * page_size
+    return items[start:start + page_size], page, page_count
+
+
+def _synthetic_endpoints(endpoint_count):
+    per_group = max(endpoint_count // 20, 1)
+    return {
+        "primary": [f"Change from baseline in outcome {i} at week {i % 52}" for i in range(endpoint_count // 2)],
+        "secondary": {
+            f"group {g}": [f"Secondary measure {g}.{i}" for i in range(per_group)] for g in range(10)
+        },
+    }
+
+
+def _benchmark(endpoint_counts=(50, 200, 1000, 5000), reruns=200):
+    """Per-rerun cost of walking + hashing the tree versus iterating the cached records."""
+    import time
+
+    ticked = set()
+
+    def legacy_rerun(endpoints):
+        # The original display_endpoints, with st.checkbox replaced by a set lookup
+        for name, item in endpoints.items():
+            stack = [(name, item)]
+            while stack:
+                current_name, current_item = stack.pop()
+                if isinstance(current_item, dict):
+                    for sub_key, sub_value in current_item.items():
+                        if isinstance(sub_value, dict):
+                            stack.append((f"{sub_key} (nested dictionary)", sub_value))
+                        elif isinstance(sub_value, list):
+                            for list_item in sub_value:
+                                _ = generate_unique_key(sub_key, list_item) in ticked
+                        else:
+                            _ = generate_unique_key(sub_key, sub_value) in ticked
+                elif isinstance(current_item, list):
+                    for list_item in current_item:
+                        _ = generate_unique_key(current_name, list_item) in ticked
+
+    def cached_rerun(response_text, endpoints):
+        for record in get_endpoint_records(response_text, endpoints):
+            if record.key is not None:
+                _ = record.key in ticked
+
+    print(f"{'endpoints':>10} {'walk + md5':>14} {'cached':>12}")
+    for count in endpoint_counts:
+        endpoints = _synthetic_endpoints(count)
+        response_text = f"endpoints = {endpoints!r}"
+
+        started = time.perf_counter()
+        for _ in range(reruns):
+            legacy_rerun(endpoints)
+        legacy_us = (time.perf_counter() - started) * 1e6 / reruns
+
+        get_endpoint_records(response_text, endpoints)
+        started = time.perf_counter()
+        for _ in range(reruns):
+            cached_rerun(response_text, endpoints)
+        cached_us = (time.perf_counter() - started) * 1e6 / reruns
+
+        print(f"{count:>10} {legacy_us:>11.0f} us {cached_us:>9.0f} us")
+
+
+if __name__ == "__main__":
+    _benchmark()
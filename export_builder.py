@@ -0,0 +1,561 @@
+import os
+import re
+import json
+import html
+import zlib
+import hashlib
+import logging
+import zipfile
+import tempfile
+from datetime import datetime
+from xml.sax.saxutils import escape as xml_escape
+
+from dotenv import load_dotenv
+
+from saved_responses import PAPER_SECTIONS, iter_saved_responses, saved_content_fingerprint
+from citation_store import citation_id, iter_expanded_citations
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Built documents are kept here, named by the hash of their content and options
+EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", "export_cache")
+EXPORT_CACHE_MAX_FILES = int(os.getenv("EXPORT_CACHE_MAX_FILES", "64"))
+
+# Bump when a writer's output changes so stale cached artifacts are not served
+EXPORT_BUILDER_VERSION = 1
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_BULLET = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+(.*)$")
+_TABLE_ROW = re.compile(r"^\s*\|(.*)\|\s*$")
+_TABLE_SEPARATOR = re.compile(r"^[\s|:-]+$")
+_STRONG = re.compile(r"\*\*(.+?)\*\*|__(.+?)__")
+
+
+def iter_blocks(text, include_tables=True):
+    """
+    Split a saved response into blocks the writers understand:
+
+        ("heading", level, text), ("bullet", text), ("paragraph", text), ("table", rows)
+
+    Consecutive non-blank lines form one paragraph; markdown table rows are grouped into
+    one table (dropped when include_tables is False).
+    """
+    paragraph = []
+    table = []
+
+    def flush():
+        if paragraph:
+            yield ("paragraph", " ".join(paragraph))
+            paragraph.clear()
+        if table:
+            if include_tables:
+                yield ("table", list(table))
+            table.clear()
+
+    for line in (text or "").splitlines():
+        row = _TABLE_ROW.match(line)
+        if row:
+            if paragraph:
+                yield from flush()
+            if not _TABLE_SEPARATOR.match(row.group(1)):
+                table.append([cell.strip() for cell in row.group(1).split("|")])
+            continue
+        if table:
+            yield from flush()
+
+        heading = _HEADING.match(line)
+        bullet = _BULLET.match(line)
+        if not line.strip():
+            yield from flush()
+        elif heading:
+            yield from flush()
+            # Response headings sit below the section heading
+            yield ("heading", min(len(heading.group(1)) + 1, 3), heading.group(2))
+        elif bullet:
+            yield from flush()
+            yield ("bullet", bullet.group(1).strip())
+        else:
+            paragraph.append(line.strip())
+    yield from flush()
+
+
+def iter_document(title, sections, include_citations=True, include_tables=True):
+    """
+    Yield the blocks of the whole paper: a ("title", text) block, then for each section
+    with responses a level-1 heading, its responses and, when include_citations is set,
+    its citations.
+
+    Args:
+        title (str): Document title
+        sections: Iterable of (section_name, responses) where responses is an iterable
+            (typically a cursor) of saved response dicts
+    """
+    yield ("title", title)
+    for name, responses in sections:
+        citations = {}
+        for index, item in enumerate(responses):
+            # Sections without saved responses are left out entirely
+            if index == 0:
+                yield ("heading", 1, name.title())
+            yield from iter_blocks(item.get("assistant_response", ""), include_tables)
+            # Keyed by citation id: citations may be dicts, which are not hashable
+            for citation in item.get("citations") or []:
+                citations.setdefault(citation_id(citation), citation)
+        if include_citations and citations:
+            yield ("heading", 2, "Citations")
+            for citation in citations.values():
+                yield ("bullet", citation if isinstance(citation, str) else json.dumps(citation, ensure_ascii=False))
+
+
+def _plain(text):
+    # Drop markdown emphasis markers for formats without inline styling
+    return _STRONG.sub(lambda m: m.group(1) or m.group(2), text)
+
+
+def write_markdown(blocks, out):
+    in_list = False
+    for block in blocks:
+        kind = block[0]
+        if kind != "bullet" and in_list:
+            out.write(b"\n")
+            in_list = False
+
+        if kind == "title":
+            out.write(f"# {block[1]}\n\n".encode("utf-8"))
+        elif kind == "heading":
+            out.write(f"{'#' * (block[1] + 1)} {block[2]}\n\n".encode("utf-8"))
+        elif kind == "bullet":
+            out.write(f"- {block[1]}\n".encode("utf-8"))
+            in_list = True
+        elif kind == "table":
+            rows = block[1]
+            lines = [f"| {' | '.join(rows[0])} |", "|" + " --- |" * len(rows[0])]
+            lines += [f"| {' | '.join(row)} |" for row in rows[1:]]
+            out.write(("\n".join(lines) + "\n\n").encode("utf-8"))
+        else:
+            out.write(f"{block[1]}\n\n".encode("utf-8"))
+
+
+def _html_inline(text):
+    return _STRONG.sub(lambda m: f"<strong>{m.group(1) or m.group(2)}</strong>", html.escape(text))
+
+
+def write_html(blocks, out):
+    in_list = False
+    for block in blocks:
+        kind = block[0]
+        if kind != "bullet" and in_list:
+            out.write(b"</ul>\n")
+            in_list = False
+
+        if kind == "title":
+            title = html.escape(block[1])
+            out.write((
+                "<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n<meta charset=\"utf-8\">\n"
+                f"<title>{title}</title>\n"
+                "<style>body{font-family:Georgia,serif;max-width:50em;margin:2em auto;line-height:1.5}"
+                "table{border-collapse:collapse}td,th{border:1px solid #999;padding:.25em .5em}</style>\n"
+                f"</head>\n<body>\n<h1>{title}</h1>\n"
+            ).encode("utf-8"))
+        elif kind == "heading":
+            level = block[1] + 1
+            out.write(f"<h{level}>{_html_inline(block[2])}</h{level}>\n".encode("utf-8"))
+        elif kind == "bullet":
+            if not in_list:
+                out.write(b"<ul>\n")
+                in_list = True
+            out.write(f"<li>{_html_inline(block[1])}</li>\n".encode("utf-8"))
+        elif kind == "table":
+            rows = block[1]
+            out.write(b"<table>\n")
+            for index, row in enumerate(rows):
+                cell = "th" if index == 0 else "td"
+                cells = "".join(f"<{cell}>{_html_inline(value)}</{cell}>" for value in row)
+                out.write(f"<tr>{cells}</tr>\n".encode("utf-8"))
+            out.write(b"</table>\n")
+        else:
+            out.write(f"<p>{_html_inline(block[1])}</p>\n".encode("utf-8"))
+    if in_list:
+        out.write(b"</ul>\n")
+    out.write(b"</body>\n</html>\n")
+
+
+_DOCX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+<Override PartName="/word/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>
+</Types>"""
+
+_DOCX_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+
+_DOCX_DOCUMENT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>"""
+
+_DOCX_STYLES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:styles xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">
+<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/><w:pPr><w:spacing w:after="120"/></w:pPr><w:rPr><w:sz w:val="22"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Title"><w:name w:val="Title"/><w:basedOn w:val="Normal"/><w:pPr><w:spacing w:after="240"/></w:pPr><w:rPr><w:b/><w:sz w:val="40"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/><w:basedOn w:val="Normal"/><w:pPr><w:keepNext/><w:spacing w:before="240"/><w:outlineLvl w:val="0"/></w:pPr><w:rPr><w:b/><w:sz w:val="32"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Heading2"><w:name w:val="heading 2"/><w:basedOn w:val="Normal"/><w:pPr><w:keepNext/><w:spacing w:before="200"/><w:outlineLvl w:val="1"/></w:pPr><w:rPr><w:b/><w:sz w:val="26"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Heading3"><w:name w:val="heading 3"/><w:basedOn w:val="Normal"/><w:pPr><w:keepNext/><w:outlineLvl w:val="2"/></w:pPr><w:rPr><w:b/><w:sz w:val="24"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="ListBullet"><w:name w:val="List Bullet"/><w:basedOn w:val="Normal"/><w:pPr><w:ind w:left="360" w:hanging="360"/></w:pPr></w:style>
+</w:styles>"""
+
+# Characters XML 1.0 does not allow, which would make Word reject the document
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _docx_runs(text):
+    runs = []
+    position = 0
+    for match in _STRONG.finditer(text):
+        runs.append((text[position:match.start()], False))
+        runs.append((match.group(1) or match.group(2), True))
+        position = match.end()
+    runs.append((text[position:], False))
+    return "".join(
+        f'<w:r>{"<w:rPr><w:b/></w:rPr>" if bold else ""}<w:t xml:space="preserve">'
+        f'{xml_escape(_XML_INVALID.sub("", value))}</w:t></w:r>'
+        for value, bold in runs if value
+    )
+
+
+def _docx_paragraph(text, style=None):
+    style_xml = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    return f"<w:p>{style_xml}{_docx_runs(text)}</w:p>"
+
+
+def write_docx(blocks, out):
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as package:
+        package.writestr("[Content_Types].xml", _DOCX_CONTENT_TYPES)
+        package.writestr("_rels/.rels", _DOCX_RELS)
+        package.writestr("word/_rels/document.xml.rels", _DOCX_DOCUMENT_RELS)
+        package.writestr("word/styles.xml", _DOCX_STYLES)
+
+        # document.xml is compressed into the package as it is written
+        with package.open("word/document.xml", "w", force_zip64=True) as document:
+            document.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                b'<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+            )
+            for block in blocks:
+                kind = block[0]
+                if kind == "title":
+                    xml = _docx_paragraph(block[1], "Title")
+                elif kind == "heading":
+                    xml = _docx_paragraph(block[2], f"Heading{block[1]}")
+                elif kind == "bullet":
+                    xml = _docx_paragraph(f"•\t{block[1]}", "ListBullet")
+                elif kind == "table":
+                    borders = "".join(
+                        f'<w:{side} w:val="single" w:sz="4" w:space="0" w:color="999999"/>'
+                        for side in ("top", "left", "bottom", "right", "insideH", "insideV")
+                    )
+                    rows = "".join(
+                        "<w:tr>" + "".join(f"<w:tc>{_docx_paragraph(cell)}</w:tc>" for cell in row) + "</w:tr>"
+                        for row in block[1]
+                    )
+                    xml = f'<w:tbl><w:tblPr><w:tblW w:w="0" w:type="auto"/><w:tblBorders>{borders}</w:tblBorders></w:tblPr>{rows}</w:tbl>'
+                else:
+                    xml = _docx_paragraph(block[1])
+                document.write(xml.encode("utf-8"))
+            document.write(
+                b'<w:sectPr><w:pgSz w:w="11906" w:h="16838"/>'
+                b'<w:pgMar w:top="1440" w:right="1440" w:bottom="1440" w:left="1440"/></w:sectPr>'
+                b"</w:body></w:document>"
+            )
+
+
+# A4 in points, and the text style for each block kind: (font, size, space before)
+_PDF_PAGE_WIDTH = 595
+_PDF_PAGE_HEIGHT = 842
+_PDF_MARGIN = 56
+_PDF_STYLES = {
+    "title": ("F2", 18, 0),
+    1: ("F2", 14, 14),
+    2: ("F2", 12, 10),
+    3: ("F2", 11, 8),
+    "body": ("F1", 10.5, 6),
+}
+_NARROW = set("iljtfrI.,;:'|!() ")
+_WIDE = set("mwMW@%")
+
+
+def _pdf_text_width(text, size):
+    # Approximate Helvetica advance widths; close enough for line breaking
+    units = 0.0
+    for char in text:
+        if char in _NARROW:
+            units += 0.278
+        elif char in _WIDE:
+            units += 0.833
+        elif char.isupper() or char.isdigit():
+            units += 0.667 if char.isupper() else 0.556
+        else:
+            units += 0.556
+    return units * size
+
+
+def _pdf_wrap(text, size, width):
+    lines = []
+    line = ""
+    for word in text.split():
+        candidate = f"{line} {word}" if line else word
+        if line and _pdf_text_width(candidate, size) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    if line:
+        lines.append(line)
+    return lines or [""]
+
+
+def _pdf_string(text):
+    encoded = text.encode("cp1252", errors="replace")
+    return b"(" + encoded.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+class _PdfWriter:
+    """
+    Minimal PDF 1.4 writer. Objects are written to out as soon as they are complete, so
+    only the current page's content is held in memory; the xref table is written last.
+    """
+
+    CATALOG, PAGES, FONT, FONT_BOLD = 1, 2, 3, 4
+
+    def __init__(self, out):
+        self.out = out
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = 5
+        self.content = []
+        self.y = None
+        self.position = 0
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data):
+        self.out.write(data)
+        self.position += len(data)
+
+    def _object(self, object_id, body):
+        self.offsets[object_id] = self.position
+        self._write(f"{object_id} 0 obj\n".encode("ascii") + body + b"\nendobj\n")
+
+    def _finish_page(self):
+        if self.y is None:
+            return
+        stream = zlib.compress(b"\n".join(self.content))
+        content_id, page_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+        self._object(content_id, f"<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n".encode("ascii")
+                     + stream + b"\nendstream")
+        self._object(page_id, (
+            f"<< /Type /Page /Parent {self.PAGES} 0 R /MediaBox [0 0 {_PDF_PAGE_WIDTH} {_PDF_PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 {self.FONT} 0 R /F2 {self.FONT_BOLD} 0 R >> >> "
+            f"/Contents {content_id} 0 R >>"
+        ).encode("ascii"))
+        self.page_ids.append(page_id)
+        self.content = []
+        self.y = None
+
+    def line(self, text, font, size, indent=0, space_before=0):
+        leading = size * 1.35
+        if self.y is not None:
+            self.y -= space_before
+        if self.y is None or self.y - leading < _PDF_MARGIN:
+            self._finish_page()
+            self.y = _PDF_PAGE_HEIGHT - _PDF_MARGIN
+        self.y -= leading
+        self.content.append(
+            f"BT /{font} {size} Tf {_PDF_MARGIN + indent:.2f} {self.y:.2f} Td ".encode("ascii")
+            + _pdf_string(text) + b" Tj ET"
+        )
+
+    def paragraph(self, text, font, size, space_before, indent=0, first_prefix=""):
+        width = _PDF_PAGE_WIDTH - 2 * _PDF_MARGIN - indent
+        for index, wrapped in enumerate(_pdf_wrap(_plain(text), size, width)):
+            prefix = first_prefix if index == 0 else " " * len(first_prefix) * 2
+            self.line(prefix + wrapped, font, size, indent, space_before if index == 0 else 0)
+
+    def close(self):
+        self._finish_page()
+        if not self.page_ids:
+            self.y = _PDF_PAGE_HEIGHT - _PDF_MARGIN
+            self._finish_page()
+        self._object(self.FONT, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        self._object(self.FONT_BOLD, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self._object(self.PAGES, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode("ascii"))
+        self._object(self.CATALOG, f"<< /Type /Catalog /Pages {self.PAGES} 0 R >>".encode("ascii"))
+
+        xref_offset = self.position
+        size = self.next_id
+        entries = [b"0000000000 65535 f \n"]
+        for object_id in range(1, size):
+            entries.append(f"{self.offsets.get(object_id, 0):010d} 00000 n \n".encode("ascii"))
+        self._write(f"xref\n0 {size}\n".encode("ascii") + b"".join(entries))
+        self._write(f"trailer\n<< /Size {size} /Root {self.CATALOG} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("ascii"))
+
+
+def write_pdf(blocks, out):
+    pdf = _PdfWriter(out)
+    for block in blocks:
+        kind = block[0]
+        if kind == "title":
+            font, size, space = _PDF_STYLES["title"]
+            pdf.paragraph(block[1], font, size, space)
+        elif kind == "heading":
+            font, size, space = _PDF_STYLES[block[1]]
+            pdf.paragraph(block[2], font, size, space)
+        elif kind == "bullet":
+            font, size, space = _PDF_STYLES["body"]
+            pdf.paragraph(block[1], font, size, 2, indent=12, first_prefix="• ")
+        elif kind == "table":
+            font, size, space = _PDF_STYLES["body"]
+            for index, row in enumerate(block[1]):
+                pdf.paragraph(" | ".join(row), "F2" if index == 0 else font, size, space if index == 0 else 0)
+        else:
+            font, size, space = _PDF_STYLES["body"]
+            pdf.paragraph(block[1], font, size, space)
+    pdf.close()
+
+
+# format -> (writer, mimetype, file extension)
+EXPORT_FORMATS = {
+    "docx": (write_docx, "application/vnd.openxmlformats-officedocument.wordprocessingml.document", "docx"),
+    "pdf": (write_pdf, "application/pdf", "pdf"),
+    "html": (write_html, "text/html; charset=utf-8", "html"),
+    "markdown": (write_markdown, "text/markdown; charset=utf-8", "md"),
+}
+
+
+def normalize_export_options(data):
+    """
+    Validate an /export/build payload and reduce it to the options that affect the output.
+
+    Args:
+        data (dict): format, include_citations, include_tables and sections, where sections
+            maps each of PAPER_SECTIONS to a bool and "abstract" to the abstract text or False
+
+    Returns:
+        dict: format, include_citations, include_tables, sections (names in paper order) and abstract
+
+    Raises:
+        ValueError: If the format is unknown or no section is included
+    """
+    export_format = (data.get("format") or "docx").lower()
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format}. Use one of: {', '.join(EXPORT_FORMATS)}")
+
+    requested = data.get("sections") or {}
+    sections = [section for section in PAPER_SECTIONS if requested.get(section, True)]
+    abstract = requested.get("abstract") or ""
+    if not isinstance(abstract, str):
+        abstract = ""
+    if not sections and not abstract:
+        raise ValueError("Select at least one section to export")
+
+    return {
+        "format": export_format,
+        "include_citations": bool(data.get("include_citations", True)),
+        "include_tables": bool(data.get("include_tables", True)),
+        "sections": sections,
+        "abstract": abstract.strip(),
+    }
+
+
+def export_cache_key(file_name, fingerprint, options):
+    """Hex SHA-256 of the builder version, paper, saved-content fingerprint and output options."""
+    payload = json.dumps([EXPORT_BUILDER_VERSION, file_name, fingerprint, options], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _evict_exports(cache_dir, max_files):
+    artifacts = sorted(
+        (entry for entry in os.scandir(cache_dir) if entry.is_file() and not entry.name.startswith(".")),
+        key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in artifacts[:max(len(artifacts) - max_files, 0)]:
+        try:
+            os.remove(entry.path)
+        except OSError as e:
+            logger.warning(f"Could not evict cached export {entry.path}: {str(e)}")
+
+
+def build_export(db, file_name, options, cache_dir=EXPORT_CACHE_DIR, max_files=EXPORT_CACHE_MAX_FILES):
+    """
+    Return the built document for file_name and options, building it only when the saved
+    content or options changed since the last build.
+
+    The document is written straight to a file in cache_dir as the saved responses are read
+    from a cursor, so neither the responses nor the output are held in memory.
+
+    Args:
+        db: MongoDB database connection
+        file_name (str): The paper
+        options (dict): Output of normalize_export_options
+
+    Returns:
+        tuple: (path, cache_key, cache_hit)
+    """
+    fingerprint = saved_content_fingerprint(db, file_name, options["sections"])
+    key = export_cache_key(file_name, fingerprint, options)
+    writer, _, extension = EXPORT_FORMATS[options["format"]]
+    path = os.path.join(cache_dir, f"{key}.{extension}")
+
+    if os.path.exists(path):
+        # Touch so eviction treats it as recently used
+        os.utime(path)
+        return path, key, True
+
+    os.makedirs(cache_dir, exist_ok=True)
+    sections = []
+    if options["abstract"]:
+        sections.append(("abstract", [{"assistant_response": options["abstract"]}]))
+    if options["include_citations"]:
+        # Citation ids are resolved a cursor batch at a time; older responses carry inline citations
+        projection = {"_id": 0, "assistant_response": 1, "citations": 1, "citation_ids": 1}
+        sections += [
+            (section, iter_expanded_citations(db, iter_saved_responses(db, file_name, section, projection)))
+            for section in options["sections"]
+        ]
+    else:
+        projection = {"_id": 0, "assistant_response": 1}
+        sections += [
+            (section, iter_saved_responses(db, file_name, section, projection))
+            for section in options["sections"]
+        ]
+
+    title = os.path.splitext(file_name)[0]
+    blocks = iter_document(title, sections, options["include_citations"], options["include_tables"])
+
+    # Build under a temporary name so a concurrent request never serves a partial file
+    descriptor, temp_path = tempfile.mkstemp(dir=cache_dir, prefix=".building-")
+    try:
+        with os.fdopen(descriptor, "wb") as out:
+            writer(blocks, out)
+        os.replace(temp_path, path)
+    except Exception:
+        os.remove(temp_path)
+        raise
+
+    _evict_exports(cache_dir, max_files)
+    logger.info(f"Built {options['format']} export for {file_name} ({os.path.getsize(path)} bytes)")
+    return path, key, False
+
+
+def export_download_name(file_name, export_format):
+    """Download name for an export, e.g. trial_report_2024-05-01.docx."""
+    stem = os.path.splitext(os.path.basename(file_name))[0] or "research_paper"
+    return f"{stem}_{datetime.utcnow():%Y-%m-%d}.{EXPORT_FORMATS[export_format][2]}"
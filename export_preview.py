@@ -0,0 +1,176 @@
+import time
+import hashlib
+
+import streamlit as st
+
+from backend_client import api_get
+from saved_responses import PAPER_SECTIONS
+
+
+# Seconds the export tab reuses fetched saved content before checking for changes
+EXPORT_CONTENT_TTL = 60
+
+# Saved responses fetched per preview page
+EXPORT_PREVIEW_PAGE_SIZE = 20
+
+
+def load_export_section_counts(force=False):
+    """
+    Number of saved responses per section for the export tab. Fetched once per file and
+    reused across reruns for EXPORT_CONTENT_TTL seconds; force also drops loaded previews.
+
+    Returns:
+        dict or None: {section: count}, or None if the request failed
+    """
+    cached = st.session_state.get("export_section_counts")
+    if (not force and cached and cached["file_name"] == st.session_state.file_name
+            and time.time() - cached["fetched_at"] < EXPORT_CONTENT_TTL):
+        return cached["counts"]
+
+    if force:
+        st.session_state.pop("export_section_content", None)
+
+    params = {'file_name': st.session_state.file_name}
+    response = api_get("/export/get_saved_responses", params=params)
+    if response.status_code != 200:
+        return None
+
+    st.session_state["export_section_counts"] = {
+        "file_name": st.session_state.file_name,
+        "fetched_at": time.time(),
+        "counts": response.json()["counts"]
+    }
+    return st.session_state["export_section_counts"]["counts"]
+
+
+def load_export_section(section, count, more=False):
+    """
+    Saved responses for one preview section, text only. The first page is fetched the first
+    time the section is shown; later reruns only ask for responses updated since the last
+    fetch, and more=True appends the next page.
+
+    Args:
+        section (str): The section being previewed
+        count (int): Saved responses the backend reports for the section
+        more (bool): Fetch the next page
+
+    Returns:
+        dict or None: {"items", "page", "has_more", "synced_at", "fetched_at"}, or None if the request failed
+    """
+    state = st.session_state.setdefault("export_section_content", {})
+    if state.get("file_name") != st.session_state.file_name:
+        state.clear()
+        state["file_name"] = st.session_state.file_name
+        state["sections"] = {}
+
+    loaded = state["sections"].get(section)
+    # Responses were deleted since the last fetch; start over
+    if loaded is not None and len(loaded["items"]) > count:
+        loaded = None
+
+    params = {
+        'file_name': st.session_state.file_name,
+        'sections': section,
+        'fields': 'text',
+        'page_size': EXPORT_PREVIEW_PAGE_SIZE
+    }
+    if loaded is None:
+        params['page'] = 1
+    elif more and loaded["has_more"]:
+        params['page'] = loaded["page"] + 1
+    elif time.time() - loaded["fetched_at"] >= EXPORT_CONTENT_TTL:
+        params['updated_since'] = loaded["synced_at"]
+        params['page_size'] = max(len(loaded["items"]), EXPORT_PREVIEW_PAGE_SIZE)
+    else:
+        return loaded
+
+    response = api_get("/export/get_saved_responses", params=params)
+    if response.status_code != 200:
+        return None
+
+    content = response.json()
+    page = content["sections"][section]
+    if loaded is None:
+        loaded = {"items": page["items"], "page": 1, "has_more": page["has_more"],
+                  "synced_at": content["server_time"]}
+    elif 'updated_since' in params:
+        if page["has_more"]:
+            # More changed than one page holds; reload the section
+            state["sections"].pop(section, None)
+            return load_export_section(section, count)
+        loaded["items"] = merge_section_updates(loaded["items"], page["items"], loaded["has_more"])
+        loaded["synced_at"] = content["server_time"]
+    else:
+        # synced_at stays put: earlier pages may have changed since it was taken
+        loaded["items"] = loaded["items"] + page["items"]
+        loaded["page"] = page["page"]
+        loaded["has_more"] = page["has_more"]
+    loaded["fetched_at"] = time.time()
+    state["sections"][section] = loaded
+    return loaded
+
+
+def section_version(items):
+    """
+    Hash identifying the saved responses of one section: their ids and updated_at, in order.
+    Responses without either are identified by their text instead.
+    """
+    digest = hashlib.sha1()
+    for item in items:
+        response_id = item.get("_id") or item.get("id")
+        updated_at = item.get("updated_at")
+        if response_id or updated_at:
+            digest.update(f"{response_id}:{updated_at};".encode("utf-8"))
+        else:
+            digest.update(hashlib.sha1(item.get("assistant_response", "").encode("utf-8")).digest())
+    return digest.hexdigest()
+
+
+def render_section_fragment(items):
+    """Markdown preview of one section: its saved responses separated by blank lines."""
+    return "\n\n".join(item.get("assistant_response", "") for item in items)
+
+
+def get_section_fragments(cache, saved_content, sections=PAPER_SECTIONS):
+    """
+    Rendered preview for each section, re-rendering only sections whose saved responses changed.
+
+    Args:
+        cache (dict): {section: (version, fragment)}, kept between reruns by the caller
+        saved_content (dict): {section: [saved response, ...]} from /export/get_saved_responses
+        sections (list): Sections to render
+
+    Returns:
+        dict: {section: fragment}
+    """
+    fragments = {}
+    for section in sections:
+        items = saved_content.get(section) or []
+        version = section_version(items)
+        entry = cache.get(section)
+        if entry is None or entry[0] != version:
+            entry = (version, render_section_fragment(items))
+            cache[section] = entry
+        fragments[section] = entry[1]
+    return fragments
+
+
+def merge_section_updates(items, updates, has_more):
+    """
+    Apply responses returned for an updated_since query to a section's loaded responses.
+
+    Updated responses replace their loaded copy in place. New responses are appended only
+    when every page is loaded (has_more is False); otherwise they arrive with a later page.
+
+    Returns:
+        list: The merged responses
+    """
+    positions = {item.get("id"): i for i, item in enumerate(items)}
+    merged = list(items)
+    for update in updates:
+        position = positions.get(update.get("id"))
+        if position is not None:
+            merged[position] = update
+        elif not has_more:
+            merged.append(update)
+    return merged
@@ -0,0 +1,158 @@
+import os
+import uuid
+import hashlib
+import logging
+from datetime import datetime
+
+from werkzeug.utils import secure_filename
+from dotenv import load_dotenv
+
+from jobs import JobRegistry
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Uploaded files are spooled here before the background worker indexes them
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "4"))
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Persisted index of ingested papers keyed by SHA-256 of the file contents
+UPLOADS_COLLECTION = "uploads"
+
+ASSISTANT_MODEL = os.getenv("ASSISTANT_MODEL", "gpt-4o")
+ASSISTANT_INSTRUCTIONS = os.getenv(
+    "ASSISTANT_INSTRUCTIONS",
+    "You are a clinical research writing assistant. Answer using only the uploaded paper "
+    "and cite the passages you rely on."
+)
+
+# Ordered ingestion stages reported by /upload/status/<job_id>
+FILE_STORED = "file_stored"
+VECTOR_INDEXING = "vector_indexing"
+ASSISTANT_CREATED = "assistant_created"
+INGESTION_STAGES = [FILE_STORED, VECTOR_INDEXING, ASSISTANT_CREATED]
+
+# Separate pool from other background jobs so uploads never queue behind bulk generation
+ingestion_jobs = JobRegistry(runner_threads=INGESTION_WORKERS)
+
+
+def store_upload(file_storage, upload_dir=UPLOAD_DIR):
+    """
+    Stream an uploaded werkzeug FileStorage to disk under a unique name, hashing it on the way.
+
+    Returns:
+        tuple: (path, content_hash) where content_hash is the hex SHA-256 of the file
+    """
+    os.makedirs(upload_dir, exist_ok=True)
+    path = os.path.join(upload_dir, f"{uuid.uuid4().hex}_{secure_filename(file_storage.filename)}")
+    digest = hashlib.sha256()
+    with open(path, "wb") as out:
+        for chunk in iter(lambda: file_storage.stream.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            out.write(chunk)
+    return path, digest.hexdigest()
+
+
+def discard_upload(path):
+    """Remove a stored upload that turned out not to need ingesting."""
+    try:
+        os.remove(path)
+    except OSError as e:
+        logger.warning(f"Could not remove stored upload {path}: {str(e)}")
+
+
+def find_ingested_upload(db, content_hash):
+    """
+    Look up a previously ingested paper by content hash.
+
+    Returns:
+        dict or None: file_name, assistant_id, vector_store_id, thread_id and upload_time
+    """
+    return db[UPLOADS_COLLECTION].find_one(
+        {"content_hash": content_hash},
+        {"_id": 0, "file_name": 1, "assistant_id": 1, "vector_store_id": 1, "thread_id": 1, "upload_time": 1}
+    )
+
+
+def record_ingested_upload(db, content_hash, result):
+    """Store (or replace, after a forced re-ingest) the ids created for a content hash."""
+    db[UPLOADS_COLLECTION].update_one(
+        {"content_hash": content_hash},
+        {
+            "$set": {**result, "updated_at": datetime.utcnow()},
+            "$setOnInsert": {"created_at": datetime.utcnow()}
+        },
+        upsert=True
+    )
+
+
+def ingest_document(job, client, db, path, file_name, content_hash):
+    """
+    Index a stored upload into a new vector store and create an assistant and thread for it.
+    Advances job.stage through INGESTION_STAGES, sets job.result to the ids the UI needs
+    and records them in the uploads index under content_hash. The stored upload is removed
+    once it has been sent to the vector store.
+
+    Args:
+        job: jobs.Job tracking this upload
+        client: OpenAI client
+        db: MongoDB database connection
+        path (str): Path returned by store_upload
+        file_name (str): Original file name, used to name the vector store and assistant
+        content_hash (str): SHA-256 returned by store_upload
+    """
+    job.update(stage=VECTOR_INDEXING, completed=1)
+    try:
+        vector_store = client.beta.vector_stores.create(name=file_name)
+        with open(path, "rb") as file:
+            batch = client.beta.vector_stores.file_batches.upload_and_poll(
+                vector_store_id=vector_store.id, files=[(file_name, file)]
+            )
+    finally:
+        # The vector store holds its own copy now; a failed upload is retried from a fresh upload
+        discard_upload(path)
+    if batch.file_counts.completed == 0:
+        raise RuntimeError(f"Vector indexing failed for {file_name}")
+
+    assistant = client.beta.assistants.create(
+        name=f"CRP assistant - {file_name}",
+        instructions=ASSISTANT_INSTRUCTIONS,
+        model=ASSISTANT_MODEL,
+        tools=[{"type": "file_search"}],
+        tool_resources={"file_search": {"vector_store_ids": [vector_store.id]}},
+    )
+    job.update(stage=ASSISTANT_CREATED, completed=2)
+    thread = client.beta.threads.create(
+        tool_resources={"file_search": {"vector_store_ids": [vector_store.id]}}
+    )
+
+    result = {
+        "file_name": file_name,
+        "assistant_id": assistant.id,
+        "vector_store_id": vector_store.id,
+        "thread_id": thread.id,
+        "upload_time": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC"),
+    }
+    record_ingested_upload(db, content_hash, result)
+    job.update(completed=3, result=result)
+    logger.info(f"Ingested {file_name}: assistant {assistant.id}, vector store {vector_store.id}")
+
+
+def submit_ingestion(client, db, path, file_name, content_hash):
+    """
+    Queue the slow indexing work for a file already written by store_upload.
+
+    Returns:
+        jobs.Job: The queued ingestion job, already at the file_stored stage
+    """
+    job = ingestion_jobs.submit(
+        "upload",
+        lambda job: ingest_document(job, client, db, path, file_name, content_hash),
+        total=len(INGESTION_STAGES),
+        meta={"file_name": file_name},
+        stage=FILE_STORED,
+    )
+    return job
@@ -0,0 +1,134 @@
+import os
+import uuid
+import logging
+import threading
+from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Background jobs run on a small shared pool; finished jobs are kept around for polling
+JOB_RUNNER_THREADS = int(os.getenv("JOB_RUNNER_THREADS", "4"))
+JOB_MAX_RETAINED = int(os.getenv("JOB_MAX_RETAINED", "200"))
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class Job:
+    """
+    Progress record for one background job. Workers report each finished item through
+    record(), or move through named stages with update(stage=..., completed=...) and
+    set update(result=...) at the end; pollers read a consistent copy through snapshot().
+    """
+
+    def __init__(self, kind, total=0, meta=None, stage=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = QUEUED
+        self.total = total
+        self.completed = 0
+        self.failed = 0
+        self.results = []
+        self.stage = stage
+        self.result = None
+        self.error = None
+        self.meta = meta or {}
+        self.created_at = datetime.utcnow()
+        self.updated_at = self.created_at
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        """Set arbitrary job fields (status, total, meta, ...) under the job lock."""
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.updated_at = datetime.utcnow()
+
+    def record(self, result, error=None):
+        """Record one finished item; items with an error count towards failed."""
+        with self._lock:
+            self.completed += 1
+            if error:
+                self.failed += 1
+            self.results.append({**result, "error": error})
+            self.updated_at = datetime.utcnow()
+
+    def snapshot(self):
+        """Return a JSON-serializable copy of the job state."""
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "total": self.total,
+                "completed": self.completed,
+                "failed": self.failed,
+                "results": list(self.results),
+                "stage": self.stage,
+                "result": self.result,
+                "error": self.error,
+                "meta": dict(self.meta),
+                "created_at": self.created_at.isoformat(),
+                "updated_at": self.updated_at.isoformat(),
+            }
+
+
+class JobRegistry:
+    """
+    In-process registry of background jobs.
+
+    Jobs live only in this process's memory, so the backend must run as a single worker
+    process (threads are fine) for status polling to find them.
+    """
+
+    def __init__(self, runner_threads=JOB_RUNNER_THREADS, max_retained=JOB_MAX_RETAINED):
+        self._executor = ThreadPoolExecutor(max_workers=runner_threads, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_retained = max_retained
+
+    def submit(self, kind, fn, total=0, meta=None, stage=None):
+        """
+        Start fn(job) in the background and return the new Job.
+
+        fn reports progress through job.record()/job.update(). The job is marked completed
+        when fn returns and failed if it raises. stage is the initial stage reported to pollers.
+        """
+        job = Job(kind, total=total, meta=meta, stage=stage)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, fn)
+        logger.info(f"Queued {kind} job {job.id} with {total} items")
+        return job
+
+    def get(self, job_id):
+        """Return the Job for job_id, or None if it is unknown or was pruned."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, fn):
+        job.update(status=RUNNING)
+        try:
+            fn(job)
+            job.update(status=COMPLETED)
+            logger.info(f"{job.kind} job {job.id} completed ({job.completed}/{job.total}, {job.failed} failed)")
+        except Exception as e:
+            logger.error(f"{job.kind} job {job.id} failed: {str(e)}")
+            job.update(status=FAILED, error=str(e))
+
+    def _prune(self):
+        # Drop the oldest finished jobs once over the limit; running jobs are never dropped
+        excess = len(self._jobs) - self.max_retained
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.status in (COMPLETED, FAILED)][:excess]:
+            del self._jobs[job_id]
+
+
+# Process-wide registry used by the routes
+jobs = JobRegistry()
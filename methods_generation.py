@@ -0,0 +1,290 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+# Per-endpoint summaries reused across methods generations: {"_id": key, "endpoint_id", "summary", "created_at"}.
+# Expired by the TTL index in db_indexes.ENDPOINT_SUMMARY_INDEXES.
+ENDPOINT_SUMMARIES_COLLECTION = "endpoint_summaries"
+
+# Concurrent summary runs per job, and the endpoint cap for one job
+METHODS_SUMMARY_MAX_WORKERS = int(os.getenv("METHODS_SUMMARY_MAX_WORKERS", "4"))
+METHODS_MAX_ENDPOINTS = int(os.getenv("METHODS_MAX_ENDPOINTS", "200"))
+
+# Largest block of summaries merged in one assistant run; bigger sets are merged in rounds
+METHODS_MERGE_MAX_CHARS = int(os.getenv("METHODS_MERGE_MAX_CHARS", "40000"))
+
+# Bump when SUMMARY_PROMPT changes so summaries written from the old prompt are not reused
+SUMMARY_PROMPT_VERSION = 1
+
+SUMMARY_PROMPT = """
+Summarize the information a clinical trial Methods section needs about this endpoint
+from the trial manuscript: its definition, how and when it was measured, the analysis
+population and the statistical methods used. Answer in one compact paragraph.
+
+Category: {category}
+Endpoint: {name}
+Details: {details}
+"""
+
+COMBINE_PROMPT = """
+Combine the following endpoint summaries into consolidated notes for the Methods section,
+grouping related endpoints and keeping every definition, timepoint and statistical method.
+
+{summaries}
+"""
+
+MERGE_PROMPT = """
+Please generate a comprehensive Methods section for the clinical trial manuscript in file: {file_name}
+
+Base your Methods section on the following endpoint summaries:
+
+{summaries}
+
+Please follow these guidelines:
+
+1. Organize the information under clear headings (e.g., 'Study Design,' 'Participants,' 'Interventions,' 'Outcomes,' etc.)
+2. Ensure all the selected endpoints are properly described in the appropriate sections
+3. Use academic language and appropriate terminology
+4. Reference standard guidelines where appropriate (e.g., CONSORT)
+5. Provide enough detail that another researcher could replicate or cite the study
+6. Integrate the information from different endpoints in a coherent and logical manner
+"""
+
+
+def endpoint_category(endpoint):
+    """Category of a selected endpoint, falling back to the one encoded in its endpoint_id."""
+    if endpoint.get("endpoint_category"):
+        return endpoint["endpoint_category"]
+    parts = (endpoint.get("endpoint_id") or "").split("_")
+    return parts[1] if len(parts) > 1 else "Unknown"
+
+
+def summary_cache_key(endpoint):
+    """
+    Cache key for an endpoint's summary: its endpoint_id and updated_at, so re-saving the
+    endpoint invalidates it. Endpoints without both are keyed by their response text.
+    """
+    if endpoint.get("endpoint_id") and endpoint.get("updated_at"):
+        identity = [endpoint["endpoint_id"], endpoint["updated_at"]]
+    else:
+        identity = [endpoint.get("endpoint_name"), endpoint.get("assistant_response")]
+    payload = json.dumps([SUMMARY_PROMPT_VERSION] + identity, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def normalize_methods_endpoints(endpoints):
+    """
+    Validate the endpoints selected for methods generation, tag each with its summary key
+    and drop endpoints selected more than once.
+
+    Raises:
+        ValueError: If no endpoints are given or there are more than METHODS_MAX_ENDPOINTS
+    """
+    if not endpoints:
+        raise ValueError("No endpoints provided")
+    if len(endpoints) > METHODS_MAX_ENDPOINTS:
+        raise ValueError(f"At most {METHODS_MAX_ENDPOINTS} endpoints can be used in one generation")
+    normalized = {}
+    for endpoint in endpoints:
+        key = summary_cache_key(endpoint)
+        normalized.setdefault(key, {**endpoint, "summary_key": key})
+    return list(normalized.values())
+
+
+def load_cached_summaries(db, keys):
+    """Return {key: summary} for the keys already summarized, in one query."""
+    return {
+        doc["_id"]: doc["summary"]
+        for doc in db[ENDPOINT_SUMMARIES_COLLECTION].find({"_id": {"$in": list(keys)}}, {"summary": 1})
+    }
+
+
+def save_summary(db, endpoint, summary):
+    """Store an endpoint's summary under its summary key."""
+    db[ENDPOINT_SUMMARIES_COLLECTION].replace_one(
+        {"_id": endpoint["summary_key"]},
+        {"endpoint_id": endpoint.get("endpoint_id"), "summary": summary, "created_at": datetime.utcnow()},
+        upsert=True
+    )
+
+
+def group_summaries(summaries, max_chars=METHODS_MERGE_MAX_CHARS):
+    """Split summaries into consecutive groups of at most max_chars characters (at least one summary each)."""
+    groups, current, size = [], [], 0
+    for summary in summaries:
+        if current and size + len(summary) > max_chars:
+            groups.append(current)
+            current, size = [], 0
+        current.append(summary)
+        size += len(summary)
+    if current:
+        groups.append(current)
+    return groups
+
+
+def summarize_endpoints(job, db, session_factory, endpoints, max_workers=METHODS_SUMMARY_MAX_WORKERS):
+    """
+    Map step: summarize every endpoint, reusing cached summaries and running the rest
+    concurrently. Records one job item per endpoint.
+
+    Returns:
+        list: "Category / Endpoint / Summary" blocks in the order the endpoints were selected
+
+    Raises:
+        RuntimeError: If any endpoint could not be summarized; the ones that were are cached,
+            so a retry only reruns the failures
+    """
+    cached = load_cached_summaries(db, {endpoint["summary_key"] for endpoint in endpoints})
+    summaries = dict(cached)
+    pending = {}
+    for endpoint in endpoints:
+        if endpoint["summary_key"] in cached:
+            job.record({"endpoint_id": endpoint.get("endpoint_id"), "endpoint_name": endpoint.get("endpoint_name"),
+                        "cached": True})
+        else:
+            pending[endpoint["summary_key"]] = endpoint
+
+    def run_one(endpoint):
+        prompt = SUMMARY_PROMPT.format(
+            category=endpoint_category(endpoint),
+            name=endpoint.get("endpoint_name"),
+            details=endpoint.get("assistant_response") or ""
+        )
+        summary, _, _ = session_factory().run_query(prompt, dependent=False)
+        save_summary(db, endpoint, summary)
+        return summary
+
+    failed = []
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+            futures = {executor.submit(run_one, endpoint): endpoint for endpoint in pending.values()}
+            for future in as_completed(futures):
+                endpoint = futures[future]
+                result = {"endpoint_id": endpoint.get("endpoint_id"), "endpoint_name": endpoint.get("endpoint_name"),
+                          "cached": False}
+                try:
+                    summaries[endpoint["summary_key"]] = future.result()
+                    job.record(result)
+                except Exception as e:
+                    logger.error(f"Summarizing endpoint '{endpoint.get('endpoint_name')}' failed: {str(e)}")
+                    failed.append(endpoint.get("endpoint_name"))
+                    job.record(result, error=str(e))
+
+    if failed:
+        raise RuntimeError(f"Could not summarize {len(failed)} endpoints: {', '.join(map(str, failed))}")
+
+    return [
+        f"Category: {endpoint_category(endpoint)}\nEndpoint: {endpoint.get('endpoint_name')}\n"
+        f"Summary: {summaries[endpoint['summary_key']]}"
+        for endpoint in endpoints
+    ]
+
+
+def merge_summaries(session_factory, file_name, summaries, max_workers=METHODS_SUMMARY_MAX_WORKERS,
+                    max_chars=METHODS_MERGE_MAX_CHARS):
+    """
+    Reduce step: combine summaries into the Methods section. Sets larger than max_chars are
+    first combined group by group (concurrently) until they fit in one final run.
+
+    Returns:
+        tuple: (methods_content, citations, thread_id) of the final run
+    """
+    groups = group_summaries(summaries, max_chars)
+    while len(groups) > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(groups))) as executor:
+            combined = list(executor.map(
+                lambda group: session_factory().run_query(
+                    COMBINE_PROMPT.format(summaries="\n\n".join(group)), dependent=False
+                )[0],
+                groups
+            ))
+        next_groups = group_summaries(combined, max_chars)
+        if len(next_groups) >= len(groups):
+            # Combining no longer shrinks the set; merge what there is
+            groups = [combined]
+            break
+        groups = next_groups
+
+    prompt = MERGE_PROMPT.format(file_name=file_name, summaries="\n\n".join(groups[0]))
+    return session_factory().run_query(prompt, dependent=False)
+
+
+def run_methods_generation(job, db, session_factory, file_name, endpoints, max_workers=METHODS_SUMMARY_MAX_WORKERS):
+    """
+    Background job body: summarize each endpoint (map), then merge the summaries into the
+    Methods section (reduce). Progress is reported per endpoint, then as the "merging" stage.
+
+    Args:
+        job: jobs.Job for this generation
+        db: MongoDB database connection holding the summary cache
+        session_factory: Callable returning a new AssistantSession
+        file_name (str): The paper
+        endpoints (list): Output of normalize_methods_endpoints
+        max_workers (int): Maximum number of concurrent assistant runs
+    """
+    summaries = summarize_endpoints(job, db, session_factory, endpoints, max_workers)
+    job.update(stage="merging")
+
+    methods_content, citations, thread_id = merge_summaries(session_factory, file_name, summaries, max_workers)
+    job.update(stage="done", result={
+        "methods_content": methods_content,
+        "citations": citations,
+        "thread_id": thread_id,
+        "file_name": file_name,
+        "cached_summaries": sum(1 for item in job.snapshot()["results"] if item.get("cached")),
+    })
+
+
+def _benchmark(endpoint_count=40, run_seconds=0.05, max_workers=METHODS_SUMMARY_MAX_WORKERS):
+    """
+    Time a first generation, a repeat and a repeat with one changed endpoint against an
+    in-memory summary store and a stub assistant that takes run_seconds per run.
+    """
+    from jobs import Job
+
+    class StubSession:
+        def run_query(self, prompt, dependent=False):
+            time.sleep(run_seconds)
+            return f"summary of {len(prompt)} characters", [], "thread"
+
+    class MemoryCollection:
+        def __init__(self):
+            self.docs = {}
+
+        def find(self, query, projection=None):
+            return [{"_id": key, **self.docs[key]} for key in query["_id"]["$in"] if key in self.docs]
+
+        def replace_one(self, query, doc, upsert=False):
+            self.docs[query["_id"]] = doc
+
+    db = {ENDPOINT_SUMMARIES_COLLECTION: MemoryCollection()}
+    endpoints = [
+        {"endpoint_id": f"paper_primary_endpoint {i}", "endpoint_name": f"endpoint {i}",
+         "assistant_response": "details " * 200, "updated_at": "2024-01-01T00:00:00"}
+        for i in range(endpoint_count)
+    ]
+
+    def timed(selected):
+        job = Job("methods_generate", total=len(selected))
+        started = time.perf_counter()
+        run_methods_generation(job, db, StubSession, "paper", normalize_methods_endpoints(selected), max_workers)
+        return time.perf_counter() - started, job.result["cached_summaries"]
+
+    first, _ = timed(endpoints)
+    repeat, cached = timed(endpoints)
+    endpoints[0] = {**endpoints[0], "updated_at": "2024-01-02T00:00:00"}
+    changed, changed_cached = timed(endpoints)
+
+    print(f"cold cache:           {first:.2f} s")
+    print(f"unchanged endpoints:  {repeat:.2f} s ({cached}/{endpoint_count} summaries cached)")
+    print(f"one endpoint changed: {changed:.2f} s ({changed_cached}/{endpoint_count} summaries cached)")
+
+
+if __name__ == "__main__":
+    _benchmark()
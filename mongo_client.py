@@ -0,0 +1,161 @@
+import os
+import time
+import logging
+import threading
+
+from pymongo import MongoClient
+from pymongo.monitoring import ConnectionPoolListener
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "crp_assistant")
+
+# Pool tuning. maxPoolSize bounds concurrent operations per process; threads beyond it wait
+# up to waitQueueTimeoutMS for a connection instead of opening new sockets.
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "2"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "3000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+
+
+class PoolMetricsListener(ConnectionPoolListener):
+    """Collects connection pool counters and check-out wait times from pymongo's monitoring events."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.open_connections = 0
+        self.checked_out = 0
+        self.total_checkouts = 0
+        self.failed_checkouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def snapshot(self):
+        """Return the current metrics as a JSON-serializable dict."""
+        with self._lock:
+            avg_wait_ms = self.total_wait_ms / self.total_checkouts if self.total_checkouts else 0.0
+            return {
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "total_checkouts": self.total_checkouts,
+                "failed_checkouts": self.failed_checkouts,
+                "avg_wait_queue_ms": round(avg_wait_ms, 3),
+                "max_wait_queue_ms": round(self.max_wait_ms, 3),
+                "max_pool_size": MONGO_MAX_POOL_SIZE,
+            }
+
+    def connection_check_out_started(self, event):
+        # Check-out is synchronous, so the waiting thread is the one that later receives the connection
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, "started", None)
+        wait_ms = (time.perf_counter() - started) * 1000 if started is not None else 0.0
+        self._local.started = None
+        with self._lock:
+            self.checked_out += 1
+            self.total_checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def connection_check_out_failed(self, event):
+        self._local.started = None
+        with self._lock:
+            self.failed_checkouts += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+
+pool_metrics = PoolMetricsListener()
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Return the process-wide MongoClient, creating it on first use.
+
+    MongoClient is thread-safe, so every request thread in a worker shares its pool.
+    It is not fork-safe, so a worker forked after the client was created gets its own.
+    """
+    global _client, _client_pid, pool_metrics
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                # Counters inherited from a parent process describe its pool, not ours
+                pool_metrics = PoolMetricsListener()
+                _client = MongoClient(
+                    MONGO_URI,
+                    maxPoolSize=MONGO_MAX_POOL_SIZE,
+                    minPoolSize=MONGO_MIN_POOL_SIZE,
+                    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+                    event_listeners=[pool_metrics],
+                )
+                _client_pid = pid
+                logger.info(f"Created MongoDB client (maxPoolSize={MONGO_MAX_POOL_SIZE}) for pid {pid}")
+    return _client
+
+
+def get_db():
+    """Return the application database on the shared client."""
+    return get_client()[MONGO_DB_NAME]
+
+
+def check_health():
+    """
+    Ping the server and return (healthy, details) including pool metrics.
+
+    Returns:
+        tuple: (bool, dict)
+    """
+    started = time.perf_counter()
+    try:
+        get_client().admin.command("ping")
+        healthy = True
+        error = None
+    except Exception as e:
+        healthy = False
+        error = str(e)
+    details = {
+        "status": "ok" if healthy else "unavailable",
+        "ping_ms": round((time.perf_counter() - started) * 1000, 3),
+        "pool": pool_metrics.snapshot(),
+    }
+    if error:
+        details["error"] = error
+    return healthy, details
@@ -0,0 +1,109 @@
+import re
+from functools import lru_cache
+
+# Prompt tags, in the order they are reported
+SUBGROUP = "subgroup"
+SAFETY = "safety"
+EFFICACY = "efficacy"
+DEMOGRAPHICS = "demographics"
+STATISTICAL = "statistical"
+PHARMACOKINETICS = "pharmacokinetics"
+
+# One alternation per tag, matched case-insensitively. Abbreviations are matched
+# case-sensitively so "or", "ci" or "hrs" in prose do not count
+PROMPT_TAG_PATTERNS = {
+    SUBGROUP: r"\b(?:sub[- ]?groups?)\b",
+    SAFETY: r"\b(?:safety|adverse (?:events?|reactions?)|(?-i:AEs?|TEAEs?|SAEs?)|toxicit(?:y|ies)|tolerability|discontinuations?)\b",
+    EFFICACY: r"\b(?:efficacy|primary endpoints?|secondary endpoints?|change from baseline|response rates?|remission|effect sizes?)\b",
+    DEMOGRAPHICS: r"\b(?:demographics?|baseline characteristics|age|sex|gender|race|ethnicity|(?-i:BMI))\b",
+    STATISTICAL: r"\b(?:p[- ]?values?|confidence intervals?|hazard ratios?|odds ratios?|statistical(?:ly)?|significan(?:t|ce)|regression|(?-i:CIs?|HRs?|ORs?|ANCOVA|MMRM))\b",
+    PHARMACOKINETICS: r"\b(?:pharmacokinetics?|half-life|clearance|(?-i:PK|Cmax|AUC))\b",
+}
+
+# Each tag is searched on its own: one alternation over every tag would consume the
+# first phrase it finds and miss a tag whose phrase overlaps it, as in
+# "change from baseline characteristics"
+_PROMPT_TAG_REGEXES = {tag: re.compile(pattern, re.IGNORECASE) for tag, pattern in PROMPT_TAG_PATTERNS.items()}
+
+# Prompt templates are few and repeat on every Streamlit rerun
+PROMPT_CLASSIFIER_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=PROMPT_CLASSIFIER_CACHE_SIZE)
+def classify_prompt(prompt_text):
+    """
+    Tag a prompt with every category it mentions.
+
+    Args:
+        prompt_text (str): The prompt to classify
+
+    Returns:
+        frozenset: Tags from PROMPT_TAG_PATTERNS (empty when nothing matches)
+    """
+    prompt_text = prompt_text or ""
+    return frozenset(tag for tag, regex in _PROMPT_TAG_REGEXES.items() if regex.search(prompt_text))
+
+
+def is_subgroup_prompt(prompt_text):
+    """Check if a prompt is related to subgroup analysis."""
+    return SUBGROUP in classify_prompt(prompt_text)
+
+
+def response_type(prompt_text):
+    """
+    The response type save_endpoint_data stores an answer to this prompt under.
+
+    Returns:
+        str: "subgroup" for subgroup prompts, otherwise "main"
+    """
+    return "subgroup" if is_subgroup_prompt(prompt_text) else "main"
+
+
+def sorted_tags(prompt_text):
+    """Tags of a prompt as a list in PROMPT_TAG_PATTERNS order, for display and JSON."""
+    tags = classify_prompt(prompt_text)
+    return [tag for tag in PROMPT_TAG_PATTERNS if tag in tags]
+
+
+def _synthetic_prompts(count):
+    templates = [
+        "Summarize the subgroup analyses for {e}, including hazard ratios and 95% CI.",
+        "Describe adverse events and discontinuations reported for {e}.",
+        "Report the change from baseline for {e} with p-values.",
+        "Compare the change from baseline characteristics across arms for {e}.",
+        "List the baseline characteristics (age, sex, BMI) of patients assessed for {e}.",
+        "Write a results paragraph for {e} in the style of a clinical paper.",
+    ]
+    return [templates[i % len(templates)].format(e=f"endpoint {i}") for i in range(count)]
+
+
+def _benchmark(prompt_count=500, rounds=20):
+    """Prompts per second: uncompiled re.search per tag versus the precompiled patterns, cold and cached."""
+    import time
+
+    prompts = _synthetic_prompts(prompt_count)
+
+    def legacy(text):
+        # One re.search per tag, as the single-purpose is_subgroup_prompt did for one tag
+        return {tag for tag, pattern in PROMPT_TAG_PATTERNS.items() if re.search(pattern, text, flags=re.IGNORECASE)}
+
+    def throughput(fn):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for text in prompts:
+                fn(text)
+        return prompt_count * rounds / (time.perf_counter() - started)
+
+    legacy_rate = throughput(legacy)
+    compiled_rate = throughput(classify_prompt.__wrapped__)
+    classify_prompt.cache_clear()
+    cached_rate = throughput(classify_prompt)
+
+    assert all(legacy(text) == classify_prompt(text) for text in prompts)
+    print(f"per-tag re.search: {legacy_rate:12,.0f} prompts/s")
+    print(f"precompiled:       {compiled_rate:12,.0f} prompts/s")
+    print(f"cached:            {cached_rate:12,.0f} prompts/s  ({classify_prompt.cache_info().hits} hits)")
+
+
+if __name__ == "__main__":
+    _benchmark()
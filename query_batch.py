@@ -0,0 +1,139 @@
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from prompt_classifier import is_subgroup_prompt, sorted_tags
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on concurrent assistant runs per batch request, and on prompts per batch
+QUERY_BATCH_MAX_WORKERS = int(os.getenv("QUERY_BATCH_MAX_WORKERS", "5"))
+QUERY_BATCH_MAX_PROMPTS = int(os.getenv("QUERY_BATCH_MAX_PROMPTS", "20"))
+
+# Concurrency cap and size limit for bulk "generate for all selected endpoints" jobs
+BULK_GENERATE_MAX_WORKERS = int(os.getenv("BULK_GENERATE_MAX_WORKERS", "4"))
+BULK_GENERATE_MAX_ENDPOINTS = int(os.getenv("BULK_GENERATE_MAX_ENDPOINTS", "200"))
+
+
+def normalize_batch_prompts(prompts):
+    """
+    Accept a list of prompt strings or {"prompt", "is_subgroup_prompt"} dicts and
+    return a list of dicts tagged with their position in the batch and prompt_tags.
+    is_subgroup_prompt defaults to the prompt classifier when not given.
+
+    Raises:
+        ValueError: If the batch is empty, too large or contains an empty prompt
+    """
+    if not prompts:
+        raise ValueError("No prompts provided")
+    if len(prompts) > QUERY_BATCH_MAX_PROMPTS:
+        raise ValueError(f"At most {QUERY_BATCH_MAX_PROMPTS} prompts can be run in one batch")
+
+    normalized = []
+    for index, item in enumerate(prompts):
+        if isinstance(item, str):
+            item = {"prompt": item}
+        prompt = (item.get("prompt") or "").strip()
+        if not prompt:
+            raise ValueError(f"Prompt {index} is empty")
+        normalized.append({
+            "index": index,
+            "prompt": prompt,
+            "is_subgroup_prompt": bool(item.get("is_subgroup_prompt", is_subgroup_prompt(prompt))),
+            "prompt_tags": sorted_tags(prompt),
+        })
+    return normalized
+
+
+def run_query_batch(session_factory, prompts, max_workers=QUERY_BATCH_MAX_WORKERS):
+    """
+    Run every prompt on its own fresh thread (dependent=False) with a bounded worker pool.
+
+    Args:
+        session_factory: Callable returning a new AssistantSession; one is built per prompt so
+            concurrent runs never share session state
+        prompts (list): Output of normalize_batch_prompts
+        max_workers (int): Maximum number of assistant runs in flight
+
+    Returns:
+        list: One result per prompt, in prompt order, with index, prompt, is_subgroup_prompt,
+              response, citations, thread_id and error (None on success)
+    """
+    def run_one(item):
+        response, citations, thread_id = session_factory().run_query(item["prompt"], dependent=False)
+        return {**item, "response": response, "citations": citations, "thread_id": thread_id, "error": None}
+
+    results = []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(prompts))) as executor:
+        futures = {executor.submit(run_one, item): item for item in prompts}
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                results.append(future.result())
+            except Exception as e:
+                # One failed prompt should not discard the answers that did come back
+                logger.error(f"Batch prompt {item['index']} failed: {str(e)}")
+                results.append({**item, "response": "", "citations": [], "thread_id": None, "error": str(e)})
+
+    results.sort(key=lambda result: result["index"])
+    return results
+
+
+def normalize_bulk_endpoints(endpoints):
+    """
+    Validate a bulk generation queue of {"selected_bullet", "selected_category", "prompt",
+    "is_subgroup_prompt"} dicts and tag each with its queue position and prompt_tags.
+
+    Raises:
+        ValueError: If the queue is empty, too large or an entry is missing a field
+    """
+    if not endpoints:
+        raise ValueError("No endpoints selected")
+    if len(endpoints) > BULK_GENERATE_MAX_ENDPOINTS:
+        raise ValueError(f"At most {BULK_GENERATE_MAX_ENDPOINTS} endpoints can be generated in one job")
+
+    normalized = []
+    for index, item in enumerate(endpoints):
+        selected_bullet = (item.get("selected_bullet") or "").strip()
+        selected_category = (item.get("selected_category") or "").strip()
+        prompt = (item.get("prompt") or "").strip()
+        if not all([selected_bullet, selected_category, prompt]):
+            raise ValueError(f"Endpoint {index} is missing selected_bullet, selected_category or prompt")
+        normalized.append({
+            "index": index,
+            "selected_bullet": selected_bullet,
+            "selected_category": selected_category,
+            "prompt": prompt,
+            "is_subgroup_prompt": bool(item.get("is_subgroup_prompt", is_subgroup_prompt(prompt))),
+            "prompt_tags": sorted_tags(prompt),
+        })
+    return normalized
+
+
+def run_bulk_generation(job, session_factory, endpoints, save_result, max_workers=BULK_GENERATE_MAX_WORKERS):
+    """
+    Run each queued endpoint's prompt with at most max_workers assistant runs in flight,
+    saving every answer as soon as it arrives and recording progress on the job.
+
+    Args:
+        job: jobs.Job receiving one record() per endpoint
+        session_factory: Callable returning a new AssistantSession
+        endpoints (list): Output of normalize_bulk_endpoints
+        save_result: Callable (endpoint, response, citations, thread_id) -> document id
+        max_workers (int): Maximum number of concurrent assistant runs
+    """
+    def run_one(item):
+        response, citations, thread_id = session_factory().run_query(item["prompt"], dependent=False)
+        document_id = save_result(item, response, citations, thread_id)
+        return {**item, "document_id": document_id, "thread_id": thread_id}
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(endpoints))) as executor:
+        futures = {executor.submit(run_one, item): item for item in endpoints}
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                job.record(future.result())
+            except Exception as e:
+                # Keep going; the UI lists failed endpoints so they can be rerun individually
+                logger.error(f"Bulk generation failed for endpoint '{item['selected_bullet']}': {str(e)}")
+                job.record({**item, "document_id": None, "thread_id": None}, error=str(e))
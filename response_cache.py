@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# SQLite file holding cached /query answers; one row per normalized request
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "response_cache.sqlite3")
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(24 * 60 * 60)))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    citations TEXT NOT NULL,
+    thread_id TEXT,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+
+def normalize_question(question):
+    """Unicode-normalize a question and collapse runs of whitespace, so trivially different copies share a key."""
+    return " ".join(unicodedata.normalize("NFC", question or "").split())
+
+
+def make_cache_key(question, assistant_id, vector_id, dependent):
+    """Hex SHA-256 of the normalized question, assistant id, vector store id and dependency mode."""
+    payload = json.dumps([normalize_question(question), assistant_id, vector_id, bool(dependent)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    File-backed cache of assistant answers with TTL expiry and size-bounded LRU eviction.
+
+    Answers and their citations are stored together in one SQLite row. Entries older than
+    ttl seconds are misses and are purged on write; once max_entries is exceeded the least
+    recently read rows are dropped.
+    """
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, ttl=RESPONSE_CACHE_TTL, max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+                 clock=time.time):
+        """
+        Args:
+            path (str): SQLite database file, created on first use
+            ttl (float): Seconds an answer stays valid
+            max_entries (int): Maximum number of cached answers
+            clock: Wall-clock time source, injectable for tests and benchmarks
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._conn = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self):
+        # Opened lazily so importing the module never touches the filesystem
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def get(self, key):
+        """
+        Return the cached answer for key.
+
+        Returns:
+            dict or None: response, citations and thread_id, or None on a miss or expired entry
+        """
+        now = self.clock()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT response, citations, thread_id, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[3] > self.ttl:
+                if row is not None:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    conn.commit()
+                self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+        return {"response": row[0], "citations": json.loads(row[1]), "thread_id": row[2]}
+
+    def put(self, key, response, citations, thread_id):
+        """Store an answer under key, then purge expired rows and evict beyond max_entries."""
+        now = self.clock()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, citations, thread_id, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, response, json.dumps(citations or []), thread_id, now, now)
+            )
+            conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+            evicted = conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+            conn.commit()
+        if evicted:
+            logger.info(f"Evicted {evicted} cached responses")
+
+    def invalidate(self, key):
+        """Drop the cached answer for key."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+# Process-wide cache used by /query
+response_cache = ResponseCache()
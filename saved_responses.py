@@ -0,0 +1,145 @@
+import hashlib
+from datetime import datetime
+
+# Section responses saved through the /<section>/save_*_response routes, one document per save:
+# {file_name, section, user_query, assistant_response, citation_ids, thread_id, selected_endpoint,
+# selected_category, created_at, updated_at}. Responses saved before the citation store hold
+# inline "citations" instead of citation_ids.
+SAVED_RESPONSES_COLLECTION = "saved_responses"
+
+# Paper sections in document order
+PAPER_SECTIONS = ["introduction", "methods", "results", "discussion", "conclusion"]
+
+# Fields returned for each ?fields= value of /export/get_saved_responses; "full" returns everything
+SAVED_RESPONSE_PROJECTIONS = {
+    "text": {"_id": 1, "section": 1, "user_query": 1, "assistant_response": 1, "created_at": 1, "updated_at": 1},
+    "citations": {"_id": 1, "section": 1, "user_query": 1, "assistant_response": 1, "citations": 1,
+                  "citation_ids": 1, "created_at": 1, "updated_at": 1},
+    "full": None,
+}
+
+SAVED_RESPONSES_PAGE_SIZE = 20
+SAVED_RESPONSES_MAX_PAGE_SIZE = 200
+
+
+def iter_saved_responses(db, file_name, section, projection=None):
+    """
+    Cursor over the responses saved for one section, oldest first. Documents are fetched
+    in batches as the cursor is consumed, so a large section is never loaded at once.
+
+    Args:
+        db: MongoDB database connection
+        file_name (str): The paper
+        section (str): One of PAPER_SECTIONS
+        projection (dict, optional): Fields to return
+    """
+    return db[SAVED_RESPONSES_COLLECTION].find(
+        {"file_name": file_name, "section": section}, projection
+    ).sort("created_at", 1)
+
+
+def saved_content_fingerprint(db, file_name, sections):
+    """
+    Hash of the ids and updated_at of every response saved for the given sections, read
+    with a projection of just those two fields. Changes whenever a response is added,
+    edited or removed.
+
+    Returns:
+        str: Hex SHA-256
+    """
+    digest = hashlib.sha256(file_name.encode("utf-8"))
+    for section in sections:
+        digest.update(f"\0{section}".encode("utf-8"))
+        for doc in iter_saved_responses(db, file_name, section, {"_id": 1, "updated_at": 1}):
+            digest.update(f"{doc['_id']}:{doc.get('updated_at')};".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def save_section_response(db, file_name, section, user_query, assistant_response, citations, thread_id=None,
+                          selected_endpoint=None, selected_category=None):
+    """
+    Save one section response for the /<section>/save_*_response routes. Its citations go to
+    the citation store and the response keeps only their ids.
+
+    Returns:
+        str: The ID of the inserted document
+    """
+    # Imported here so the UIs can read PAPER_SECTIONS without pulling in pymongo
+    from citation_store import store_citations
+
+    now = datetime.utcnow()
+    result = db[SAVED_RESPONSES_COLLECTION].insert_one({
+        "file_name": file_name,
+        "section": section,
+        "user_query": user_query,
+        "assistant_response": assistant_response,
+        "citation_ids": store_citations(db, citations),
+        "thread_id": thread_id,
+        "selected_endpoint": selected_endpoint,
+        "selected_category": selected_category,
+        "created_at": now,
+        "updated_at": now
+    })
+    return str(result.inserted_id)
+
+
+def count_saved_responses(db, file_name):
+    """
+    Number of saved responses per section, counted on the server in one aggregation
+    without reading any response text.
+
+    Returns:
+        dict: {section: count} for every section in PAPER_SECTIONS
+    """
+    counts = dict.fromkeys(PAPER_SECTIONS, 0)
+    for row in db[SAVED_RESPONSES_COLLECTION].aggregate([
+        {"$match": {"file_name": file_name}},
+        {"$group": {"_id": "$section", "count": {"$sum": 1}}},
+    ]):
+        if row["_id"] in counts:
+            counts[row["_id"]] = row["count"]
+    return counts
+
+
+def page_saved_responses(db, file_name, section, projection=None, page=1,
+                         page_size=SAVED_RESPONSES_PAGE_SIZE, updated_since=None):
+    """
+    One page of the responses saved for a section, oldest first.
+
+    Args:
+        db: MongoDB database connection
+        file_name (str): The paper
+        section (str): One of PAPER_SECTIONS
+        projection (dict, optional): Fields to return
+        page (int): 1-based page number
+        page_size (int): Responses per page
+        updated_since (datetime, optional): Only return responses updated after this time
+
+    Returns:
+        tuple: (list of documents, bool whether a later page exists)
+    """
+    query = {"file_name": file_name, "section": section}
+    if updated_since is not None:
+        query["updated_at"] = {"$gt": updated_since}
+
+    # One extra document tells whether another page exists without a separate count
+    docs = list(
+        db[SAVED_RESPONSES_COLLECTION].find(query, projection)
+        .sort([("created_at", 1), ("_id", 1)])
+        .skip((page - 1) * page_size)
+        .limit(page_size + 1)
+    )
+    return docs[:page_size], len(docs) > page_size
+
+
+def serialize_saved_response(doc):
+    """Make a saved response JSON-safe: _id becomes a string "id" and datetimes ISO strings."""
+    item = {}
+    for key, value in doc.items():
+        if key == "_id":
+            item["id"] = str(value)
+        elif isinstance(value, datetime):
+            item[key] = value.isoformat()
+        else:
+            item[key] = value
+    return item
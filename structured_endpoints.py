@@ -0,0 +1,119 @@
+import logging
+from datetime import datetime
+
+from endpoint_parser import extract_endpoints
+
+logger = logging.getLogger(__name__)
+
+# Generated section text and its parsed endpoints, one document per (file_name, section)
+SECTION_RESULTS_COLLECTION = "section_results"
+
+# Bounds on the shape display_endpoints walks: category -> list | dict, dicts nesting further
+ENDPOINTS_MAX_DEPTH = 4
+ENDPOINTS_MAX_ITEMS = 2000
+ENDPOINTS_MAX_TEXT = 1000
+
+
+def validate_endpoints(endpoints):
+    """
+    Check an endpoints object against the schema display_endpoints expects:
+
+        {category: [endpoint, ...] | {name: [endpoint, ...] | {...} | endpoint}}
+
+    Keys must be non-empty strings, leaves strings or numbers, nesting at most
+    ENDPOINTS_MAX_DEPTH levels and at most ENDPOINTS_MAX_ITEMS leaves in total.
+
+    Raises:
+        ValueError: Naming the path of the first invalid value
+    """
+    if not isinstance(endpoints, dict) or not endpoints:
+        raise ValueError("endpoints must be a non-empty object of categories")
+
+    leaves = 0
+    stack = [("endpoints", endpoints, 1)]
+    while stack:
+        path, value, depth = stack.pop()
+        if depth > ENDPOINTS_MAX_DEPTH:
+            raise ValueError(f"{path}: nested deeper than {ENDPOINTS_MAX_DEPTH} levels")
+
+        if isinstance(value, dict):
+            for key, child in value.items():
+                if not isinstance(key, str) or not key.strip():
+                    raise ValueError(f"{path}: keys must be non-empty strings")
+                stack.append((f"{path}.{key}", child, depth + 1))
+        elif isinstance(value, list):
+            if depth == 1:
+                raise ValueError(f"{path}: the top level must be an object")
+            for index, item in enumerate(value):
+                if isinstance(item, (dict, list)):
+                    stack.append((f"{path}[{index}]", item, depth + 1))
+                else:
+                    stack.append((f"{path}[{index}]", item, depth))
+        elif isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise ValueError(f"{path}: endpoints must be text, got {type(value).__name__}")
+        else:
+            if len(str(value)) > ENDPOINTS_MAX_TEXT:
+                raise ValueError(f"{path}: longer than {ENDPOINTS_MAX_TEXT} characters")
+            leaves += 1
+            if leaves > ENDPOINTS_MAX_ITEMS:
+                raise ValueError(f"endpoints: more than {ENDPOINTS_MAX_ITEMS} entries")
+
+
+def structure_section_result(response_text):
+    """
+    Parse and validate the endpoints block in a generated section.
+
+    Returns:
+        tuple: (endpoints, error) where endpoints is the validated dict or None,
+               and error explains why it is None
+    """
+    endpoints = extract_endpoints(response_text or "")
+    if endpoints is None:
+        return None, "No endpoints block found in the response"
+    try:
+        validate_endpoints(endpoints)
+    except ValueError as e:
+        return None, str(e)
+    return endpoints, None
+
+
+def save_section_result(db, file_name, section, result, endpoints):
+    """
+    Persist a generated section together with its structured endpoints.
+
+    Args:
+        db: MongoDB database connection
+        file_name (str): The paper the section was generated for
+        section (str): Section name, e.g. "results"
+        result (dict): The generator's JSON response (section text, citations, thread_id, prompt)
+        endpoints (dict or None): Validated endpoints from structure_section_result
+    """
+    now = datetime.utcnow()
+    db[SECTION_RESULTS_COLLECTION].update_one(
+        {"file_name": file_name, "section": section},
+        {
+            "$set": {
+                "text": result.get(section, ""),
+                "citations": result.get("citations", []),
+                "thread_id": result.get("thread_id"),
+                "prompt": result.get(f"{section}_prompt", ""),
+                "endpoints": endpoints,
+                "updated_at": now
+            },
+            "$setOnInsert": {"created_at": now}
+        },
+        upsert=True
+    )
+
+
+def load_section_result(db, file_name, section):
+    """
+    Load the stored section text and structured endpoints.
+
+    Returns:
+        dict or None: text, citations, thread_id, prompt, endpoints and updated_at
+    """
+    return db[SECTION_RESULTS_COLLECTION].find_one(
+        {"file_name": file_name, "section": section},
+        {"_id": 0, "file_name": 0, "section": 0, "created_at": 0}
+    )
@@ -0,0 +1,123 @@
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Start of a bullet line: "-", "*" or "•", or a number followed by "." or ")", then whitespace
+BULLET_MARKER = re.compile(r"^[ \t]*(?:[-*•]|\d+[.)])[ \t]+", re.MULTILINE)
+
+# Parsed subgroup responses memoized by content hash; every rerun of the methods and
+# conclusion tabs asks for the same few responses again
+SUBGROUP_PARSE_CACHE_SIZE = 256
+
+_parse_cache = OrderedDict()
+_parse_cache_lock = threading.Lock()
+
+
+def split_bullets(text):
+    """
+    Split a subgroup response into its bullet points.
+
+    Each bullet runs from its marker to the next marker (or the end of the text), so
+    continuation lines stay with their bullet; text before the first bullet is ignored.
+
+    Returns:
+        list: Bullet texts, stripped and with newlines collapsed to spaces
+    """
+    if not text:
+        return []
+    markers = list(BULLET_MARKER.finditer(text))
+    bullets = []
+    for marker, following in zip(markers, markers[1:] + [None]):
+        end = following.start() if following else len(text)
+        bullet = text[marker.end():end].strip().replace("\n", " ")
+        if bullet:
+            bullets.append(bullet)
+    return bullets
+
+
+def parse_bullets(text):
+    """
+    Memoized split_bullets keyed by the SHA-256 of the text.
+    The returned tuple is shared between calls.
+    """
+    if not text:
+        return ()
+
+    key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    with _parse_cache_lock:
+        if key in _parse_cache:
+            _parse_cache.move_to_end(key)
+            return _parse_cache[key]
+
+    bullets = tuple(split_bullets(text))
+
+    with _parse_cache_lock:
+        _parse_cache[key] = bullets
+        while len(_parse_cache) > SUBGROUP_PARSE_CACHE_SIZE:
+            _parse_cache.popitem(last=False)
+    return bullets
+
+
+def get_subgroup_bullets(endpoint):
+    """
+    Bullets for each of an endpoint's subgroup_assistant_responses.
+
+    Uses the subgroup_bullets the backend split at save time when they line up with the
+    responses, and only parses (memoized) the responses saved before that existed.
+
+    Returns:
+        list: One sequence of bullet texts per subgroup response
+    """
+    responses = endpoint.get("subgroup_assistant_responses") or []
+    stored = endpoint.get("subgroup_bullets") or []
+    return [
+        stored[index] if index < len(stored) and stored[index] is not None else parse_bullets(text)
+        for index, text in enumerate(responses)
+    ]
+
+
+def _synthetic_response(bullet_count):
+    markers = ["-", "*", "•", "1.", "2)"]
+    return "Subgroup analyses reported:\n\n" + "\n".join(
+        f"{markers[i % len(markers)]} Subgroup {i}: patients aged {40 + i % 30} or older\n"
+        f"  with baseline HbA1c above {7 + i % 3}% (n={i * 7})"
+        for i in range(bullet_count)
+    )
+
+
+def _benchmark(bullet_counts=(10, 50, 200), responses=20, reruns=50):
+    """Per-rerun cost of the lazy DOTALL findall versus the marker scan, cold and memoized."""
+    import time
+
+    legacy_pattern = r'^\s*-\s(.+?)(?=^\s*-\s|\Z)'
+
+    print(f"{'bullets':>8} {'re.findall':>12} {'scan':>10} {'memoized':>10}")
+    for count in bullet_counts:
+        texts = [_synthetic_response(count) + f"\n\nVariant {r}" for r in range(responses)]
+
+        started = time.perf_counter()
+        for _ in range(reruns):
+            for text in texts:
+                re.findall(legacy_pattern, text, re.DOTALL | re.MULTILINE)
+        legacy_us = (time.perf_counter() - started) * 1e6 / reruns
+
+        started = time.perf_counter()
+        for _ in range(reruns):
+            for text in texts:
+                split_bullets(text)
+        scan_us = (time.perf_counter() - started) * 1e6 / reruns
+
+        for text in texts:
+            parse_bullets(text)
+        started = time.perf_counter()
+        for _ in range(reruns):
+            for text in texts:
+                parse_bullets(text)
+        cached_us = (time.perf_counter() - started) * 1e6 / reruns
+
+        print(f"{count:>8} {legacy_us:>9.0f} us {scan_us:>7.0f} us {cached_us:>7.0f} us")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,21 @@
+from prompt_classifier import classify_prompt, response_type, sorted_tags
+
+
+def test_overlapping_phrases_keep_both_tags():
+    # "baseline" ends the efficacy phrase and starts the demographics one
+    assert classify_prompt("Report the change from baseline characteristics") == {"efficacy", "demographics"}
+
+
+def test_abbreviations_are_case_sensitive():
+    assert classify_prompt("Report HRs and 95% CIs") == {"statistical"}
+    assert classify_prompt("Summarize the results or discuss them in hrs") == frozenset()
+
+
+def test_stratification_is_not_a_subgroup_prompt():
+    prompt = "Describe how people were randomised, including the tool used and any stratification."
+    assert response_type(prompt) == "main"
+    assert response_type("Summarize the sub-group analyses") == "subgroup"
+
+
+def test_sorted_tags_follow_pattern_order():
+    assert sorted_tags("PK and adverse events by subgroup") == ["subgroup", "safety", "pharmacokinetics"]
@@ -1,13 +1,17 @@
 import streamlit as st
 import requests
 import logging
-import ast
 import hashlib
-import re
 import os
 from dotenv import load_dotenv
 import json
 from pathlib import Path
+from endpoint_parser import parse_endpoints
+from subgroup_parser import get_subgroup_bullets
+from prompt_classifier import is_subgroup_prompt
+from backend_client import download_filename, upload_file_chunked, wait_for_upload
+from saved_responses import PAPER_SECTIONS
+from export_preview import get_section_fragments, load_export_section, load_export_section_counts
 
 # Load environment variables
 load_dotenv()
@@ -506,13 +510,24 @@ def show_upload_screen():
                 # Create progress bar
                 progress_bar = st.progress(0)
                 
-                # Upload the file
-                files = {"file": uploaded_file}
-                response = requests.post(f"{API_BASE_URL}/upload", files=files)
-                progress_bar.progress(50)
+                # Upload the file in chunks; the backend answers the finalize step with a job id straight away
+                response = upload_file_chunked(
+                    uploaded_file,
+                    uploaded_file.name,
+                    uploaded_file.size,
+                    on_progress=lambda upload_id, offset, size: progress_bar.progress(int(30 * offset / size))
+                )
                 
-                if response.status_code == 200:
-                    result = response.json()
+                if response.status_code in (200, 202):
+                    if response.status_code == 200:
+                        # Already ingested: the backend returned the existing assistant straight away
+                        result = response.json()
+                    else:
+                        # Poll the ingestion job until the assistant is ready
+                        result = wait_for_upload(
+                            response.json()["job_id"],
+                            on_progress=lambda status: progress_bar.progress(30 + int(70 * status["completed"] / status["total"]))
+                        )
                     if isinstance(result, dict):
                         # Update progress
                         progress_bar.progress(100)
@@ -608,6 +623,22 @@ def show_results_tab():
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown("# Results Section")
     
+    # Reload endpoints generated earlier for this paper (another session or a page reload)
+    if not st.session_state["results"] and st.session_state.file_name and st.session_state.get("results_loaded_for") != st.session_state.file_name:
+        st.session_state["results_loaded_for"] = st.session_state.file_name
+        st.session_state["results_endpoints"] = None
+        try:
+            stored = requests.get(f"{API_BASE_URL}/results/structured_endpoints", params={"file_name": st.session_state.file_name})
+            if stored.status_code == 200:
+                stored = stored.json()
+                st.session_state["results"] = stored.get("text", "")
+                st.session_state["results_citations"] = stored.get("citations", [])
+                st.session_state["results_thread_id"] = stored.get("thread_id")
+                st.session_state["results_prompt"] = stored.get("prompt", "")
+                st.session_state["results_endpoints"] = stored.get("endpoints")
+        except Exception as e:
+            logger.warning(f"Could not load stored endpoints: {e}")
+    
     # Generate endpoints button
     if st.button("🔍 Generate Endpoints", key="generate_results_endpoints", type="primary"):
         with st.spinner("Generating endpoints... This may take a moment."):
@@ -620,7 +651,8 @@ def show_results_tab():
                     # Prepare the payload
                     payload = {
                         'assistant_id': st.session_state.assistant_id,
-                        'vector_id': st.session_state.vector_id
+                        'vector_id': st.session_state.vector_id,
+                        'file_name': st.session_state.file_name
                     }
                     
                     # Send the request to the backend
@@ -632,6 +664,8 @@ def show_results_tab():
                         st.session_state["results_citations"] = result.get("citations", [])
                         st.session_state["results_thread_id"] = result.get("thread_id", None)
                         st.session_state["results_prompt"] = result.get("results_prompt", "")
+                        # Structured endpoints parsed and validated by the backend
+                        st.session_state["results_endpoints"] = result.get("endpoints")
                         
                         st.success("Endpoints generated successfully!")
                     else:
@@ -648,17 +682,11 @@ def show_results_tab():
         try:
             response = st.session_state["results"]
             
-            # Try matching either 'endpoints = {...}' or just a raw dictionary
-            match = re.search(r"endpoints\s*=\s*({.*})", response, re.DOTALL)
-            if not match:
-                match = re.search(r"({\s*['\"]primary['\"].*})", response, re.DOTALL)
+            # Prefer the backend's structured endpoints; older results fall back to parsing the text
+            endpoints_dict = st.session_state.get("results_endpoints") or parse_endpoints(response)
             
-            if match:
-                endpoints_str = match.group(1)
+            if endpoints_dict is not None:
                 try:
-                    # Convert the string representation to a Python dictionary
-                    endpoints_dict = ast.literal_eval(endpoints_str)
-                    
                     # Create tabs for different endpoint categories
                     endpoint_tabs = list(endpoints_dict.keys())
                     
@@ -723,6 +751,9 @@ def show_results_tab():
                                 # Save button for the response
                                 if st.button("💾 Save Response", key="save_checkbox_response_button"):
                                     save_endpoint_response(response_text)
+                        
+                        # Responses from "Run All Prompts" for the selected endpoint
+                        show_batch_endpoint_results()
                     
                     with tab2:
                         show_general_results_queries()
@@ -825,6 +856,10 @@ def show_prompt_selection(is_safety_endpoint):
     # Execute button
     if st.button("▶️ Execute Prompt", key="execute_results_prompt"):
         run_endpoint_prompt(prompt_selection, checkbox_dependent)
+    
+    # Run every prompt template for this endpoint at once
+    if st.button("⏩ Run All Prompts for This Endpoint", key="execute_all_results_prompts"):
+        run_all_endpoint_prompts(prompt_options)
 
 def run_endpoint_prompt(prompt, dependent):
     """Run the selected endpoint prompt."""
@@ -881,6 +916,99 @@ def run_endpoint_prompt(prompt, dependent):
             st.session_state["selected_category"] = temp_selected_category
             st.error(f"Error: {str(e)}")
 
+def run_all_endpoint_prompts(prompts):
+    """Run all prompt templates for the selected endpoint concurrently through /query_batch."""
+    with st.spinner(f"Running {len(prompts)} prompts in parallel..."):
+        try:
+            payload = {
+                "file_name": st.session_state.file_name,
+                "assistant_id": st.session_state.assistant_id,
+                "vector_id": st.session_state.vector_id,
+                "prompts": [
+                    {"prompt": prompt, "is_subgroup_prompt": is_subgroup_prompt(prompt)}
+                    for prompt in prompts
+                ],
+            }
+            
+            response = requests.post(f"{API_BASE_URL}/query_batch", json=payload)
+            
+            if response.status_code == 200:
+                result = response.json()
+                st.session_state["batch_endpoint_results"] = {
+                    "selected_bullet": st.session_state["selected_bullet"],
+                    "selected_category": st.session_state["selected_category"],
+                    "results": result.get("results", []),
+                }
+                if result.get("failed"):
+                    st.warning(f"{result['failed']} of {len(prompts)} prompts failed.")
+                else:
+                    st.success(f"All {len(prompts)} prompts processed successfully!")
+            else:
+                st.error(response.json().get("error", "Failed to run the prompts."))
+        except Exception as e:
+            st.error(f"Error: {str(e)}")
+
+def show_batch_endpoint_results():
+    """Display the responses from a "Run All Prompts" batch, each editable and savable."""
+    batch = st.session_state.get("batch_endpoint_results")
+    if not batch:
+        return
+    
+    st.markdown("---")
+    st.markdown(f"### ⏩ All Prompt Responses for: {batch['selected_bullet']}")
+    
+    for result in batch["results"]:
+        label = f"Prompt {result['index'] + 1}"
+        tags = result.get("prompt_tags") or (["subgroup"] if result.get("is_subgroup_prompt") else [])
+        if tags:
+            label += f" ({', '.join(tags)})"
+        
+        with st.expander(label, expanded=False):
+            st.code(result["prompt"], language="")
+            
+            if result.get("error"):
+                st.error(f"Error: {result['error']}")
+                continue
+            
+            response_text = st.text_area(
+                "Edit AI response:",
+                result["response"],
+                height=250,
+                key=f"batch_response_text_{result['index']}"
+            )
+            
+            if result.get("citations"):
+                st.markdown("**Citations:**")
+                for i, citation in enumerate(result["citations"]):
+                    st.markdown(f"**Citation {i+1}:** {citation}")
+            
+            if st.button("💾 Save Response", key=f"save_batch_response_{result['index']}"):
+                save_batch_endpoint_response(batch, result, response_text)
+
+def save_batch_endpoint_response(batch, result, response_text):
+    """Save one response from a "Run All Prompts" batch."""
+    with st.spinner("Saving your response..."):
+        try:
+            payload = {
+                'file_name': st.session_state.file_name,
+                'user_query': result["prompt"],
+                'assistant_response': response_text,
+                'citations': result.get("citations", []),
+                'thread_id': result.get("thread_id"),
+                'selected_bullet': batch["selected_bullet"],
+                'selected_category': batch["selected_category"],
+                'is_subgroup': result.get("is_subgroup_prompt", False)
+            }
+            
+            save_response = requests.post(f"{API_BASE_URL}/save_endpoint_response", json=payload)
+            
+            if save_response.status_code == 200:
+                st.success("Response saved successfully!")
+            else:
+                st.error(f"Error saving response: {save_response.json().get('error', 'Unknown error')}")
+        except Exception as e:
+            st.error(f"An error occurred: {e}")
+
 def save_endpoint_response(response_text):
     """Save the edited endpoint response."""
     with st.spinner("Saving your response..."):
@@ -1224,11 +1352,8 @@ def show_methods_endpoints():
                                     with st.expander(f"Subgroups for '{ename}'", expanded=True):
                                         st.markdown("Select a subgroup for more detailed analysis:")
                                         
-                                        for s_idx, subgroup_text in enumerate(subgroup_responses):
-                                            bullet_points = re.findall(r'^\s*-\s(.+?)(?=^\s*-\s|\Z)', subgroup_text, re.DOTALL | re.MULTILINE)
-                                            
-                                            for b_idx, bullet in enumerate(bullet_points):
-                                                bullet_clean = bullet.strip().replace('\n', ' ')
+                                        for s_idx, bullet_points in enumerate(get_subgroup_bullets(endpoint)):
+                                            for b_idx, bullet_clean in enumerate(bullet_points):
                                                 bullet_key = f"{eid}_sub_{s_idx}_bullet_{b_idx}"
                                                 
                                                 bullet_selected = st.checkbox(
@@ -1588,11 +1713,8 @@ def show_conclusion_endpoints():
                                     with st.expander(f"Subgroups for '{ename}'", expanded=True):
                                         st.markdown("Select a subgroup for more detailed analysis:")
                                         
-                                        for s_idx, subgroup_text in enumerate(subgroup_responses):
-                                            bullet_points = re.findall(r'^\s*-\s(.+?)(?=^\s*-\s|\Z)', subgroup_text, re.DOTALL | re.MULTILINE)
-                                            
-                                            for b_idx, bullet in enumerate(bullet_points):
-                                                bullet_clean = bullet.strip().replace('\n', ' ')
+                                        for s_idx, bullet_points in enumerate(get_subgroup_bullets(endpoint)):
+                                            for b_idx, bullet_clean in enumerate(bullet_points):
                                                 bullet_key = f"{eid}_sub_{s_idx}_bullet_{b_idx}"
                                                 
                                                 bullet_selected = st.checkbox(
@@ -2112,18 +2234,18 @@ def show_export_tab():
     You can customize the format and export options below.
     """)
     
+    # Counts and loaded previews are reused across reruns; this forces a fresh fetch
+    refresh_content = st.button("🔄 Refresh saved content", key="refresh_export_content")
+    
     # Get saved content
     with st.spinner("Loading saved content..."):
         try:
-            params = {'file_name': st.session_state.file_name}
-            response = requests.get(f"{API_BASE_URL}/export/get_saved_responses", params=params)
+            section_counts = load_export_section_counts(force=refresh_content)
             
-            if response.status_code == 200:
-                saved_content = response.json()
+            if section_counts is not None:
                 
                 # Check if there's any content to display
-                has_content = any(saved_content.get(section, []) for section in 
-                                ["introduction", "methods", "results", "discussion", "conclusion"])
+                has_content = any(section_counts.get(section, 0) for section in PAPER_SECTIONS)
                 
                 if has_content:
                     # Layout with sections side by side
@@ -2171,45 +2293,49 @@ def show_export_tab():
                             "Introduction",
                             value=True,
                             key="include_introduction_checkbox",
-                            disabled=not saved_content.get("introduction", [])
+                            disabled=not section_counts.get("introduction", 0)
                         )
                         
                         include_methods = st.checkbox(
                             "Methods",
                             value=True,
                             key="include_methods_checkbox",
-                            disabled=not saved_content.get("methods", [])
+                            disabled=not section_counts.get("methods", 0)
                         )
                         
                         include_results = st.checkbox(
                             "Results",
                             value=True,
                             key="include_results_checkbox",
-                            disabled=not saved_content.get("results", [])
+                            disabled=not section_counts.get("results", 0)
                         )
                         
                         include_discussion = st.checkbox(
                             "Discussion",
                             value=True,
                             key="include_discussion_checkbox",
-                            disabled=not saved_content.get("discussion", [])
+                            disabled=not section_counts.get("discussion", 0)
                         )
                         
                         include_conclusion = st.checkbox(
                             "Conclusion",
                             value=True,
                             key="include_conclusion_checkbox",
-                            disabled=not saved_content.get("conclusion", [])
+                            disabled=not section_counts.get("conclusion", 0)
                         )
                     
                     # Preview section
                     st.markdown("### Document Preview")
                     
-                    # Create tabs for previewing each section
-                    section_tabs = st.tabs(["Abstract", "Introduction", "Methods", "Results", "Discussion", "Conclusion"])
+                    # Only the section being previewed is fetched, a page at a time
+                    preview_section = st.radio(
+                        "Preview section:",
+                        ["Abstract", "Introduction", "Methods", "Results", "Discussion", "Conclusion"],
+                        horizontal=True,
+                        key="export_preview_section"
+                    )
                     
-                    # Populate tabs with content
-                    with section_tabs[0]:
+                    if preview_section == "Abstract":
                         if include_abstract:
                             st.markdown("#### Abstract")
                             # Abstract generation logic would go here
@@ -2228,56 +2354,41 @@ def show_export_tab():
                                 )
                         else:
                             st.info("Abstract section is not included in the export.")
-                    
-                    # Introduction tab
-                    with section_tabs[1]:
-                        if include_introduction and saved_content.get("introduction", []):
-                            st.markdown("#### Introduction")
-                            intro_content = "\n\n".join([item.get("assistant_response", "") 
-                                                       for item in saved_content.get("introduction", [])])
-                            st.markdown(intro_content)
-                        else:
-                            st.info("Introduction section is not included in the export or has no saved content.")
-                    
-                    # Methods tab
-                    with section_tabs[2]:
-                        if include_methods and saved_content.get("methods", []):
-                            st.markdown("#### Methods")
-                            methods_content = "\n\n".join([item.get("assistant_response", "") 
-                                                         for item in saved_content.get("methods", [])])
-                            st.markdown(methods_content)
-                        else:
-                            st.info("Methods section is not included in the export or has no saved content.")
-                    
-                    # Results tab
-                    with section_tabs[3]:
-                        if include_results and saved_content.get("results", []):
-                            st.markdown("#### Results")
-                            results_content = "\n\n".join([item.get("assistant_response", "") 
-                                                         for item in saved_content.get("results", [])])
-                            st.markdown(results_content)
-                        else:
-                            st.info("Results section is not included in the export or has no saved content.")
-                    
-                    # Discussion tab
-                    with section_tabs[4]:
-                        if include_discussion and saved_content.get("discussion", []):
-                            st.markdown("#### Discussion")
-                            discussion_content = "\n\n".join([item.get("assistant_response", "") 
-                                                            for item in saved_content.get("discussion", [])])
-                            st.markdown(discussion_content)
-                        else:
-                            st.info("Discussion section is not included in the export or has no saved content.")
-                    
-                    # Conclusion tab
-                    with section_tabs[5]:
-                        if include_conclusion and saved_content.get("conclusion", []):
-                            st.markdown("#### Conclusion")
-                            conclusion_content = "\n\n".join([item.get("assistant_response", "") 
-                                                           for item in saved_content.get("conclusion", [])])
-                            st.markdown(conclusion_content)
+                    else:
+                        section = preview_section.lower()
+                        included_sections = {
+                            "introduction": include_introduction,
+                            "methods": include_methods,
+                            "results": include_results,
+                            "discussion": include_discussion,
+                            "conclusion": include_conclusion
+                        }
+                        
+                        if included_sections[section] and section_counts.get(section, 0):
+                            section_content = load_export_section(section, section_counts[section])
+                            if section_content is None:
+                                st.error(f"Failed to load saved {section} content.")
+                            else:
+                                # Rendered fragments are cached; only a changed section is re-rendered
+                                fragment_cache = st.session_state.setdefault("export_preview_fragments", {})
+                                fragments = get_section_fragments(
+                                    fragment_cache.setdefault(st.session_state.file_name, {}),
+                                    {section: section_content["items"]},
+                                    [section]
+                                )
+                                st.markdown(f"#### {preview_section}")
+                                st.markdown(fragments[section])
+                                
+                                if section_content["has_more"]:
+                                    st.caption(f"Showing {len(section_content['items'])} of {section_counts[section]} saved responses.")
+                                    st.button(
+                                        "Load more",
+                                        key=f"export_load_more_{section}",
+                                        on_click=load_export_section,
+                                        args=(section, section_counts[section], True)
+                                    )
                         else:
-                            st.info("Conclusion section is not included in the export or has no saved content.")
+                            st.info(f"{preview_section} section is not included in the export or has no saved content.")
                     
                     # Export buttons
                     st.markdown("---")
@@ -2305,20 +2416,34 @@ def show_export_tab():
                                     }
                                 }
                                 
-                                # Call export API (placeholder)
-                                # In a real implementation, this would call the API and handle the file download
-                                
-                                # Simulate success for demo
-                                st.success(f"Document exported successfully as {export_format}!")
-                                st.markdown(f"""
-                                <div style="text-align: center; margin-top: 20px;">
-                                    <a href="#" download="research_paper.{export_format.lower()}" 
-                                       style="padding: 10px 20px; background-color: #0066CC; color: white; 
-                                              text-decoration: none; border-radius: 4px;">
-                                        Download Document
-                                    </a>
-                                </div>
-                                """, unsafe_allow_html=True)
+                                try:
+                                    response = requests.post(f"{API_BASE_URL}/export/build", json=export_payload)
+                                    if response.status_code == 200:
+                                        st.session_state["export_artifact"] = {
+                                            "data": response.content,
+                                            "file_name": download_filename(response, f"research_paper.{export_format.lower()}"),
+                                            "mime": response.headers.get("Content-Type", "application/octet-stream"),
+                                        }
+                                        if response.headers.get("X-Export-Cache") == "hit":
+                                            st.success(f"Document exported successfully as {export_format}! (unchanged since the last export)")
+                                        else:
+                                            st.success(f"Document exported successfully as {export_format}!")
+                                    else:
+                                        st.session_state["export_artifact"] = None
+                                        st.error(f"Export failed: {response.json().get('error', 'Unknown error')}")
+                                except Exception as e:
+                                    st.error(f"An error occurred while exporting: {str(e)}")
+                        
+                        # Offer the last built document for download
+                        export_artifact = st.session_state.get("export_artifact")
+                        if export_artifact:
+                            st.download_button(
+                                "⬇️ Download Document",
+                                data=export_artifact["data"],
+                                file_name=export_artifact["file_name"],
+                                mime=export_artifact["mime"],
+                                use_container_width=True
+                            )
                 else:
                     st.warning("No saved content found for export. Please generate and save content in the different sections first.")
             else:
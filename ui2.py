@@ -1,13 +1,15 @@
 import streamlit as st
-import requests
+from backend_client import api_get, api_post, api_stream, download_filename, upload_file_chunked, wait_for_upload
+from saved_responses import PAPER_SECTIONS
+from export_preview import get_section_fragments, load_export_section, load_export_section_counts
 import logging
-import ast
 import hashlib
-import re
 import os
 from dotenv import load_dotenv
 import json
 from pathlib import Path
+from endpoint_tree import EndpointSearchIndex, paginate
+from subgroup_parser import get_subgroup_bullets
 import time
 from datetime import datetime
 
@@ -19,8 +21,7 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:5000/")
-API_BASE_URL = "http://localhost:5000/"
+# Backend calls go through the pooled client in backend_client.py (API_BASE_URL is configured there)
 
 # Set page configuration with professional appearance
 st.set_page_config(
@@ -724,7 +725,18 @@ def clear_session():
             f"outside_{section}_chat_citations",
         ]:
             st.session_state[sub_key] = [] if 'citations' in sub_key else ""
-    
+
+    # Reset the endpoint browsers
+    for key in ["selected_endpoints_for_methods", "conclusion_selected_endpoints_for_methods"]:
+        st.session_state[key] = []
+        st.session_state[f"{key}_categories"] = {}
+    for prefix in ["methods", "conclusion_methods"]:
+        st.session_state[f"{prefix}_endpoint_page"] = 1
+    st.session_state["export_artifact"] = None
+    st.session_state.pop("export_section_counts", None)
+    st.session_state.pop("export_section_content", None)
+    st.session_state.pop("export_preview_fragments", None)
+
     # Clear additional session state variables for outside queries
     for key in ["selected_queries_outside", "selected_responses_outside", "results_outside", 
                 "final_edited_responses_outside", "view_final_edited_outside", 
@@ -739,6 +751,132 @@ def generate_unique_key(*args):
     """Generate a unique key for UI elements based on their arguments."""
     return hashlib.md5("".join(map(str, args)).encode('utf-8')).hexdigest()
 
+def fetch_categorized_endpoints(file_name):
+    """Fetch the saved endpoints for a file, revalidating the session's copy with its ETag."""
+    cache = st.session_state.setdefault("categorized_endpoints_cache", {})
+    cached = cache.get(file_name)
+    
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    
+    response = api_get("/methods/get_endpoints_for_methods", params={'file_name': file_name}, headers=headers)
+    
+    # Nothing changed on the backend since the last fetch
+    if response.status_code == 304 and cached:
+        return cached["endpoints"]
+    
+    if response.status_code == 200:
+        categorized_endpoints = response.json().get("endpoints", {})
+        cache[file_name] = {"etag": response.headers.get("ETag"), "endpoints": categorized_endpoints}
+        return categorized_endpoints
+    
+    raise RuntimeError(f"API Error: {response.json().get('error', 'Unknown error')}")
+
+ENDPOINTS_PAGE_SIZE = 25
+
+def get_categorized_endpoints_index(file_name, categorized_endpoints):
+    """Search index over categorized endpoints, kept with the ETag-cached copy and rebuilt only when it changes."""
+    cached = st.session_state.get("categorized_endpoints_cache", {}).get(file_name)
+    if cached and cached["endpoints"] is categorized_endpoints and "index" in cached:
+        return cached["index"]
+    
+    index = EndpointSearchIndex(
+        ((category, endpoint), endpoint.get("endpoint_name", ""))
+        for category, endpoints in categorized_endpoints.items()
+        for endpoint in endpoints
+    )
+    if cached and cached["endpoints"] is categorized_endpoints:
+        cached["index"] = index
+    return index
+
+def toggle_browser_endpoint(selected_key, widget_key, category, endpoint):
+    """Checkbox callback: add or remove an endpoint from the selection kept in session state."""
+    eid = endpoint.get("endpoint_id")
+    selected = [ep for ep in st.session_state[selected_key] if ep.get("endpoint_id") != eid]
+    categories = st.session_state.setdefault(f"{selected_key}_categories", {})
+    if st.session_state[widget_key]:
+        selected.append(endpoint)
+        categories[eid] = category
+    else:
+        categories.pop(eid, None)
+    st.session_state[selected_key] = selected
+
+def render_endpoint_browser(prefix, categorized_endpoints, selected_key, help_text):
+    """
+    Paginated, searchable endpoint checklist. Only the current page is rendered; the
+    selection lives in st.session_state[selected_key], so it survives paging and filtering.
+    
+    Returns:
+        list: (category, endpoint) for every selected endpoint, in selection order
+    """
+    index = get_categorized_endpoints_index(st.session_state.get("file_name"), categorized_endpoints)
+    categories = st.session_state.setdefault(f"{selected_key}_categories", {})
+    selected_ids = {ep.get("endpoint_id") for ep in st.session_state[selected_key]}
+    
+    search_col, category_col = st.columns([3, 1])
+    with search_col:
+        search_term = st.text_input("🔍 Filter endpoints", key=f"{prefix}_endpoint_search")
+    with category_col:
+        category_filter = st.selectbox("Category", ["All"] + list(categorized_endpoints.keys()), key=f"{prefix}_endpoint_category")
+    
+    matches = index.search(search_term)
+    if category_filter != "All":
+        matches = [match for match in matches if match[0] == category_filter]
+    
+    page = st.session_state.get(f"{prefix}_endpoint_page", 1)
+    prev_col, page_col, next_col = st.columns([1, 3, 1])
+    if prev_col.button("◀ Previous", key=f"{prefix}_endpoint_prev"):
+        page -= 1
+    if next_col.button("Next ▶", key=f"{prefix}_endpoint_next"):
+        page += 1
+    page_matches, page, page_count = paginate(matches, page, ENDPOINTS_PAGE_SIZE)
+    st.session_state[f"{prefix}_endpoint_page"] = page
+    page_col.markdown(f"Page **{page}** of **{page_count}** · {len(matches)} endpoints · {len(selected_ids)} selected")
+    
+    current_category = None
+    for category, endpoint in page_matches:
+        if category != current_category:
+            current_category = category
+            st.markdown(f"**{category}**")
+        widget_key = f"{prefix}_endpoint_{endpoint.get('endpoint_id')}"
+        st.checkbox(
+            endpoint.get("endpoint_name"),
+            value=endpoint.get("endpoint_id") in selected_ids,
+            key=widget_key,
+            help=help_text,
+            on_change=toggle_browser_endpoint,
+            args=(selected_key, widget_key, category, endpoint)
+        )
+    
+    return [(categories.get(ep.get("endpoint_id")), ep) for ep in st.session_state[selected_key]]
+
+def stream_assistant_response(path, payload):
+    """
+    Stream an assistant answer into the page as it is generated.
+
+    Returns:
+        tuple: (response, citations, thread_id) taken from the final event
+    """
+    final = {}
+    
+    def text_chunks():
+        for event in api_stream(path, payload):
+            if event["type"] == "delta":
+                yield event["text"]
+            elif event["type"] == "done":
+                final.update(event)
+            elif event["type"] == "error":
+                raise RuntimeError(event.get("error", "Unknown error"))
+    
+    # The streamed preview is replaced by the editable response once the answer is complete
+    placeholder = st.empty()
+    with placeholder.container():
+        streamed_text = st.write_stream(text_chunks())
+    placeholder.empty()
+    
+    return final.get("response", streamed_text), final.get("citations", []), final.get("thread_id")
+
 # Main layout with sidebar and content area
 def main():
     """Main application layout and functionality."""
@@ -847,6 +985,13 @@ def main():
     elif st.session_state.active_tab == 6:
         show_export_tab()
 
+# Messages shown for each backend ingestion stage reported by /upload/status/<job_id>
+UPLOAD_STAGE_LABELS = {
+    "file_stored": "Document uploaded, waiting for indexing...",
+    "vector_indexing": "Indexing document content...",
+    "assistant_created": "Preparing AI assistant...",
+}
+
 def show_upload_screen():
     """Display the file upload screen with a modern dashboard look."""
     col1, col2 = st.columns([2, 1])
@@ -871,6 +1016,9 @@ def show_upload_screen():
         
         st.markdown("</div>", unsafe_allow_html=True)
         
+        # Identical papers are reused by the backend unless a fresh ingest is requested
+        force_reingest = st.checkbox("Re-process even if this paper was uploaded before", value=False)
+        
         # Process button
         process_col1, process_col2, process_col3 = st.columns([1, 2, 1])
         with process_col2:
@@ -885,25 +1033,41 @@ def show_upload_screen():
                     
                     # Create progress bar
                     progress_bar = st.progress(0)
+                    stage_text = st.empty()
                     
-                    # Upload the file
-                    files = {"file": uploaded_file}
+                    # Upload the file in chunks; retrying after a failure resumes the same upload
+                    stage_text.info("Uploading document...")
+                    upload_key = f"{uploaded_file.name}:{uploaded_file.size}"
+                    pending_upload = st.session_state.get("pending_chunked_upload") or {}
                     
-                    # Simulate progress steps
-                    progress_bar.progress(20)
-                    st.info("Uploading document...")
+                    def show_transfer_progress(upload_id, offset, size):
+                        st.session_state["pending_chunked_upload"] = {"key": upload_key, "upload_id": upload_id}
+                        progress_bar.progress(int(30 * offset / size))
+                        stage_text.info(f"Uploading document... {offset / 1048576:.1f} of {size / 1048576:.1f} MB")
                     
-                    # Make API call
-                    response = requests.post(f"{API_BASE_URL}/upload", files=files)
-                    progress_bar.progress(60)
-                    st.info("Analyzing content...")
-                    
-                    # Simulate more progress
-                    progress_bar.progress(80)
-                    st.info("Preparing AI assistant...")
+                    # The backend answers the finalize step with a job id straight away
+                    response = upload_file_chunked(
+                        uploaded_file,
+                        uploaded_file.name,
+                        uploaded_file.size,
+                        force_reingest=force_reingest,
+                        upload_id=pending_upload.get("upload_id") if pending_upload.get("key") == upload_key else None,
+                        on_progress=show_transfer_progress
+                    )
                     
-                    if response.status_code == 200:
-                        result = response.json()
+                    if response.status_code in (200, 202):
+                        st.session_state["pending_chunked_upload"] = None
+                        if response.status_code == 200:
+                            # Already ingested: the backend returned the existing assistant straight away
+                            result = response.json()
+                            stage_text.info("This paper was processed before; reusing its assistant.")
+                        else:
+                            # Follow the backend's real ingestion stages while it indexes the paper
+                            def show_upload_progress(status):
+                                progress_bar.progress(30 + int(70 * status["completed"] / status["total"]))
+                                stage_text.info(UPLOAD_STAGE_LABELS.get(status["stage"], "Processing document..."))
+                            
+                            result = wait_for_upload(response.json()["job_id"], on_progress=show_upload_progress)
                         if isinstance(result, dict):
                             # Update progress
                             progress_bar.progress(100)
@@ -1138,6 +1302,14 @@ def show_results_tab():
                 key="results_word_limit"
             )
             
+            # Predefined prompts stay on the paper's thread unless dependency is turned off
+            results_dependent = st.checkbox("Thread dependent", value=True, key="results_dependent")
+            
+            # Independent answers are cached by the backend; this forces a fresh run
+            results_no_cache = False if results_dependent else st.checkbox(
+                "Regenerate (skip cached answer)", value=False, key="results_no_cache"
+            )
+            
             st.markdown("""
             <div style="display: flex; gap: 0.5rem; margin-top: 1rem;">
                 <div class="tag tag-primary">APA Format</div>
@@ -1210,12 +1382,15 @@ def show_results_tab():
                     progress_bar.progress(50)
                     
                     # Make API call
-                    response = requests.post(
-                        f"{API_BASE_URL}/query",
+                    response = api_post(
+                        "/query",
                         json={
+                            "question": final_prompt,
                             "assistant_id": st.session_state.assistant_id,
-                            "thread_id": st.session_state.current_thread_id,
-                            "query": final_prompt
+                            "vector_id": st.session_state.vector_id,
+                            "current_thread_id": st.session_state.current_thread_id,
+                            "dependent": results_dependent,
+                            "no_cache": results_no_cache
                         }
                     )
                     
@@ -1363,12 +1538,13 @@ def show_results_tab():
                     time.sleep(0.3)
                     
                     # Make API call
-                    response = requests.post(
-                        f"{API_BASE_URL}/query",
+                    response = api_post(
+                        "/query",
                         json={
+                            "question": custom_prompt,
                             "assistant_id": st.session_state.assistant_id,
-                            "thread_id": st.session_state.current_thread_id,
-                            "query": custom_prompt
+                            "vector_id": st.session_state.vector_id,
+                            "current_thread_id": st.session_state.current_thread_id
                         }
                     )
                     
@@ -1509,17 +1685,11 @@ def show_methods_endpoints():
     with st.spinner("Loading endpoints..."):
         if "file_name" in st.session_state and st.session_state.file_name:
             try:
-                params = {'file_name': st.session_state.file_name}
-                response = requests.get(f"{API_BASE_URL}/methods/get_endpoints_for_methods", params=params)
+                categorized_endpoints = fetch_categorized_endpoints(st.session_state.file_name)
+                st.session_state["methods_categorized_endpoints"] = categorized_endpoints
                 
-                if response.status_code == 200:
-                    categorized_endpoints = response.json().get("endpoints", {})
-                    st.session_state["methods_categorized_endpoints"] = categorized_endpoints
-                    
-                    endpoint_count = sum(len(ep) for ep in categorized_endpoints.values())
-                    st.success(f"{endpoint_count} endpoints loaded from {len(categorized_endpoints)} categories")
-                else:
-                    st.error(f"API Error: {response.json().get('error', 'Unknown error')}")
+                endpoint_count = sum(len(ep) for ep in categorized_endpoints.values())
+                st.success(f"{endpoint_count} endpoints loaded from {len(categorized_endpoints)} categories")
             except Exception as e:
                 st.error(f"An error occurred: {e}")
         elif "methods_categorized_endpoints" not in st.session_state:
@@ -1532,69 +1702,47 @@ def show_methods_endpoints():
         # Track whether a subgroup was selected
         subgroup_selected = False
         
-        # Container for endpoints with search
+        # Paginated, searchable endpoint browser
         with st.container():
-            # Add search filter
-            search_term = st.text_input("🔍 Filter endpoints", key="methods_endpoint_search")
-            
-            # Display endpoints by category with filtering
-            for category, endpoints in st.session_state["methods_categorized_endpoints"].items():
-                # Display category if it contains matching endpoints or if no search
-                matching_endpoints = [e for e in endpoints if not search_term or search_term.lower() in e.get("endpoint_name", "").lower()]
-                
-                if matching_endpoints:
-                    with st.expander(f"**{category}** ({len(matching_endpoints)} endpoints)", expanded=not search_term):
-                        for endpoint in matching_endpoints:
-                            eid = endpoint.get("endpoint_id")
-                            ename = endpoint.get("endpoint_name")
+            selected_endpoints = render_endpoint_browser(
+                "methods",
+                st.session_state["methods_categorized_endpoints"],
+                "selected_endpoints_for_methods",
+                "Select this endpoint to generate method details"
+            )
+        
+        # Subgroups for every selected endpoint; the last selection drives the prompt below
+        for category, endpoint in selected_endpoints:
+            eid = endpoint.get("endpoint_id")
+            ename = endpoint.get("endpoint_name")
+            
+            # Handle subgroups
+            subgroup_responses = endpoint.get('subgroup_assistant_responses', [])
+            if subgroup_responses:
+                with st.expander(f"Subgroups for '{ename}'", expanded=True):
+                    st.markdown("Select a subgroup for more detailed analysis:")
+                    
+                    for s_idx, bullet_points in enumerate(get_subgroup_bullets(endpoint)):
+                        for b_idx, bullet_clean in enumerate(bullet_points):
+                            bullet_key = f"{eid}_sub_{s_idx}_bullet_{b_idx}"
                             
-                            endpoint_checked = st.checkbox(
-                                ename,
-                                key=f"methods_endpoint_{eid}",
-                                help=f"Select this endpoint to generate method details"
+                            bullet_selected = st.checkbox(
+                                bullet_clean,
+                                key=bullet_key,
+                                help="Select this subgroup for analysis"
                             )
                             
-                            if endpoint_checked:
-                                # Add to selected endpoints if not already there
-                                if eid not in [ep['endpoint_id'] for ep in st.session_state["selected_endpoints_for_methods"]]:
-                                    st.session_state["selected_endpoints_for_methods"].append(endpoint)
-                                
-                                # Handle subgroups
-                                subgroup_responses = endpoint.get('subgroup_assistant_responses', [])
-                                if subgroup_responses:
-                                    with st.expander(f"Subgroups for '{ename}'", expanded=True):
-                                        st.markdown("Select a subgroup for more detailed analysis:")
-                                        
-                                        for s_idx, subgroup_text in enumerate(subgroup_responses):
-                                            bullet_points = re.findall(r'^\s*-\s(.+?)(?=^\s*-\s|\Z)', subgroup_text, re.DOTALL | re.MULTILINE)
-                                            
-                                            for b_idx, bullet in enumerate(bullet_points):
-                                                bullet_clean = bullet.strip().replace('\n', ' ')
-                                                bullet_key = f"{eid}_sub_{s_idx}_bullet_{b_idx}"
-                                                
-                                                bullet_selected = st.checkbox(
-                                                    bullet_clean,
-                                                    key=bullet_key,
-                                                    help="Select this subgroup for analysis"
-                                                )
-                                                
-                                                if bullet_selected:
-                                                    subgroup_bullet = bullet_clean
-                                                    selected_category = category
-                                                    selected_endpoint = ename
-                                                    subgroup_selected = True
-                                
-                                # If no subgroup selected, use the main endpoint
-                                if not subgroup_selected:
-                                    selected_endpoint = ename
-                                    selected_category = category
-                                    main_endpoint_name = ename
-                            else:
-                                # Remove from selected endpoints if unchecked
-                                st.session_state["selected_endpoints_for_methods"] = [
-                                    ep for ep in st.session_state["selected_endpoints_for_methods"] 
-                                    if ep.get("endpoint_id") != eid
-                                ]
+                            if bullet_selected:
+                                subgroup_bullet = bullet_clean
+                                selected_category = category
+                                selected_endpoint = ename
+                                subgroup_selected = True
+            
+            # If no subgroup selected, use the main endpoint
+            if not subgroup_selected:
+                selected_endpoint = ename
+                selected_category = category
+                main_endpoint_name = ename
         
         # If an endpoint is selected, show prompt options
         if selected_endpoint:
@@ -1682,16 +1830,11 @@ def run_methods_endpoint_prompt(prompt, dependent):
                 "dependent": dependent,
             }
             
-            response = requests.post(f"{API_BASE_URL}/query", json=payload)
-            
-            if response.status_code == 200:
-                res = response.json()
-                st.session_state["methods_checkbox_response"] = res.get("response", "")
-                st.session_state["methods_checkbox_citations"] = res.get("citations", [])
-                st.session_state.current_method_checkbox_thread_id = res.get("thread_id")
-                st.success("Query processed successfully!")
-            else:
-                st.error("Failed to process your query.")
+            answer, citations, thread_id = stream_assistant_response("/query/stream", payload)
+            st.session_state["methods_checkbox_response"] = answer
+            st.session_state["methods_checkbox_citations"] = citations
+            st.session_state.current_method_checkbox_thread_id = thread_id
+            st.success("Query processed successfully!")
         except Exception as e:
             st.error(f"Error: {str(e)}")
 
@@ -1709,7 +1852,7 @@ def save_methods_response(edited_response):
                 'selected_category': st.session_state.selected_category
             }
             
-            save_response = requests.post(f"{API_BASE_URL}/methods/save_methods_response", json=save_payload)
+            save_response = api_post("/methods/save_methods_response", json=save_payload)
             
             if save_response.status_code == 200:
                 st.success("Methods response saved successfully!")
@@ -1801,16 +1944,11 @@ def run_methods_general_prompt(prompt, dependent):
                 "dependent": dependent,
             }
             
-            response = requests.post(f"{API_BASE_URL}/query", json=payload)
-            
-            if response.status_code == 200:
-                res = response.json()
-                st.session_state["methods_general_checkbox_response"] = res.get("response", "")
-                st.session_state["methods_general_checkbox_citations"] = res.get("citations", [])
-                st.session_state.current_method_checkbox_thread_id = res.get("thread_id")
-                st.success("Query processed successfully!")
-            else:
-                st.error("Failed to process your query.")
+            answer, citations, thread_id = stream_assistant_response("/query/stream", payload)
+            st.session_state["methods_general_checkbox_response"] = answer
+            st.session_state["methods_general_checkbox_citations"] = citations
+            st.session_state.current_method_checkbox_thread_id = thread_id
+            st.success("Query processed successfully!")
         except Exception as e:
             st.error(f"Error: {str(e)}")
 
@@ -1828,7 +1966,7 @@ def save_methods_general_response(edited_response, prompt):
                 'selected_category': prompt.split(":", 1)[0].strip()  # Extract prompt number/category
             }
             
-            save_response = requests.post(f"{API_BASE_URL}/methods/save_methods_response", json=save_payload)
+            save_response = api_post("/methods/save_methods_response", json=save_payload)
             
             if save_response.status_code == 200:
                 st.success("General prompt response saved successfully!")
@@ -1873,17 +2011,11 @@ def show_conclusion_endpoints():
     with st.spinner("Loading endpoints..."):
         if "file_name" in st.session_state and st.session_state.file_name:
             try:
-                params = {'file_name': st.session_state.file_name}
-                response = requests.get(f"{API_BASE_URL}/methods/get_endpoints_for_methods", params=params)
+                conclusion_categorized_endpoints = fetch_categorized_endpoints(st.session_state.file_name)
+                st.session_state["conclusion_methods_categorized_endpoints"] = conclusion_categorized_endpoints
                 
-                if response.status_code == 200:
-                    conclusion_categorized_endpoints = response.json().get("endpoints", {})
-                    st.session_state["conclusion_methods_categorized_endpoints"] = conclusion_categorized_endpoints
-                    
-                    endpoint_count = sum(len(ep) for ep in conclusion_categorized_endpoints.values())
-                    st.success(f"{endpoint_count} endpoints loaded from {len(conclusion_categorized_endpoints)} categories")
-                else:
-                    st.error(f"API Error: {response.json().get('error', 'Unknown error')}")
+                endpoint_count = sum(len(ep) for ep in conclusion_categorized_endpoints.values())
+                st.success(f"{endpoint_count} endpoints loaded from {len(conclusion_categorized_endpoints)} categories")
             except Exception as e:
                 st.error(f"An error occurred: {e}")
         elif "conclusion_methods_categorized_endpoints" not in st.session_state:
@@ -1896,69 +2028,47 @@ def show_conclusion_endpoints():
         # Track whether a subgroup was selected
         conclusion_subgroup_selected = False
         
-        # Container for endpoints with search
+        # Paginated, searchable endpoint browser
         with st.container():
-            # Add search filter
-            search_term = st.text_input("🔍 Filter endpoints", key="conclusion_endpoint_search")
-            
-            # Display endpoints by category with filtering
-            for category, endpoints in st.session_state["conclusion_methods_categorized_endpoints"].items():
-                # Display category if it contains matching endpoints or if no search
-                matching_endpoints = [e for e in endpoints if not search_term or search_term.lower() in e.get("endpoint_name", "").lower()]
-                
-                if matching_endpoints:
-                    with st.expander(f"**{category}** ({len(matching_endpoints)} endpoints)", expanded=not search_term):
-                        for endpoint in matching_endpoints:
-                            eid = endpoint.get("endpoint_id")
-                            ename = endpoint.get("endpoint_name")
+            conclusion_selected_endpoints = render_endpoint_browser(
+                "conclusion_methods",
+                st.session_state["conclusion_methods_categorized_endpoints"],
+                "conclusion_selected_endpoints_for_methods",
+                "Select this endpoint to generate conclusion details"
+            )
+        
+        # Subgroups for every selected endpoint; the last selection drives the prompt below
+        for category, endpoint in conclusion_selected_endpoints:
+            eid = endpoint.get("endpoint_id")
+            ename = endpoint.get("endpoint_name")
+            
+            # Handle subgroups
+            subgroup_responses = endpoint.get('subgroup_assistant_responses', [])
+            if subgroup_responses:
+                with st.expander(f"Subgroups for '{ename}'", expanded=True):
+                    st.markdown("Select a subgroup for more detailed analysis:")
+                    
+                    for s_idx, bullet_points in enumerate(get_subgroup_bullets(endpoint)):
+                        for b_idx, bullet_clean in enumerate(bullet_points):
+                            bullet_key = f"{eid}_sub_{s_idx}_bullet_{b_idx}"
                             
-                            endpoint_checked = st.checkbox(
-                                ename,
-                                key=f"conclusion_methods_endpoint_{eid}",
-                                help=f"Select this endpoint to generate conclusion details"
+                            bullet_selected = st.checkbox(
+                                bullet_clean,
+                                key=f"conclusion_{bullet_key}",
+                                help="Select this subgroup for analysis"
                             )
                             
-                            if endpoint_checked:
-                                # Add to selected endpoints if not already there
-                                if eid not in [ep['endpoint_id'] for ep in st.session_state["conclusion_selected_endpoints_for_methods"]]:
-                                    st.session_state["conclusion_selected_endpoints_for_methods"].append(endpoint)
-                                
-                                # Handle subgroups
-                                subgroup_responses = endpoint.get('subgroup_assistant_responses', [])
-                                if subgroup_responses:
-                                    with st.expander(f"Subgroups for '{ename}'", expanded=True):
-                                        st.markdown("Select a subgroup for more detailed analysis:")
-                                        
-                                        for s_idx, subgroup_text in enumerate(subgroup_responses):
-                                            bullet_points = re.findall(r'^\s*-\s(.+?)(?=^\s*-\s|\Z)', subgroup_text, re.DOTALL | re.MULTILINE)
-                                            
-                                            for b_idx, bullet in enumerate(bullet_points):
-                                                bullet_clean = bullet.strip().replace('\n', ' ')
-                                                bullet_key = f"{eid}_sub_{s_idx}_bullet_{b_idx}"
-                                                
-                                                bullet_selected = st.checkbox(
-                                                    bullet_clean,
-                                                    key=f"conclusion_{bullet_key}",
-                                                    help="Select this subgroup for analysis"
-                                                )
-                                                
-                                                if bullet_selected:
-                                                    conclusion_subgroup_bullet = bullet_clean
-                                                    conclusion_selected_category = category
-                                                    conclusion_selected_endpoint = ename
-                                                    conclusion_subgroup_selected = True
-                                
-                                # If no subgroup selected, use the main endpoint
-                                if not conclusion_subgroup_selected:
-                                    conclusion_selected_endpoint = ename
-                                    conclusion_selected_category = category
-                                    conclusion_main_endpoint_name = ename
-                            else:
-                                # Remove from selected endpoints if unchecked
-                                st.session_state["conclusion_selected_endpoints_for_methods"] = [
-                                    ep for ep in st.session_state["conclusion_selected_endpoints_for_methods"] 
-                                    if ep.get("endpoint_id") != eid
-                                ]
+                            if bullet_selected:
+                                conclusion_subgroup_bullet = bullet_clean
+                                conclusion_selected_category = category
+                                conclusion_selected_endpoint = ename
+                                conclusion_subgroup_selected = True
+            
+            # If no subgroup selected, use the main endpoint
+            if not conclusion_subgroup_selected:
+                conclusion_selected_endpoint = ename
+                conclusion_selected_category = category
+                conclusion_main_endpoint_name = ename
         
         # If an endpoint is selected, show prompt options
         if conclusion_selected_endpoint:
@@ -2046,16 +2156,11 @@ def run_conclusion_endpoint_prompt(prompt, dependent):
                 "dependent": dependent,
             }
             
-            response = requests.post(f"{API_BASE_URL}/query", json=payload)
-            
-            if response.status_code == 200:
-                res = response.json()
-                st.session_state["conclusion_methods_checkbox_response"] = res.get("response", "")
-                st.session_state["conclusion_methods_checkbox_citations"] = res.get("citations", [])
-                st.session_state.current_conclusion_checkbox_thread_id = res.get("thread_id")
-                st.success("Query processed successfully!")
-            else:
-                st.error("Failed to process your query.")
+            answer, citations, thread_id = stream_assistant_response("/query/stream", payload)
+            st.session_state["conclusion_methods_checkbox_response"] = answer
+            st.session_state["conclusion_methods_checkbox_citations"] = citations
+            st.session_state.current_conclusion_checkbox_thread_id = thread_id
+            st.success("Query processed successfully!")
         except Exception as e:
             st.error(f"Error: {str(e)}")
 
@@ -2073,7 +2178,7 @@ def save_conclusion_response(edited_response):
                 'selected_category': st.session_state.conclusion_selected_category
             }
             
-            save_response = requests.post(f"{API_BASE_URL}/conclusion/save_conclusion_response", json=save_payload)
+            save_response = api_post("/conclusion/save_conclusion_response", json=save_payload)
             
             if save_response.status_code == 200:
                 st.success("Conclusion response saved successfully!")
@@ -2160,16 +2265,11 @@ def run_conclusion_general_prompt(prompt, dependent):
                 "dependent": dependent,
             }
             
-            response = requests.post(f"{API_BASE_URL}/query", json=payload)
-            
-            if response.status_code == 200:
-                res = response.json()
-                st.session_state["conclusion_general_checkbox_response"] = res.get("response", "")
-                st.session_state["conclusion_general_checkbox_citations"] = res.get("citations", [])
-                st.session_state.current_conclusion_checkbox_thread_id = res.get("thread_id")
-                st.success("Query processed successfully!")
-            else:
-                st.error("Failed to process your query.")
+            answer, citations, thread_id = stream_assistant_response("/query/stream", payload)
+            st.session_state["conclusion_general_checkbox_response"] = answer
+            st.session_state["conclusion_general_checkbox_citations"] = citations
+            st.session_state.current_conclusion_checkbox_thread_id = thread_id
+            st.success("Query processed successfully!")
         except Exception as e:
             st.error(f"Error: {str(e)}")
 
@@ -2187,7 +2287,7 @@ def save_conclusion_general_response(edited_response, prompt):
                 'selected_category': prompt.split(".", 1)[0].strip()  # Extract prompt number/category
             }
             
-            save_response = requests.post(f"{API_BASE_URL}/conclusion/save_conclusion_response", json=save_payload)
+            save_response = api_post("/conclusion/save_conclusion_response", json=save_payload)
             
             if save_response.status_code == 200:
                 st.success("General conclusion response saved successfully!")
@@ -2298,16 +2398,11 @@ def run_discussion_general_prompt(prompt, dependent):
                 "dependent": dependent,
             }
             
-            response = requests.post(f"{API_BASE_URL}/query", json=payload)
-            
-            if response.status_code == 200:
-                res = response.json()
-                st.session_state["discussion_general_checkbox_response"] = res.get("response", "")
-                st.session_state["discussion_general_checkbox_citations"] = res.get("citations", [])
-                st.session_state["discussion_general_thread_id"] = res.get("thread_id")
-                st.success("Query processed successfully!")
-            else:
-                st.error("Failed to process your query.")
+            answer, citations, thread_id = stream_assistant_response("/query/stream", payload)
+            st.session_state["discussion_general_checkbox_response"] = answer
+            st.session_state["discussion_general_checkbox_citations"] = citations
+            st.session_state["discussion_general_thread_id"] = thread_id
+            st.success("Query processed successfully!")
         except Exception as e:
             st.error(f"Error: {str(e)}")
 
@@ -2325,7 +2420,7 @@ def save_discussion_general_response(edited_response, prompt):
                 'selected_category': prompt.split(".", 1)[0].strip()  # Extract prompt number/category
             }
             
-            save_response = requests.post(f"{API_BASE_URL}/discussion/save_discussion_response", json=save_payload)
+            save_response = api_post("/discussion/save_discussion_response", json=save_payload)
             
             if save_response.status_code == 200:
                 st.success("Discussion response saved successfully!")
@@ -2373,19 +2468,13 @@ def show_discussion_custom_queries():
                         'dependent': dependent,
                     }
                     
-                    # Send request
-                    response = requests.post(f"{API_BASE_URL}/discussion/chat_discussion", json=payload)
+                    # Stream the answer into the page
+                    answer, citations, thread_id = stream_assistant_response("/discussion/chat_stream", payload)
+                    st.session_state["discussion_chat_response"] = answer
+                    st.session_state["discussion_chat_citations"] = citations
+                    st.session_state["discussion_chat_thread_id"] = thread_id or ""
                     
-                    if response.status_code == 200:
-                        result = response.json()
-                        st.session_state["discussion_chat_response"] = result.get("response", "")
-                        st.session_state["discussion_chat_citations"] = result.get("citations", [])
-                        st.session_state["discussion_chat_thread_id"] = result.get("thread_id", "")
-                        
-                        st.success("Response received!")
-                    else:
-                        error_message = response.json().get("error", "Failed to process the query.")
-                        st.error(error_message)
+                    st.success("Response received!")
                 except Exception as e:
                     st.error(f"An error occurred: {e}")
         else:
@@ -2428,7 +2517,7 @@ def show_discussion_custom_queries():
                             'thread_id': st.session_state["discussion_chat_thread_id"]
                         }
                         
-                        save_response = requests.post(f"{API_BASE_URL}/discussion/save_discussion_chat_response", json=save_payload)
+                        save_response = api_post("/discussion/save_discussion_chat_response", json=save_payload)
                         
                         if save_response.status_code == 200:
                             st.success("Discussion chat response saved successfully!")
@@ -2453,18 +2542,18 @@ def show_export_tab():
     You can customize the format and export options below.
     """)
     
+    # Counts and loaded previews are reused across reruns; this forces a fresh fetch
+    refresh_content = st.button("🔄 Refresh saved content", key="refresh_export_content")
+    
     # Get saved content
     with st.spinner("Loading saved content..."):
         try:
-            params = {'file_name': st.session_state.file_name}
-            response = requests.get(f"{API_BASE_URL}/export/get_saved_responses", params=params)
+            section_counts = load_export_section_counts(force=refresh_content)
             
-            if response.status_code == 200:
-                saved_content = response.json()
+            if section_counts is not None:
                 
                 # Check if there's any content to display
-                has_content = any(saved_content.get(section, []) for section in 
-                                ["introduction", "methods", "results", "discussion", "conclusion"])
+                has_content = any(section_counts.get(section, 0) for section in PAPER_SECTIONS)
                 
                 if has_content:
                     # Layout with sections side by side
@@ -2512,45 +2601,49 @@ def show_export_tab():
                             "Introduction",
                             value=True,
                             key="include_introduction_checkbox",
-                            disabled=not saved_content.get("introduction", [])
+                            disabled=not section_counts.get("introduction", 0)
                         )
                         
                         include_methods = st.checkbox(
                             "Methods",
                             value=True,
                             key="include_methods_checkbox",
-                            disabled=not saved_content.get("methods", [])
+                            disabled=not section_counts.get("methods", 0)
                         )
                         
                         include_results = st.checkbox(
                             "Results",
                             value=True,
                             key="include_results_checkbox",
-                            disabled=not saved_content.get("results", [])
+                            disabled=not section_counts.get("results", 0)
                         )
                         
                         include_discussion = st.checkbox(
                             "Discussion",
                             value=True,
                             key="include_discussion_checkbox",
-                            disabled=not saved_content.get("discussion", [])
+                            disabled=not section_counts.get("discussion", 0)
                         )
                         
                         include_conclusion = st.checkbox(
                             "Conclusion",
                             value=True,
                             key="include_conclusion_checkbox",
-                            disabled=not saved_content.get("conclusion", [])
+                            disabled=not section_counts.get("conclusion", 0)
                         )
                     
                     # Preview section
                     st.markdown("### Document Preview")
                     
-                    # Create tabs for previewing each section
-                    section_tabs = st.tabs(["Abstract", "Introduction", "Methods", "Results", "Discussion", "Conclusion"])
+                    # Only the section being previewed is fetched, a page at a time
+                    preview_section = st.radio(
+                        "Preview section:",
+                        ["Abstract", "Introduction", "Methods", "Results", "Discussion", "Conclusion"],
+                        horizontal=True,
+                        key="export_preview_section"
+                    )
                     
-                    # Populate tabs with content
-                    with section_tabs[0]:
+                    if preview_section == "Abstract":
                         if include_abstract:
                             st.markdown("#### Abstract")
                             # Abstract generation logic would go here
@@ -2569,56 +2662,41 @@ def show_export_tab():
                                 )
                         else:
                             st.info("Abstract section is not included in the export.")
-                    
-                    # Introduction tab
-                    with section_tabs[1]:
-                        if include_introduction and saved_content.get("introduction", []):
-                            st.markdown("#### Introduction")
-                            intro_content = "\n\n".join([item.get("assistant_response", "") 
-                                                       for item in saved_content.get("introduction", [])])
-                            st.markdown(intro_content)
-                        else:
-                            st.info("Introduction section is not included in the export or has no saved content.")
-                    
-                    # Methods tab
-                    with section_tabs[2]:
-                        if include_methods and saved_content.get("methods", []):
-                            st.markdown("#### Methods")
-                            methods_content = "\n\n".join([item.get("assistant_response", "") 
-                                                         for item in saved_content.get("methods", [])])
-                            st.markdown(methods_content)
-                        else:
-                            st.info("Methods section is not included in the export or has no saved content.")
-                    
-                    # Results tab
-                    with section_tabs[3]:
-                        if include_results and saved_content.get("results", []):
-                            st.markdown("#### Results")
-                            results_content = "\n\n".join([item.get("assistant_response", "") 
-                                                         for item in saved_content.get("results", [])])
-                            st.markdown(results_content)
-                        else:
-                            st.info("Results section is not included in the export or has no saved content.")
-                    
-                    # Discussion tab
-                    with section_tabs[4]:
-                        if include_discussion and saved_content.get("discussion", []):
-                            st.markdown("#### Discussion")
-                            discussion_content = "\n\n".join([item.get("assistant_response", "") 
-                                                            for item in saved_content.get("discussion", [])])
-                            st.markdown(discussion_content)
-                        else:
-                            st.info("Discussion section is not included in the export or has no saved content.")
-                    
-                    # Conclusion tab
-                    with section_tabs[5]:
-                        if include_conclusion and saved_content.get("conclusion", []):
-                            st.markdown("#### Conclusion")
-                            conclusion_content = "\n\n".join([item.get("assistant_response", "") 
-                                                           for item in saved_content.get("conclusion", [])])
-                            st.markdown(conclusion_content)
+                    else:
+                        section = preview_section.lower()
+                        included_sections = {
+                            "introduction": include_introduction,
+                            "methods": include_methods,
+                            "results": include_results,
+                            "discussion": include_discussion,
+                            "conclusion": include_conclusion
+                        }
+                        
+                        if included_sections[section] and section_counts.get(section, 0):
+                            section_content = load_export_section(section, section_counts[section])
+                            if section_content is None:
+                                st.error(f"Failed to load saved {section} content.")
+                            else:
+                                # Rendered fragments are cached; only a changed section is re-rendered
+                                fragment_cache = st.session_state.setdefault("export_preview_fragments", {})
+                                fragments = get_section_fragments(
+                                    fragment_cache.setdefault(st.session_state.file_name, {}),
+                                    {section: section_content["items"]},
+                                    [section]
+                                )
+                                st.markdown(f"#### {preview_section}")
+                                st.markdown(fragments[section])
+                                
+                                if section_content["has_more"]:
+                                    st.caption(f"Showing {len(section_content['items'])} of {section_counts[section]} saved responses.")
+                                    st.button(
+                                        "Load more",
+                                        key=f"export_load_more_{section}",
+                                        on_click=load_export_section,
+                                        args=(section, section_counts[section], True)
+                                    )
                         else:
-                            st.info("Conclusion section is not included in the export or has no saved content.")
+                            st.info(f"{preview_section} section is not included in the export or has no saved content.")
                     
                     # Export buttons
                     st.markdown("---")
@@ -2646,20 +2724,34 @@ def show_export_tab():
                                     }
                                 }
                                 
-                                # Call export API (placeholder)
-                                # In a real implementation, this would call the API and handle the file download
-                                
-                                # Simulate success for demo
-                                st.success(f"Document exported successfully as {export_format}!")
-                                st.markdown(f"""
-                                <div style="text-align: center; margin-top: 20px;">
-                                    <a href="#" download="research_paper.{export_format.lower()}" 
-                                       style="padding: 10px 20px; background-color: #0066CC; color: white; 
-                                              text-decoration: none; border-radius: 4px;">
-                                        Download Document
-                                    </a>
-                                </div>
-                                """, unsafe_allow_html=True)
+                                try:
+                                    response = api_post("/export/build", json=export_payload)
+                                    if response.status_code == 200:
+                                        st.session_state["export_artifact"] = {
+                                            "data": response.content,
+                                            "file_name": download_filename(response, f"research_paper.{export_format.lower()}"),
+                                            "mime": response.headers.get("Content-Type", "application/octet-stream"),
+                                        }
+                                        if response.headers.get("X-Export-Cache") == "hit":
+                                            st.success(f"Document exported successfully as {export_format}! (unchanged since the last export)")
+                                        else:
+                                            st.success(f"Document exported successfully as {export_format}!")
+                                    else:
+                                        st.session_state["export_artifact"] = None
+                                        st.error(f"Export failed: {response.json().get('error', 'Unknown error')}")
+                                except Exception as e:
+                                    st.error(f"An error occurred while exporting: {str(e)}")
+                        
+                        # Offer the last built document for download
+                        export_artifact = st.session_state.get("export_artifact")
+                        if export_artifact:
+                            st.download_button(
+                                "⬇️ Download Document",
+                                data=export_artifact["data"],
+                                file_name=export_artifact["file_name"],
+                                mime=export_artifact["mime"],
+                                use_container_width=True
+                            )
                 else:
                     st.warning("No saved content found for export. Please generate and save content in the different sections first.")
             else:
@@ -2771,16 +2863,11 @@ def run_introduction_general_prompt(prompt, dependent):
                 "dependent": dependent,
             }
             
-            response = requests.post(f"{API_BASE_URL}/query", json=payload)
-            
-            if response.status_code == 200:
-                res = response.json()
-                st.session_state["introduction_general_checkbox_response"] = res.get("response", "")
-                st.session_state["introduction_general_checkbox_citations"] = res.get("citations", [])
-                st.session_state["introduction_general_thread_id"] = res.get("thread_id")
-                st.success("Query processed successfully!")
-            else:
-                st.error("Failed to process your query.")
+            answer, citations, thread_id = stream_assistant_response("/query/stream", payload)
+            st.session_state["introduction_general_checkbox_response"] = answer
+            st.session_state["introduction_general_checkbox_citations"] = citations
+            st.session_state["introduction_general_thread_id"] = thread_id
+            st.success("Query processed successfully!")
         except Exception as e:
             st.error(f"Error: {str(e)}")
 
@@ -2798,7 +2885,7 @@ def save_introduction_general_response(edited_response, prompt):
                 'selected_category': prompt.split(".", 1)[0].strip()  # Extract prompt number/category
             }
             
-            save_response = requests.post(f"{API_BASE_URL}/introduction/save_introduction_response", json=save_payload)
+            save_response = api_post("/introduction/save_introduction_response", json=save_payload)
             
             if save_response.status_code == 200:
                 st.success("Introduction response saved successfully!")
@@ -2846,19 +2933,13 @@ def show_introduction_custom_queries():
                         'dependent': dependent,
                     }
                     
-                    # Send request
-                    response = requests.post(f"{API_BASE_URL}/introduction/chat_introduction", json=payload)
+                    # Stream the answer into the page
+                    answer, citations, thread_id = stream_assistant_response("/introduction/chat_stream", payload)
+                    st.session_state["introduction_chat_response"] = answer
+                    st.session_state["introduction_chat_citations"] = citations
+                    st.session_state["introduction_chat_thread_id"] = thread_id or ""
                     
-                    if response.status_code == 200:
-                        result = response.json()
-                        st.session_state["introduction_chat_response"] = result.get("response", "")
-                        st.session_state["introduction_chat_citations"] = result.get("citations", [])
-                        st.session_state["introduction_chat_thread_id"] = result.get("thread_id", "")
-                        
-                        st.success("Response received!")
-                    else:
-                        error_message = response.json().get("error", "Failed to process the query.")
-                        st.error(error_message)
+                    st.success("Response received!")
                 except Exception as e:
                     st.error(f"An error occurred: {e}")
         else:
@@ -2901,7 +2982,7 @@ def show_introduction_custom_queries():
                             'thread_id': st.session_state["introduction_chat_thread_id"]
                         }
                         
-                        save_response = requests.post(f"{API_BASE_URL}/introduction/save_introduction_chat_response", json=save_payload)
+                        save_response = api_post("/introduction/save_introduction_chat_response", json=save_payload)
                         
                         if save_response.status_code == 200:
                             st.success("Introduction chat response saved successfully!")